@@ -2,7 +2,8 @@ from django.contrib import admin
 from jalali_date import datetime2jalali
 from jalali_date.admin import ModelAdminJalaliMixin
 
-from .models import User
+from .models import User, LoginRecord
+from .login_attempts import clear_login_failures
 from django.utils.translation import gettext_lazy as _
 
 class MonthFilter(ModelAdminJalaliMixin, admin.SimpleListFilter):
@@ -137,6 +138,9 @@ class UserAdmin(UserAdmin):
     # Custom action to reset failed login attempts
     def reset_failed_login_attempts(self, request, queryset):
         updated_count = queryset.update(failed_login_attempts=0)
+        # Also drop pending failures in Redis and lift active lockouts
+        for username in queryset.values_list('username', flat=True):
+            clear_login_failures(username)
         self.message_user(request, f'{updated_count} user(s) had their failed login attempts reset.')
 
     reset_failed_login_attempts.short_description = _('ریست کردن تعداد لاگین های ناموفق برای کاربران انتخاب شده')
@@ -182,3 +186,21 @@ class UserAdmin(UserAdmin):
             return datetime2jalali(obj.last_password_reset).strftime('%a, %d %b %Y | %H:%M:%S')
         else:
             return "ثبت نشده است"
+
+
+@admin.register(LoginRecord)
+class LoginRecordAdmin(admin.ModelAdmin):
+    list_display = ['user', 'ip', 'user_agent', 'get_logged_in_at_jalali']
+    list_filter = ['logged_in_at']
+    search_fields = ['user__username', 'ip']
+    list_select_related = ['user']
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='زمان ورود', ordering='logged_in_at')
+    def get_logged_in_at_jalali(self, obj):
+        return datetime2jalali(obj.logged_in_at).strftime('%a, %d %b %Y | %H:%M:%S')
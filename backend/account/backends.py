@@ -0,0 +1,17 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
+
+from .login_attempts import is_locked_out
+
+
+class LockoutModelBackend(ModelBackend):
+    """ ModelBackend that rejects locked accounts before any password hashing happens """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(get_user_model().USERNAME_FIELD)
+        if username and is_locked_out(username):
+            # Stops authenticate() and fires user_login_failed
+            raise PermissionDenied
+        return super().authenticate(request, username=username, password=password, **kwargs)
@@ -1,14 +1,15 @@
-import redis
 from django.conf import settings
 from django.contrib.admin import AdminSite
 from django.contrib.auth import authenticate, login
-from django.contrib.sessions.models import Session
 from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 from django.utils.translation import gettext as _
 from django.contrib import admin
 from django.apps import apps
 
-redis_client = redis.StrictRedis.from_url(settings.CACHES["default"]["LOCATION"], decode_responses=True)
+from . import sql_profiler
+from .user_sessions import get_user_session, set_user_session
 
 
 class CustomAdminSite(AdminSite):
@@ -23,21 +24,42 @@ class CustomAdminSite(AdminSite):
             user = authenticate(request, username=username, password=password)
 
             if user is not None and user.is_active:
-                user_session_key = f"user_session:{user.pk}"
-                existing_session_id = redis_client.get(user_session_key)
+                existing_session_id = get_user_session(user.pk, cached=False)
 
                 if existing_session_id:
-                    # Remove old session if exists
-                    Session.objects.filter(session_key=existing_session_id).delete()
+                    # Remove old session if exists (sessions live in the cache, not in the DB)
+                    request.session.delete(existing_session_id)
 
                 # Create new session
                 login(request, user)
-                redis_client.set(user_session_key, request.session.session_key)
+                # Other workers drop their cached copy through pub/sub
+                set_user_session(user.pk, request.session.session_key)
 
                 return redirect("admin:index")  # Redirect to admin dashboard
 
         return super().login(request, extra_context)
 
+    def get_urls(self):
+        return [
+            path('sql-profiler/', self.admin_view(self.sql_profiler_view), name='sql_profiler'),
+        ] + super().get_urls()
+
+    def sql_profiler_view(self, request):
+        # admin_view only lets staff in; the log may contain other users' URLs
+        if request.method == "POST" and request.user.is_superuser:
+            sql_profiler.clear_profiles()
+            return redirect("admin:sql_profiler")
+
+        suspects_only = request.GET.get('n_plus_one') == '1'
+        return TemplateResponse(request, 'admin/sql_profiler.html', {
+            **self.each_context(request),
+            'title': "پروفایل کوئری های SQL",
+            'profiles': sql_profiler.read_profiles(suspects_only=suspects_only),
+            'suspects_only': suspects_only,
+            'enabled': getattr(settings, 'SQL_PROFILER_ENABLED', False),
+            'threshold': sql_profiler.SQL_PROFILER_N_PLUS_ONE_THRESHOLD,
+        })
+
 # Create a new instance of CustomAdminSite
 custom_admin_site = CustomAdminSite(name="custom_admin")
 
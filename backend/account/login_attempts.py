@@ -0,0 +1,73 @@
+import time
+import uuid
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db.models import F
+from django_redis import get_redis_connection
+
+LOGIN_FAILURES_KEY = "login_failures:{}"
+LOGIN_LOCK_KEY = "login_lock:{}"
+
+# Lock an account for LOGIN_LOCKOUT_DURATION seconds once LOGIN_FAILURE_LIMIT
+# failures happened within the last LOGIN_FAILURE_WINDOW seconds
+LOGIN_FAILURE_LIMIT = getattr(settings, 'LOGIN_FAILURE_LIMIT', 5)
+LOGIN_FAILURE_WINDOW = getattr(settings, 'LOGIN_FAILURE_WINDOW', 15 * 60)
+LOGIN_LOCKOUT_DURATION = getattr(settings, 'LOGIN_LOCKOUT_DURATION', 15 * 60)
+
+
+def get_redis():
+    return get_redis_connection("default")
+
+
+def is_locked_out(username):
+    return bool(get_redis().exists(LOGIN_LOCK_KEY.format(username)))
+
+
+def record_login_failure(username):
+    """
+    Count a failed attempt in the sliding window. Returns True when this attempt
+    locked the account; the window is then flushed to the user row.
+    """
+    now = time.time()
+    key = LOGIN_FAILURES_KEY.format(username)
+
+    pipeline = get_redis().pipeline(transaction=True)
+    pipeline.zremrangebyscore(key, 0, now - LOGIN_FAILURE_WINDOW)
+    pipeline.zadd(key, {f"{now}:{uuid.uuid4().hex[:8]}": now})
+    pipeline.zcard(key)
+    pipeline.expire(key, LOGIN_FAILURE_WINDOW)
+    failures = pipeline.execute()[2]
+
+    if failures < LOGIN_FAILURE_LIMIT:
+        return False
+
+    # NX: only the attempt that actually locks the account flushes the counter
+    if not get_redis().set(LOGIN_LOCK_KEY.format(username), 1, nx=True, ex=LOGIN_LOCKOUT_DURATION):
+        return False
+    flush_login_failures(username)
+    return True
+
+
+def flush_login_failures(username):
+    """ Move the failures counted in Redis to the user row with a single UPDATE """
+    key = LOGIN_FAILURES_KEY.format(username)
+    pipeline = get_redis().pipeline(transaction=True)
+    pipeline.zrange(key, -1, -1, withscores=True)
+    pipeline.zcard(key)
+    pipeline.delete(key)
+    last_failure, failures, _ = pipeline.execute()
+
+    if not failures:
+        return 0
+
+    from .models import User
+    return User.objects.filter(username=username).update(
+        failed_login_attempts=F('failed_login_attempts') + failures,
+        last_failed_login=datetime.fromtimestamp(last_failure[0][1], tz=timezone.utc),
+    )
+
+
+def clear_login_failures(username):
+    """ Forget pending failures and lift the lock of this account """
+    get_redis().delete(LOGIN_FAILURES_KEY.format(username), LOGIN_LOCK_KEY.format(username))
@@ -0,0 +1,91 @@
+import json
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+LOGIN_AUDIT_KEY = "login_audit"
+# Batches that could not be written, kept for inspection instead of blocking the queue
+LOGIN_AUDIT_DEAD_KEY = "login_audit:dead"
+# Upper bound of buffered logins if the worker is down for a long time
+LOGIN_AUDIT_MAX_BUFFERED = 100_000
+
+
+def get_redis():
+    return get_redis_connection("default")
+
+
+def get_client_ip(request):
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    return x_forwarded_for.split(',')[0] if x_forwarded_for else request.META.get('REMOTE_ADDR')
+
+
+def record_login(request, user):
+    """ Buffer a login in Redis, nothing is written to the database on the request path """
+    entry = json.dumps({
+        'user': str(user.pk),
+        'ip': get_client_ip(request),
+        'user_agent': request.META.get('HTTP_USER_AGENT', '')[:255],
+        'at': timezone.now().isoformat(),
+    })
+    pipeline = get_redis().pipeline(transaction=False)
+    pipeline.rpush(LOGIN_AUDIT_KEY, entry)
+    pipeline.ltrim(LOGIN_AUDIT_KEY, -LOGIN_AUDIT_MAX_BUFFERED, -1)
+    pipeline.execute()
+
+
+def flush_login_audit(batch_size=1000):
+    """
+    Write up to `batch_size` buffered logins: one INSERT for the login records and
+    one UPDATE for last_login_ip of the users involved. Logins of users
+    deleted since are dropped; a batch that still fails goes to LOGIN_AUDIT_DEAD_KEY.
+    Returns the number of logins taken off the buffer.
+    """
+    pipeline = get_redis().pipeline(transaction=True)
+    pipeline.lrange(LOGIN_AUDIT_KEY, 0, batch_size - 1)
+    pipeline.ltrim(LOGIN_AUDIT_KEY, batch_size, -1)
+    raw_entries = pipeline.execute()[0]
+    if not raw_entries:
+        return 0
+
+    entries = [json.loads(raw) for raw in raw_entries]
+    try:
+        with transaction.atomic():
+            _write_login_batch(entries)
+    except Exception:
+        # retrying the same batch would fail again and hold back every later login
+        logger.exception("could not write %d logins, moved to %s", len(raw_entries), LOGIN_AUDIT_DEAD_KEY)
+        pipeline = get_redis().pipeline(transaction=False)
+        pipeline.rpush(LOGIN_AUDIT_DEAD_KEY, *raw_entries)
+        pipeline.ltrim(LOGIN_AUDIT_DEAD_KEY, -LOGIN_AUDIT_MAX_BUFFERED, -1)
+        pipeline.execute()
+
+    return len(raw_entries)
+
+
+def _write_login_batch(entries):
+    from .models import LoginRecord, User
+
+    users = {str(user.pk): user for user in User.objects.filter(pk__in={entry['user'] for entry in entries}).only('pk')}
+    # users deleted since they logged in would fail the foreign key of the whole batch
+    kept = [entry for entry in entries if entry['user'] in users]
+    if len(kept) < len(entries):
+        logger.info("dropping %d logins of deleted users", len(entries) - len(kept))
+    entries = kept
+
+    records = [
+        LoginRecord(user_id=entry['user'], ip=entry['ip'], user_agent=entry['user_agent'],
+                    logged_in_at=parse_datetime(entry['at']))
+        for entry in entries
+    ]
+    LoginRecord.objects.bulk_create(records)
+
+    # entries are in login order, so the last one of each user wins
+    latest = {entry['user']: record for entry, record in zip(entries, records)}
+    for pk, record in latest.items():
+        users[pk].last_login_ip = record.ip
+    User.objects.bulk_update(users.values(), ['last_login_ip'])
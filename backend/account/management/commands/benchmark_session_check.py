@@ -0,0 +1,34 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from account.user_sessions import get_user_session
+
+
+class Command(BaseCommand):
+    help = ("Measure the single-session lookup of OneSessionPerUserMiddleware: a Redis GET per "
+            "request versus the in-process cache kept fresh over pub/sub.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True)
+        parser.add_argument('--repeat', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f"user {options['username']} does not exist")
+
+        for label, cached in (('redis GET', False), ('in-process', True)):
+            get_user_session(user.pk, cached=cached)  # warm up the pool / listener
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                get_user_session(user.pk, cached=cached)
+                timings.append((time.perf_counter() - start) * 1_000_000)
+            timings.sort()
+            self.stdout.write(
+                f"{label:<11} p50 {statistics.median(timings):9.1f} µs | "
+                f"p99 {timings[int(len(timings) * 0.99) - 1]:9.1f} µs"
+            )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from account.session_store import get_session_write_stats
+
+
+class Command(BaseCommand):
+    help = "Show how many session writes the throttled session store has avoided."
+
+    def handle(self, *args, **options):
+        stats = get_session_write_stats()
+        written = stats.get('written', 0)
+        touched = stats.get('touched', 0)
+        skipped = stats.get('skipped', 0)
+        total = written + touched + skipped
+
+        self.stdout.write(f"payload writes : {written}")
+        self.stdout.write(f"expiry bumps   : {touched}")
+        self.stdout.write(f"skipped saves  : {skipped}")
+        if total:
+            self.stdout.write(f"avoided writes : {touched + skipped} of {total} ({(touched + skipped) / total:.1%})")
@@ -1,10 +1,9 @@
-import redis
-from django.conf import settings
 from django.contrib.auth import logout
 from django.shortcuts import redirect
 from django.contrib import messages
 
-redis_client = redis.StrictRedis.from_url(settings.CACHES["default"]["LOCATION"], decode_responses=True)
+from .user_sessions import get_user_session
+
 
 class OneSessionPerUserMiddleware:
     def __init__(self, get_response):
@@ -12,9 +11,12 @@ class OneSessionPerUserMiddleware:
 
     def __call__(self, request):
         if request.user.is_authenticated:
-            user_session_key = f"user_session:{request.user.pk}"
-            session_id = redis_client.get(user_session_key)
+            # Served from the in-process cache most of the time, see account.user_sessions
+            session_id = get_user_session(request.user.pk)
 
+            if session_id and session_id != request.session.session_key:
+                # the cached key may predate a login handled by another process; only Redis decides
+                session_id = get_user_session(request.user.pk, cached=False)
             if session_id and session_id != request.session.session_key:
                 logout(request)
                 messages.warning(request, "دستگاه دیگری به حساب کاربری شما وارد شده است")
@@ -195,6 +195,27 @@ class User(AbstractUser):
         self.save()
 
 
+class LoginRecord(models.Model):
+    """ One successful login, written in batches by account.tasks.flush_login_audit """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='login_records',
+        verbose_name="کاربر",
+    )
+    ip = models.GenericIPAddressField(null=True, blank=True, verbose_name="آدرس آی‌پی")
+    user_agent = models.CharField(max_length=255, blank=True, verbose_name="مرورگر")
+    logged_in_at = models.DateTimeField(verbose_name="زمان ورود")
+
+    class Meta:
+        verbose_name = _("سابقه ورود")
+        verbose_name_plural = _("سوابق ورود به سیستم")
+        ordering = ['-logged_in_at']
+
+    def __str__(self):
+        return f"{self.user} - {self.logged_in_at}"
+
+
 # change name of django defualt app names
 auth_group._meta.verbose_name = "گروه کاربران"  # Singular name
 auth_group._meta.verbose_name_plural = "گروه های کاربران"  # Plural name
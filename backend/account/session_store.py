@@ -0,0 +1,88 @@
+import copy
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.sessions.backends.base import UpdateError
+from django.contrib.sessions.backends.cache import SessionStore as CacheSessionStore
+from django_redis import get_redis_connection
+
+# Sliding expiry is refreshed with an EXPIRE at most once per interval (seconds) per
+# session and process. The server side expiry can therefore lag the cookie by that much.
+SESSION_TOUCH_INTERVAL = getattr(settings, 'SESSION_TOUCH_INTERVAL', 60)
+
+SESSION_WRITE_STATS_KEY = "session_write_stats"
+
+# written: full payload SET | touched: EXPIRE only | skipped: no round trip at all
+session_write_stats = Counter()
+_last_touched = {}
+_last_flushed = {'at': time.monotonic()}
+
+
+class SessionStore(CacheSessionStore):
+    """
+    Cache session store for SESSION_SAVE_EVERY_REQUEST = True that only rewrites the
+    payload when it changed and otherwise extends the expiry with a throttled EXPIRE.
+    """
+
+    def load(self):
+        session_data = super().load()
+        self._loaded_session = copy.deepcopy(session_data)
+        return session_data
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()  # saves again with must_create=True
+        if must_create or self._payload_changed():
+            super().save(must_create=must_create)
+            self._record('written')
+            _last_touched[self.session_key] = time.monotonic()
+            return
+
+        now = time.monotonic()
+        if now - _last_touched.get(self.session_key, 0) < SESSION_TOUCH_INTERVAL:
+            self._record('skipped')
+            return
+
+        if not self._cache.touch(self.cache_key, self.get_expiry_age()):
+            # the session was deleted meanwhile (e.g. logout from another tab)
+            raise UpdateError
+        _last_touched[self.session_key] = now
+        self._record('touched')
+
+    def delete(self, session_key=None):
+        _last_touched.pop(session_key or self.session_key, None)
+        super().delete(session_key)
+
+    def _payload_changed(self):
+        if not hasattr(self, '_session_cache'):
+            return False  # never loaded during this request, so it cannot have changed
+        return self._session_cache != getattr(self, '_loaded_session', None)
+
+    def _record(self, outcome):
+        session_write_stats[outcome] += 1
+        now = time.monotonic()
+        if now - _last_flushed['at'] >= SESSION_TOUCH_INTERVAL:
+            _flush_session_write_stats()
+            _last_flushed['at'] = now
+            # forget sessions that have not been seen for a whole interval
+            for session_key, touched_at in list(_last_touched.items()):
+                if now - touched_at >= SESSION_TOUCH_INTERVAL:
+                    del _last_touched[session_key]
+
+
+def _flush_session_write_stats():
+    """ Add this process' counters to the shared Redis hash and reset them """
+    if not session_write_stats:
+        return
+    pipeline = get_redis_connection(settings.SESSION_CACHE_ALIAS).pipeline()
+    for outcome, count in session_write_stats.items():
+        pipeline.hincrby(SESSION_WRITE_STATS_KEY, outcome, count)
+    pipeline.execute()
+    session_write_stats.clear()
+
+
+def get_session_write_stats():
+    """ Counters aggregated over every process that flushed so far """
+    stats = get_redis_connection(settings.SESSION_CACHE_ALIAS).hgetall(SESSION_WRITE_STATS_KEY)
+    return {outcome.decode(): int(count) for outcome, count in stats.items()}
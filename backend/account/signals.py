@@ -2,52 +2,43 @@ from django.contrib.auth.models import Permission, Group
 from django.contrib.auth.signals import user_logged_in, user_login_failed
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from django.utils.timezone import now
 from django.contrib import messages  # For displaying messages
-from .models import User
+from .login_audit import record_login
+from .login_attempts import record_login_failure, is_locked_out, flush_login_failures
 
 
 @receiver(user_logged_in)
 def update_last_login_ip(sender, request, user, **kwargs):
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    ip = x_forwarded_for.split(',')[0] if x_forwarded_for else request.META.get('REMOTE_ADDR')
-    user.set_last_login_ip(ip)
+    # last_login_ip is written in batches by account.tasks.flush_login_audit_task; Django's own receiver
+    # still saves last_login at once, the password reset tokens depend on it
+    record_login(request, user)
 
 
-@receiver(user_login_failed)
-def handle_failed_login(sender, credentials, request, **kwargs):
-    try:
-        # Retrieve the username from the login credentials
-        username = credentials.get('username', '')
-
-        # If there's no username, don't proceed further
-        if not username:
-            return
-
-        # Try to get the user with the provided username
-        user = User.objects.get(username=username)
-
-        # Increment the failed login attempts counter
-        user.failed_login_attempts += 1
-
-        # Record the last failed login attempt time
-        user.last_failed_login = now()
-
-        # Optionally, check if the user has exceeded the maximum failed attempts
-        # You can set your own threshold, like 5 attempts in this example
-        if user.failed_login_attempts >= 5:
-            user.is_locked = True  # Lock the account after 5 failed attempts
-            user.save()
-
-            # Send a message that the account is locked
-            messages.error(request, 'حساب شما به دلیل تلاش های زیاد برای ورود ناموفق قفل شده است.')
-
-        else:
-            user.save()
+@receiver(user_logged_in)
+def flush_failed_logins(sender, request, user, **kwargs):
+    # Failures counted in Redis since the last lockout are written in one UPDATE
+    flush_login_failures(user.get_username())
 
-        # Save the updated user data
-        user.save()
-    except User.DoesNotExist:
-        # Handle invalid username scenario - display an error message
-        messages.error(request, 'نام کاربری یا رمز عبور نامعتبر است. لطفا دوباره امتحان کنید.')
 
+@receiver(user_login_failed)
+def handle_failed_login(sender, credentials, request, **kwargs):
+    # Retrieve the username from the login credentials
+    username = credentials.get('username', '')
+
+    # If there's no username, don't proceed further
+    if not username or request is None:
+        return
+
+    # CustomAdminSite.login authenticates twice for a wrong password, count the attempt once
+    if getattr(request, '_login_failure_recorded', False):
+        return
+    request._login_failure_recorded = True
+
+    if is_locked_out(username):
+        # Rejected by LockoutModelBackend, the password was not even checked
+        messages.error(request, 'حساب شما به دلیل تلاش های زیاد برای ورود ناموفق قفل شده است.')
+        return
+
+    # Sliding window counter in Redis, the user row is only updated on lockout
+    if record_login_failure(username):
+        messages.error(request, 'حساب شما به دلیل تلاش های زیاد برای ورود ناموفق قفل شده است.')
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import logging
+import random
+import re
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils import timezone
+
+from .user_sessions import get_redis
+
+logger = logging.getLogger(__name__)
+
+SQL_PROFILE_LOG_KEY = "sql_profiler:log"
+
+SQL_PROFILER_SAMPLE_RATE = getattr(settings, 'SQL_PROFILER_SAMPLE_RATE', 1.0)
+# A fingerprint executed this many times in one request is reported as an N+1 suspect
+SQL_PROFILER_N_PLUS_ONE_THRESHOLD = getattr(settings, 'SQL_PROFILER_N_PLUS_ONE_THRESHOLD', 5)
+SQL_PROFILER_LOG_SIZE = getattr(settings, 'SQL_PROFILER_LOG_SIZE', 500)
+SQL_PROFILER_STACK_DEPTH = 8
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+# Frames of these files are skipped when looking for the code that issued a query
+_PROJECT_ROOT = str(settings.BASE_DIR)
+_IGNORED_FILES = (__file__, 'site-packages', 'dist-packages')
+
+
+def normalize_sql(sql):
+    """ SQL with its literals and placeholders replaced, so `WHERE id = 1` and `WHERE id = 2` match """
+    sql = sql.replace('%s', '?')
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.md5(normalized_sql.encode()).hexdigest()[:12]
+
+
+def call_site():
+    """ Innermost project frames (file:line function) of the current stack, outermost last """
+    frames = []
+    frame = sys._getframe(2)
+    while frame is not None and len(frames) < SQL_PROFILER_STACK_DEPTH:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_PROJECT_ROOT) and not any(part in filename for part in _IGNORED_FILES):
+            frames.append(f"{filename[len(_PROJECT_ROOT) + 1:]}:{frame.f_lineno} {frame.f_code.co_name}")
+        frame = frame.f_back
+    return frames
+
+
+class QueryRecorder:
+    """
+    connection.execute_wrapper that groups the queries of one request by fingerprint.
+    Works with DEBUG off; only the first call site of each fingerprint is kept.
+    """
+
+    def __init__(self):
+        self.queries = defaultdict(lambda: {'count': 0, 'ms': 0.0})
+        self.total = 0
+        self.total_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            normalized = normalize_sql(sql)
+            entry = self.queries[fingerprint(normalized)]
+            if not entry['count']:
+                entry['sql'] = normalized
+                entry['stack'] = call_site()
+            entry['count'] += 1
+            entry['ms'] += elapsed
+            self.total += 1
+            self.total_ms += elapsed
+
+    def suspects(self):
+        return sorted(
+            ({'fingerprint': key, **entry, 'ms': round(entry['ms'], 2)}
+             for key, entry in self.queries.items() if entry['count'] >= SQL_PROFILER_N_PLUS_ONE_THRESHOLD),
+            key=lambda entry: entry['count'], reverse=True,
+        )
+
+
+def should_profile(request):
+    if request.path.startswith(('/static/', '/admin/sql-profiler/')):
+        return False
+    return random.random() < SQL_PROFILER_SAMPLE_RATE
+
+
+def record_profile(request, response, recorder, duration_ms):
+    """ Push the profile of one request to the rolling Redis log; never fails the request """
+    user = getattr(request, 'user', None)
+    entry = {
+        'at': timezone.now().isoformat(timespec='seconds'),
+        'method': request.method,
+        'path': request.get_full_path(),
+        'view': getattr(request.resolver_match, 'view_name', None),
+        'user': user.get_username() if user is not None and user.is_authenticated else None,
+        'status': response.status_code,
+        'ms': round(duration_ms, 1),
+        'queries': recorder.total,
+        'db_ms': round(recorder.total_ms, 1),
+        'fingerprints': len(recorder.queries),
+        'suspects': recorder.suspects(),
+    }
+    try:
+        pipe = get_redis().pipeline()
+        pipe.lpush(SQL_PROFILE_LOG_KEY, json.dumps(entry, ensure_ascii=False))
+        pipe.ltrim(SQL_PROFILE_LOG_KEY, 0, SQL_PROFILER_LOG_SIZE - 1)
+        pipe.execute()
+    except Exception:
+        logger.warning("could not store the SQL profile of %s", entry['path'], exc_info=True)
+    if entry['suspects']:
+        logger.warning("N+1 suspects in %s %s: %s", entry['method'], entry['path'],
+                       ", ".join(f"{s['count']}x {s['sql'][:80]}" for s in entry['suspects']))
+    return entry
+
+
+def read_profiles(limit=SQL_PROFILER_LOG_SIZE, suspects_only=False):
+    entries = [json.loads(raw) for raw in get_redis().lrange(SQL_PROFILE_LOG_KEY, 0, limit - 1)]
+    if suspects_only:
+        entries = [entry for entry in entries if entry['suspects']]
+    return entries
+
+
+def clear_profiles():
+    get_redis().delete(SQL_PROFILE_LOG_KEY)
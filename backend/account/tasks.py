@@ -0,0 +1,10 @@
+from celery import shared_task
+
+from .login_audit import flush_login_audit
+
+
+@shared_task(queue='queue3', ignore_result=True)
+def flush_login_audit_task(batch_size=1000):
+    # Drain the buffer, one batch per transaction
+    while flush_login_audit(batch_size) == batch_size:
+        pass
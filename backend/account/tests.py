@@ -1,3 +1,224 @@
-from django.test import TestCase
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.signals import user_login_failed
+from django.contrib.sessions.backends.base import UpdateError
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from . import login_attempts, session_store, user_sessions
+from .login_attempts import (
+    LOGIN_FAILURE_LIMIT, LOGIN_FAILURE_WINDOW, clear_login_failures, flush_login_failures, is_locked_out,
+    record_login_failure,
+)
+from .session_store import SESSION_WRITE_STATS_KEY, SessionStore, get_session_write_stats
+from .user_sessions import USER_SESSION_CHANNEL, USER_SESSION_KEY, get_redis, get_user_session, set_user_session
+
+
+def create_user(username='tester', **fields):
+    return get_user_model().objects.create_user(
+        username=username, password='secret-password', email=f'{username}@guilan.ac.ir',
+        phone_number='09900000001', first_name='کاربر', last_name='آزمایشی', role='ALL', is_staff=True, **fields,
+    )
+
+
+class UserSessionTests(TestCase):
+    """ The session key of each user's last login, cached per process and replaced over pub/sub """
+
+    def setUp(self):
+        self.user = create_user()
+        self.key = USER_SESSION_KEY.format(self.user.pk)
+        user_sessions._session_cache.clear()
+        self.addCleanup(get_redis().delete, self.key)
+
+    def wait_for(self, expected, timeout=3):
+        deadline = time.monotonic() + timeout
+        while get_user_session(self.user.pk) != expected:
+            self.assertLess(time.monotonic(), deadline, "the replacement was not pushed to this process")
+            time.sleep(0.05)
+
+    def test_cached_key_is_served_without_redis(self):
+        redis = get_redis()
+        redis.set(self.key, 'first')
+        self.assertEqual(get_user_session(self.user.pk), 'first')
+        # written by another process that could not publish it
+        redis.set(self.key, 'second')
+        self.assertEqual(get_user_session(self.user.pk), 'first')
+        self.assertEqual(get_user_session(self.user.pk, cached=False), 'second')
+        self.assertEqual(get_user_session(self.user.pk), 'second')
+
+    def test_replacement_is_pushed_to_other_processes(self):
+        set_user_session(self.user.pk, 'first')
+        self.assertEqual(get_user_session(self.user.pk), 'first')  # starts the listener
+        # another process logs the user in: set_user_session there
+        redis = get_redis()
+        redis.set(self.key, 'second')
+        redis.publish(USER_SESSION_CHANNEL, str(self.user.pk))
+        self.wait_for('second')
+
+    def test_missing_session_is_none(self):
+        self.assertIsNone(get_user_session(self.user.pk))
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class OneSessionPerUserMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user()
+        user_sessions._session_cache.clear()
+        self.addCleanup(get_redis().delete, USER_SESSION_KEY.format(self.user.pk))
+        self.client.force_login(self.user)
+        # as set_user_session, without a message that would drop what the tests put in the cache
+        get_redis().set(USER_SESSION_KEY.format(self.user.pk), self.client.session.session_key)
+
+    def test_current_session_is_let_through(self):
+        response = self.client.get('/admin/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_stale_cached_key_is_checked_in_redis(self):
+        # this process still holds the key of an earlier login, Redis has the current one
+        user_sessions._session_cache[str(self.user.pk)] = ('earlier', time.monotonic() + 60)
+        response = self.client.get('/admin/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_user_session(self.user.pk), self.client.session.session_key)
+
+    def test_login_elsewhere_logs_out(self):
+        set_user_session(self.user.pk, 'elsewhere')
+        response = self.client.get('/admin/')
+        self.assertRedirects(response, '/admin/login/', fetch_redirect_response=False)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+
+class SessionStoreTests(SimpleTestCase):
+    """ SessionStore writes a session only when it changed and extends its expiry once per interval """
+
+    def setUp(self):
+        session_store.session_write_stats.clear()
+        session_store._last_touched.clear()
+        self.now = time.monotonic()
+        session_store._last_flushed['at'] = self.now
+        patcher = mock.patch.object(session_store.time, 'monotonic', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        get_redis().delete(SESSION_WRITE_STATS_KEY)
+        self.addCleanup(get_redis().delete, SESSION_WRITE_STATS_KEY)
+
+        session = SessionStore()
+        session['user'] = 'tester'
+        session.save()
+        self.addCleanup(session.delete)
+        self.session_key = session.session_key
+
+    def save_unchanged(self):
+        """ Save the session as a request that only read it does; returns the cache calls """
+        session = SessionStore(self.session_key)
+        session.load()
+        session._cache = mock.Mock(wraps=session._cache)
+        session.save()
+        return session._cache
+
+    def test_new_session_is_written(self):
+        self.assertEqual(session_store.session_write_stats, {'written': 1})
+
+    def test_unchanged_session_is_not_written_within_the_interval(self):
+        self.now += session_store.SESSION_TOUCH_INTERVAL - 1
+        cache = self.save_unchanged()
+        cache.set.assert_not_called()
+        cache.touch.assert_not_called()
+        self.assertEqual(session_store.session_write_stats['skipped'], 1)
+
+    def test_unchanged_session_is_touched_after_the_interval(self):
+        self.now += session_store.SESSION_TOUCH_INTERVAL
+        cache = self.save_unchanged()
+        cache.set.assert_not_called()
+        cache.touch.assert_called_once_with(session_store.SessionStore.cache_key_prefix + self.session_key,
+                                            SessionStore(self.session_key).get_expiry_age())
+        # a whole interval went by, so the counters were flushed as well
+        self.assertEqual(get_session_write_stats()['touched'], 1)
+
+    def test_changed_session_is_written(self):
+        session = SessionStore(self.session_key)
+        session['user'] = 'someone else'
+        session.save()
+        self.assertEqual(session_store.session_write_stats['written'], 2)
+        self.assertEqual(SessionStore(self.session_key)['user'], 'someone else')
+
+    def test_deleted_session_is_not_touched_back(self):
+        self.now += session_store.SESSION_TOUCH_INTERVAL
+        session = SessionStore(self.session_key)
+        session.load()
+        SessionStore(self.session_key).delete()
+        with self.assertRaises(UpdateError):
+            session.save()
+
+    def test_avoided_writes_are_counted_in_redis(self):
+        self.save_unchanged()
+        self.save_unchanged()
+        self.assertEqual(get_session_write_stats(), {})  # not flushed before the interval
+        self.now += session_store.SESSION_TOUCH_INTERVAL
+        self.save_unchanged()
+        self.assertEqual(get_session_write_stats(), {'written': 1, 'skipped': 2, 'touched': 1})
+        self.assertFalse(session_store.session_write_stats)
+
+
+class LoginAttemptTests(TestCase):
+    """ Failed logins counted in a Redis sliding window, written to the user row on lockout or login """
+
+    def setUp(self):
+        self.user = create_user()
+        self.addCleanup(clear_login_failures, self.user.username)
+        self.now = time.time()
+        patcher = mock.patch.object(login_attempts, 'time', mock.Mock(time=lambda: self.now))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fail(self, times=1):
+        return [record_login_failure(self.user.username) for _ in range(times)]
+
+    def test_failures_below_the_limit_stay_in_redis(self):
+        self.assertEqual(self.fail(LOGIN_FAILURE_LIMIT - 1), [False] * (LOGIN_FAILURE_LIMIT - 1))
+        self.assertFalse(is_locked_out(self.user.username))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.failed_login_attempts, 0)
+
+    def test_limit_locks_and_flushes_the_window(self):
+        self.assertEqual(self.fail(LOGIN_FAILURE_LIMIT), [False] * (LOGIN_FAILURE_LIMIT - 1) + [True])
+        self.assertTrue(is_locked_out(self.user.username))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.failed_login_attempts, LOGIN_FAILURE_LIMIT)
+        self.assertAlmostEqual(self.user.last_failed_login.timestamp(), self.now, places=3)
+        # the lock is taken once; later failures start a new window
+        self.assertEqual(self.fail(), [False])
+
+    def test_window_slides(self):
+        self.fail(LOGIN_FAILURE_LIMIT - 1)
+        self.now += LOGIN_FAILURE_WINDOW + 1
+        self.assertEqual(self.fail(), [False])
+        self.assertFalse(is_locked_out(self.user.username))
+
+    def test_flush_adds_to_the_row(self):
+        get_user_model().objects.filter(pk=self.user.pk).update(failed_login_attempts=3)
+        self.fail(2)
+        self.assertEqual(flush_login_failures(self.user.username), 1)
+        self.assertEqual(flush_login_failures(self.user.username), 0)  # nothing pending any more
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.failed_login_attempts, 5)
+
+    def test_locked_account_is_rejected_before_the_password(self):
+        self.fail(LOGIN_FAILURE_LIMIT)
+        failed = mock.Mock()
+        user_login_failed.connect(failed)
+        self.addCleanup(user_login_failed.disconnect, failed)
+        with mock.patch('django.contrib.auth.backends.ModelBackend.authenticate') as checked:
+            self.assertIsNone(authenticate(username=self.user.username, password='secret-password'))
+        checked.assert_not_called()
+        failed.assert_called_once()
+
+        clear_login_failures(self.user.username)
+        self.assertEqual(authenticate(username=self.user.username, password='secret-password'), self.user)
+
+    def test_login_flushes_pending_failures(self):
+        self.fail(2)
+        self.assertTrue(self.client.login(username=self.user.username, password='secret-password'))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.failed_login_attempts, 2)
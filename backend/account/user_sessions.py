@@ -0,0 +1,80 @@
+import os
+import threading
+import time
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from core.metrics import REDIS_ROUNDTRIP, USER_SESSION_LOOKUPS
+
+USER_SESSION_KEY = "user_session:{}"
+USER_SESSION_CHANNEL = "user_session:replaced"
+
+# How many seconds a session key read from Redis is trusted by this process.
+# Replaced sessions are pushed over pub/sub, the TTL only bounds staleness when
+# that channel is unavailable.
+USER_SESSION_CACHE_TTL = getattr(settings, 'USER_SESSION_CACHE_TTL', 5)
+
+_session_cache = {}
+_listener = {'pid': None, 'thread': None}
+_listener_lock = threading.Lock()
+
+
+def get_redis():
+    """ Redis client sharing the django-redis connection pool of the default cache """
+    return get_redis_connection("default")
+
+
+def get_user_session(user_pk, cached=True):
+    """ Return the session key of the last login of this user, or None """
+    user_pk = str(user_pk)
+    if cached:
+        _ensure_listener()
+        entry = _session_cache.get(user_pk)
+        if entry is not None and entry[1] > time.monotonic():
+            USER_SESSION_LOOKUPS.labels(source='process').inc()
+            return entry[0]
+
+    USER_SESSION_LOOKUPS.labels(source='redis').inc()
+    with REDIS_ROUNDTRIP.labels(operation='get').time():
+        session_key = get_redis().get(USER_SESSION_KEY.format(user_pk))
+    if session_key is not None:
+        session_key = session_key.decode()
+    _session_cache[user_pk] = (session_key, time.monotonic() + USER_SESSION_CACHE_TTL)
+    return session_key
+
+
+def set_user_session(user_pk, session_key):
+    """ Make `session_key` the only valid session of this user and tell every process about it """
+    user_pk = str(user_pk)
+    redis = get_redis()
+    with REDIS_ROUNDTRIP.labels(operation='set').time():
+        redis.set(USER_SESSION_KEY.format(user_pk), session_key)
+    with REDIS_ROUNDTRIP.labels(operation='publish').time():
+        redis.publish(USER_SESSION_CHANNEL, user_pk)
+    _session_cache[user_pk] = (session_key, time.monotonic() + USER_SESSION_CACHE_TTL)
+
+
+def _invalidate(message):
+    _session_cache.pop(message['data'].decode(), None)
+
+
+def _ensure_listener():
+    """
+    Subscribe this process to session replacements. The listener is (re)started
+    after a fork or when its thread died, dropping whatever was cached meanwhile.
+    """
+    pid = os.getpid()
+    thread = _listener['thread']
+    if _listener['pid'] == pid and thread is not None and thread.is_alive():
+        return
+
+    with _listener_lock:
+        thread = _listener['thread']
+        if _listener['pid'] == pid and thread is not None and thread.is_alive():
+            return
+        _session_cache.clear()
+        pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{USER_SESSION_CHANNEL: _invalidate})
+        _listener['thread'] = pubsub.run_in_thread(sleep_time=1, daemon=True)
+        _listener['pid'] = pid
@@ -1,27 +1,48 @@
+import time
+
 import openpyxl
 
 from django.contrib import admin, messages
-from django.core.exceptions import ValidationError
+from django.contrib.admin.utils import unquote
+from django.core.exceptions import PermissionDenied, ValidationError
 from django.db.models.functions import Concat
 from django.forms import BaseInlineFormSet
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import redirect, render
-from django.urls import path
-from django.utils.html import format_html
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
+from django.utils.safestring import mark_safe
+from django.utils.timezone import localtime
 
 from jalali_date import datetime2jalali, date2jalali
 from jalali_date.admin import ModelAdminJalaliMixin
+from jalali_date.fields import JalaliDateField
 
-from .models import Session, JudgeAssignment
+from . import judge_counts, occupancy
+from .models import ArchivedSession, Session, SessionHistory, SessionReminder, JudgeAssignment
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Q, F, Case, When, Value, CharField
+from django.db.models import Q, F, Case, When, Value, CharField, Prefetch
 from django import forms
 from jalali_date.widgets import AdminJalaliDateWidget
 from django_flatpickr.widgets import TimePickerInput  # Import Flatpickr widget
 
+from core.metrics import observe_export
+from core.tracing import span, validation_step
+from schedule.calendar import in_month
 from schedule.models import Schedule
 
-from university_adminstration.models import FacultyEducationalGroup, Student
+from university_adminstration.models import FacultyEducationalGroup, Student, Teacher
+
+
+# Columns of the session Excel exports, live (download_session) and archived
+SESSION_EXPORT_HEADER = ["دانشکده و گروه آموزشی" , 'سال', 'نیم‌سال', 'تاریخ', 'ساعت شروع', 'ساعت پایان',
+                         'دانشجو', 'استاد راهنما اول', 'استاد راهنما دوم',
+                         'استاد مشاور اول', 'استاد مشاور دوم', 'ناظر تحصیلات تکمیلی',
+                         "داوران حاضر در این نشست"]
+
+
+# Entries shown on a session's history page
+TIMELINE_SIZE = 500
 
 
 class MonthFilter_created_at(admin.SimpleListFilter):
@@ -51,16 +72,8 @@ class MonthFilter_created_at(admin.SimpleListFilter):
             except ValueError:
                 return queryset  # If invalid input, return unfiltered queryset
 
-            # Get only required fields from DB (optimization)
-            created_at_dates = queryset.values_list('id', 'created_at')
-
-            # Filter using datetime2jalali without looping over queryset directly
-            matching_ids = [
-                id for id, created_at in created_at_dates
-                if created_at and datetime2jalali(created_at).month == jalali_month
-            ]
-
-            return queryset.filter(id__in=matching_ids)  # Filter efficiently
+            # the days of that month come from the calendar table, the rows are never read into Python
+            return queryset.filter(in_month('created_at__date', jalali_month))
 
         return queryset  # If no filter is applied, return the original queryset
 
@@ -92,16 +105,8 @@ class MonthFilter_updated_at(admin.SimpleListFilter):
             except ValueError:
                 return queryset  # If invalid input, return unfiltered queryset
 
-            # Get only required fields from DB (optimization)
-            updated_at_dates = queryset.values_list('id', 'updated_at')
-
-            # Filter using datetime2jalali without looping over queryset directly
-            matching_ids = [
-                id for id, updated_at in updated_at_dates
-                if updated_at and datetime2jalali(updated_at).month == jalali_month
-            ]
-
-            return queryset.filter(id__in=matching_ids)  # Filter efficiently
+            # the days of that month come from the calendar table, the rows are never read into Python
+            return queryset.filter(in_month('updated_at__date', jalali_month))
 
         return queryset  # If no filter is applied, return the original queryset
 
@@ -192,6 +197,7 @@ class JudgeAssignmentFormSet(BaseInlineFormSet):
 
         self.validate_professors_as_judges_db()
 
+    @validation_step
     def validate_judges(self, judges):
         session = self.instance
         # === check None Fields ! ===
@@ -230,7 +236,8 @@ class JudgeAssignmentFormSet(BaseInlineFormSet):
         sessions_with_judge = Session.objects.filter(
             date=session.date,  # Same date
             schedule=session.schedule,  # Same schedule
-            judges__judge__in=judges  # Judge is assigned to the session
+            judges__judge__in=judges,  # Judge is assigned to the session
+            judges__schedule=session.schedule,  # Only the judges partition of this schedule is read
         ).exclude(id=session.id)  # Exclude the current session if it's an update
 
         # Check for time conflicts
@@ -252,6 +259,7 @@ class JudgeAssignmentFormSet(BaseInlineFormSet):
                 f''
             )
 
+    @validation_step
     def validate_judges_as_professors_db(self, judges):
         session = self.instance
         # Filter all sessions on the same date and schedule, excluding the current session
@@ -302,6 +310,7 @@ class JudgeAssignmentFormSet(BaseInlineFormSet):
                 f''
             )
 
+    @validation_step
     def validate_professors_as_judges_db(self):
         session = self.instance  # Parent `Session` instance
         # Combine all professors into a single queryable list
@@ -318,6 +327,7 @@ class JudgeAssignmentFormSet(BaseInlineFormSet):
             date=session.date,  # Same date
             schedule=session.schedule,  # Same schedule
             judges__judge__in=professors,  # Judge is one of the professors
+            judges__schedule=session.schedule,  # Only the judges partition of this schedule is read
         ).exclude(id=session.id)  # Exclude the current session if it's an update
 
         # Step 2: Check for time conflicts
@@ -353,6 +363,7 @@ class JudgeAssignmentFormSet(BaseInlineFormSet):
                 f''
             )
 
+    @validation_step
     def validate_not_duplicate_judges_at_sameSession(self, judges):
         if len(judges) != len(set(judges)):
             e = (
@@ -363,6 +374,7 @@ class JudgeAssignmentFormSet(BaseInlineFormSet):
                 f''
             )
 
+    @validation_step
     def validate_not_duplicate_professors_and_judges_atSameSession(self, judges):
         # Validate against supervisors and graduate_monitor in the parent form
         parent_session = self.instance  # Parent `Session` instance
@@ -424,6 +436,8 @@ class SessionAdminForm(forms.ModelForm):
 
         self.fields['faculty_educational_group'].empty_label = None
         self.fields['student'].empty_label = None
+        # sessions of archived semesters live in ArchivedSession, see assignment.archive
+        self.fields['schedule'].queryset = Schedule.objects.filter(archived_at__isnull=True)
 
     class Meta:
         model = Session
@@ -477,12 +491,14 @@ class SessionAdminForm(forms.ModelForm):
 
         self.valiadte_students(overlapping_sessions)
 
+    @validation_step
     def validate_empty_fields(self):
         if self.start_time == None or self.end_time == None or self.student == None\
                 or self.class_number == None or self.supervisor1 == None or self.graduate_monitor == None\
                 or self.faculty_educational_group == None:
             raise ValidationError(f'')
 
+    @validation_step
     def valiadte_students(self, overlapping_sessions):
         # Find all conflicting sessions with any of the given student
         conflicting_sessions = overlapping_sessions.filter(
@@ -500,6 +516,7 @@ class SessionAdminForm(forms.ModelForm):
             )
             raise forms.ValidationError(f'')
 
+    @validation_step
     def validate_overlapingSessions(self):
         # Check for time conflicts in the same term (date) and schedule and class_number
         overlapping_sessions = Session.objects.filter(
@@ -522,6 +539,7 @@ class SessionAdminForm(forms.ModelForm):
                 messages.error(self.request, f"این نشست تداخل زمانی دارد با نشست دیگری با شناسه {session.id} در تاریخ {session.get_date_jalali} در بازه زمانی {session.start_time} - {session.end_time} ")
                 raise forms.ValidationError(f"")
 
+    @validation_step
     def validate_professors(self, roles, overlapping_sessions):
         # Remove any None values (empty fields)
         professors = [prof for prof in roles if prof is not None]
@@ -570,6 +588,75 @@ class SessionAdminForm(forms.ModelForm):
             raise forms.ValidationError(f'')
 
 
+class ConflictCheckForm(forms.Form):
+    """ The session form's values sent by check_conflicts.js, people as ids """
+    session = forms.IntegerField(required=False)
+    schedule = forms.IntegerField()
+    date = JalaliDateField()
+    start_time = forms.TimeField()
+    end_time = forms.TimeField()
+    class_number = forms.CharField(required=False)
+    student = forms.IntegerField(required=False)
+    supervisor1 = forms.IntegerField(required=False)
+    supervisor2 = forms.IntegerField(required=False)
+    supervisor3 = forms.IntegerField(required=False)
+    supervisor4 = forms.IntegerField(required=False)
+    graduate_monitor = forms.IntegerField(required=False)
+
+
+def describe_changes(entries):
+    """
+    Readable (label, old, new) rows of the `changes` of history entries; the people,
+    groups and schedules they mention are looked up with one query per model
+    """
+    referenced = {Teacher: set(), Student: set(), FacultyEducationalGroup: set(), Schedule: set()}
+    fields = {}
+    for entry in entries:
+        model = JudgeAssignment if entry.model == 'judge' else Session
+        for attname, values in entry.changes.items():
+            field = fields.setdefault((model, attname), model._meta.get_field(attname.removesuffix('_id')))
+            if field.is_relation and field.related_model in referenced:
+                referenced[field.related_model].update(value for value in values if value is not None)
+    names = {model: model.objects.in_bulk(ids) for model, ids in referenced.items() if ids}
+
+    def display(field, value):
+        if value is None or value == '':
+            return '-'
+        if field.is_relation:
+            obj = names.get(field.related_model, {}).get(value)
+            return getattr(obj, 'name', None) or str(obj or value)
+        if field.choices:
+            return dict(field.flatchoices).get(value, value)
+        if isinstance(value, bool):
+            return 'بله' if value else 'خیر'
+        return value
+
+    for entry in entries:
+        model = JudgeAssignment if entry.model == 'judge' else Session
+        entry.rows = [
+            (fields[(model, attname)].verbose_name, display(fields[(model, attname)], old),
+             display(fields[(model, attname)], new))
+            for attname, (old, new) in entry.changes.items()
+        ]
+        entry.changed_at_jalali = datetime2jalali(localtime(entry.changed_at)).strftime('%a, %d %b %Y | %H:%M:%S')
+    return entries
+
+
+def session_timeline(model_admin, request, session_id, obj):
+    """ The change history of one session, newest first; replaces the admin history page """
+    entries = describe_changes(list(
+        SessionHistory.objects.filter(session_id=session_id).order_by('-changed_at', '-id')[:TIMELINE_SIZE]
+    ))
+    return render(request, 'assignment/session_history.html', {
+        **model_admin.admin_site.each_context(request),
+        'title': f"تاریخچه تغییرات جلسه {session_id}",
+        'object': obj,
+        'opts': model_admin.model._meta,
+        'entries': entries,
+        'timeline_size': TIMELINE_SIZE,
+    })
+
+
 class SessionAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     form = SessionAdminForm
     inlines = [JudgeAssignmentInline]
@@ -598,8 +685,10 @@ class SessionAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
                    Consultant_ProfessorCountFilter,
                    )
 
+    # `student` is searched through StudentAdmin (faculty scoped, paginated) instead of
+    # rendering every student as an <option>
     autocomplete_fields = [
-        'supervisor1', 'supervisor2', 'supervisor3', 'supervisor4', 'graduate_monitor',
+        'student', 'supervisor1', 'supervisor2', 'supervisor3', 'supervisor4', 'graduate_monitor',
     ]
 
     # Make sure the fields are read-only in certain cases, or configure which ones can be modified
@@ -614,6 +703,10 @@ class SessionAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     #           'js/admin_assignment_session/filter_graduate_monitor.js',
     #           'js/admin_assignment_session/filter_judges.js',)
 
+    class Media:
+        # reports conflicts while the form is filled in, see check_conflicts
+        js = ('js/admin_assignment_session/check_conflicts.js',)
+
     # Add a custom URL to the admin panel
     change_form_template = 'assignment/admin/change_form.html'
 
@@ -623,7 +716,10 @@ class SessionAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
             case 'ALL':
                 return queryset
             case _:
-                return queryset.filter(faculty_educational_group__faculty=request.user.role)
+                # The group ids rather than a join: through the join PostgreSQL underestimates the sessions
+                # of a faculty and sorts every partition (assignment.partitions) instead of walking their keys
+                groups = FacultyEducationalGroup.objects.filter(faculty=request.user.role).values_list('id', flat=True)
+                return queryset.filter(faculty_educational_group__in=list(groups))
 
     def edit_session(self, obj):
         return format_html('<a href="{}">مشاهده</a>', f"/admin/assignment/session/{obj.id}/change/")
@@ -637,6 +733,7 @@ class SessionAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
         urls = super().get_urls()
         custom_urls = [
             path('download_session', self.admin_site.admin_view(self.download_session), name='download_session'),
+            path('check_conflicts', self.admin_site.admin_view(self.check_conflicts), name='check_session_conflicts'),
         ]
         return custom_urls + urls
 
@@ -651,16 +748,24 @@ class SessionAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
 
     def download_session(self, request):
         if request.method == "POST":  # If the user clicks "Download CSV"
+            started = time.perf_counter()
             schedule_filter = request.POST.get('schedule', None)
             faculty_filter = request.POST.get('faculty', None)
             # Query the filtered data
+            judges = JudgeAssignment.objects.select_related('judge')
             if schedule_filter and faculty_filter:
+                # filtering both tables on the schedule keeps the reads inside its partitions
+                judges = judges.filter(schedule=schedule_filter)
                 if faculty_filter == "10":
                     sessions = Session.objects.filter(schedule=schedule_filter)
                 else:
                     sessions = Session.objects.filter(schedule=schedule_filter, faculty_educational_group=faculty_filter)
             else:
                 sessions = Session.objects.all()
+            sessions = sessions.select_related(
+                'faculty_educational_group', 'schedule', 'student', 'supervisor1', 'supervisor2',
+                'supervisor3', 'supervisor4', 'graduate_monitor',
+            ).prefetch_related(Prefetch('judges', queryset=judges))
 
             # Create a workbook and add a worksheet
             workbook = openpyxl.Workbook()
@@ -668,10 +773,7 @@ class SessionAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
             sheet.title = "Schedules"
 
             # Write the header row (with Persian text)
-            sheet.append(["دانشکده و گروه آموزشی" , 'سال', 'نیم‌سال', 'تاریخ', 'ساعت شروع', 'ساعت پایان',
-                          'دانشجو', 'استاد راهنما اول', 'استاد راهنما دوم',
-                          'استاد مشاور اول', 'استاد مشاور دوم', 'ناظر تحصیلات تکمیلی',
-                          "داوران حاضر در این نشست"])
+            sheet.append(SESSION_EXPORT_HEADER)
             for session in sessions:
                 # Append each schedule as a row
                 sheet.append([
@@ -699,6 +801,7 @@ class SessionAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
 
             # Save the workbook to the response
             workbook.save(response)
+            observe_export('download_session', started, sheet.max_row - 1)
             return response
 
         find_all_schedules = Schedule.objects.all()
@@ -895,9 +998,9 @@ class SessionAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     def get_class_number(self, obj):
         return obj.class_number
 
-    @admin.display(description='تعداد داوران')
+    @admin.display(description='تعداد داوران', ordering='judge_count')
     def get_judges_number_assigned(self, obj):
-        return obj.judges.count()
+        return obj.judge_count
 
     @admin.display(description='ایجاد شده در زمان/تاریخ', ordering='created_at')
     def get_created_at_jalali(self, obj):
@@ -978,13 +1081,209 @@ class SessionAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
         else:
             return "ثبت نشده است"
 
+    def history_view(self, request, object_id, extra_context=None):
+        obj = self.get_object(request, unquote(object_id))
+        if obj is None:
+            return self._get_obj_does_not_exist_redirect(request, self.opts, object_id)
+        if not self.has_view_or_change_permission(request, obj):
+            raise PermissionDenied
+        return session_timeline(self, request, obj.pk, obj)
+
+    def check_conflicts(self, request):
+        """
+        Conflicts of the values being entered in the session form, checked against the
+        cached occupancy of the day (assignment.occupancy) instead of the form's validators
+        """
+        if not (self.has_add_permission(request) or self.has_change_permission(request)):
+            raise PermissionDenied
+        form = ConflictCheckForm(request.GET)
+        # nothing to check until the schedule, date and times are filled in
+        if not form.is_valid():
+            return JsonResponse({'conflicts': []})
+        proposal = form.cleaned_data
+        with span('session.check_conflicts', schedule_id=proposal['schedule']):
+            day = occupancy.snapshot(proposal['schedule'], proposal['date'])
+            if day is None:
+                return JsonResponse({'conflicts': []})
+            proposal['judges'] = [int(judge) for judge in request.GET.getlist('judge') if judge.isdigit()]
+            conflicts = occupancy.find_conflicts(day, proposal, session_id=proposal['session'])
+        return JsonResponse({'conflicts': conflicts})
+
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        if request.method != 'POST':
+            extra_context = {**(extra_context or {}),
+                             'conflict_check_url': reverse(f'{self.admin_site.name}:check_session_conflicts')}
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        # Root span of a save: the validate_* steps, the session and the judges are its children
+        with span('session.save', session_id=object_id, user=request.user.username):
+            return super().changeform_view(request, object_id, form_url, extra_context)
+
     def save_model(self, request, obj, form, change):
         if not obj.created_by:  # If created_by is not set, assign the current user
             obj.created_by = request.user.name
         obj.updated_by = request.user.user_info  # Always set updated_by to the current user
 
         # Save the object
-        obj.save()
+        with span('session.save_model'):
+            obj.save()
+
+    def save_related(self, request, form, formsets, change):
+        # the inline's judges are counted with one UPDATE, not one per judge
+        with span('session.save_related'), judge_counts.deferred():
+            super().save_related(request, form, formsets, change)
 
 # Register the Session model with the custom admin class
 admin.site.register(Session, SessionAdmin)
+
+
+class ArchivedSessionAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+    """ Read-only browsing and Excel export of the sessions of archived schedules """
+    list_display = ('id', 'student_name', 'schedule', 'faculty_educational_group', 'get_date_jalali',
+                    'start_time', 'end_time', 'class_number', 'get_judges', 'session_status')
+    list_filter = ('schedule', 'session_status', 'is_active')
+    search_fields = ('student_name', 'id')
+    list_select_related = ('schedule', 'faculty_educational_group')
+    ordering = ('-date', '-start_time')
+    readonly_fields = ('get_people',)
+    exclude = ('people',)
+    actions = ['download_archived_sessions']
+
+    def get_queryset(self, request, *args, **kwargs):
+        queryset = super(ArchivedSessionAdmin, self).get_queryset(request, *args, **kwargs)
+        match request.user.role:
+            case 'ALL':
+                return queryset
+            case _:
+                return queryset.filter(faculty_educational_group__faculty=request.user.role)
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='تاریخ', ordering='date')
+    def get_date_jalali(self, obj):
+        return obj.get_date_jalali
+
+    def history_view(self, request, object_id, extra_context=None):
+        # the history of the session before and after it was archived
+        obj = self.get_object(request, unquote(object_id))
+        if obj is None:
+            return self._get_obj_does_not_exist_redirect(request, self.opts, object_id)
+        if not self.has_view_or_change_permission(request, obj):
+            raise PermissionDenied
+        return session_timeline(self, request, obj.pk, obj)
+
+    @admin.display(description='داوران')
+    def get_judges(self, obj):
+        return obj.judge_names
+
+    @admin.display(description='دانشجو، اساتید و داوران')
+    def get_people(self, obj):
+        roles = [('دانشجو', 'student'), ('استاد راهنما اول', 'supervisor1'), ('استاد راهنما دوم', 'supervisor2'),
+                 ('استاد مشاور اول', 'supervisor3'), ('استاد مشاور دوم', 'supervisor4'),
+                 ('ناظر تحصیلات تکمیلی', 'graduate_monitor')]
+        lines = [(title, obj.person_name(role)) for title, role in roles if obj.person_name(role)]
+        lines.append(('داوران', obj.judge_names or '-'))
+        return format_html_join(mark_safe('<br>'), '{}: {}', lines)
+
+    @admin.action(description='دانلود جلسات بایگانی شده انتخاب شده به صورت فایل Excel')
+    def download_archived_sessions(self, request, queryset):
+        started = time.perf_counter()
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.title = "Archived sessions"
+        sheet.append(SESSION_EXPORT_HEADER)
+        for session in queryset.select_related('schedule', 'faculty_educational_group').order_by('date', 'start_time'):
+            sheet.append([
+                session.faculty_educational_group.title,
+                session.schedule.year,
+                session.schedule.get_semester_display(),
+                session.get_date_jalali,
+                session.start_time,
+                session.end_time,
+                session.student_name,
+                session.person_name('supervisor1'),
+                session.person_name('supervisor2'),
+                session.person_name('supervisor3'),
+                session.person_name('supervisor4'),
+                session.person_name('graduate_monitor'),
+                session.judge_names,
+            ])
+        response = HttpResponse(
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+        response['Content-Disposition'] = 'attachment; filename="archived_sessions.xlsx"'
+        workbook.save(response)
+        observe_export('archived_sessions', started, sheet.max_row - 1)
+        return response
+
+
+admin.site.register(ArchivedSession, ArchivedSessionAdmin)
+
+
+class SessionHistoryAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+    """ Every recorded change, for audits across sessions; a single session's is on its history page """
+    list_display = ('session_id', 'get_changed_at_jalali', 'user', 'action', 'model', 'object_id')
+    list_filter = ('action', 'model')
+    search_fields = ('user', '=session_id')
+    ordering = ('-changed_at',)
+    show_full_result_count = False
+
+    def has_view_permission(self, request, obj=None):
+        # entries are not tied to a faculty
+        return request.user.role == 'ALL' and super().has_view_permission(request, obj)
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='زمان تغییر', ordering='changed_at')
+    def get_changed_at_jalali(self, obj):
+        return datetime2jalali(localtime(obj.changed_at)).strftime('%a, %d %b %Y | %H:%M:%S')
+
+
+admin.site.register(SessionHistory, SessionHistoryAdmin)
+
+
+class SessionReminderAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
+    """ Reminders sent (or about to be) by assignment.reminders """
+    list_display = ('session_id', 'recipient', 'date', 'get_created_at_jalali', 'get_sent_at_jalali')
+    list_filter = (('sent_at', admin.EmptyFieldListFilter),)
+    search_fields = ('=session__id', 'recipient')
+    ordering = ('-id',)
+    show_full_result_count = False
+
+    def has_view_permission(self, request, obj=None):
+        return request.user.role == 'ALL' and super().has_view_permission(request, obj)
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='زمان ثبت', ordering='created_at')
+    def get_created_at_jalali(self, obj):
+        return datetime2jalali(localtime(obj.created_at)).strftime('%a, %d %b %Y | %H:%M:%S')
+
+    @admin.display(description='زمان ارسال', ordering='sent_at')
+    def get_sent_at_jalali(self, obj):
+        if obj.sent_at is None:
+            return "ارسال نشده است"
+        return datetime2jalali(localtime(obj.sent_at)).strftime('%a, %d %b %Y | %H:%M:%S')
+
+
+admin.site.register(SessionReminder, SessionReminderAdmin)
@@ -1,7 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class AssignmentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'assignment'
     verbose_name = 'داشبورد برگزاری جلسات'
+
+    def ready(self):
+        import assignment.checks
+        import assignment.signals
+        post_migrate.connect(assignment.signals.count_judges, sender=self)
@@ -0,0 +1,95 @@
+"""
+Archive tier for closed schedules.
+
+`archive_schedule` moves every session of a finished schedule, with its judges, into
+ArchivedSession and deletes them from Session and JudgeAssignment. Those hot tables are
+the ones SessionAdmin and every conflict check read, so they keep only open semesters.
+Archived sessions stay browsable and exportable (read-only) in ArchivedSessionAdmin,
+and can also be written to a gzipped JSON lines file that `loaddata` reads back.
+"""
+import gzip
+from itertools import islice
+
+from django.core import serializers
+from django.db import transaction
+from django.utils import timezone
+
+from . import history, judge_counts, notifications
+from .models import ArchivedSession, JudgeAssignment, Session
+
+ARCHIVE_BATCH_SIZE = 2000
+PEOPLE = ('student', 'supervisor1', 'supervisor2', 'supervisor3', 'supervisor4', 'graduate_monitor')
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def _person(obj):
+    return {'id': obj.pk, 'name': obj.name} if obj else None
+
+
+def archived_session(session):
+    """ The ArchivedSession row of `session`; its judges must be prefetched with their teacher """
+    people = {role: _person(getattr(session, role)) for role in PEOPLE}
+    people['judges'] = [_person(judge_assignment.judge) for judge_assignment in session.judges.all()]
+    return ArchivedSession(
+        id=session.id,
+        schedule_id=session.schedule_id,
+        faculty_educational_group_id=session.faculty_educational_group_id,
+        date=session.date,
+        start_time=session.start_time,
+        end_time=session.end_time,
+        class_number=session.class_number,
+        student_name=session.student.name,
+        people=people,
+        description=session.description,
+        is_active=session.is_active,
+        session_status=session.session_status,
+        created_at=session.created_at,
+        updated_at=session.updated_at,
+        created_by=session.created_by,
+        updated_by=session.updated_by,
+    )
+
+
+def archive_schedule(schedule, export_path=None):
+    """
+    Move the sessions of `schedule` to the archive in one transaction and return how
+    many were moved. With `export_path` the archived rows are also written there.
+    """
+    if schedule.archived_at:
+        raise ArchiveError(f"{schedule} قبلا بایگانی شده است")
+    if not schedule.is_finished:
+        raise ArchiveError(f"{schedule} هنوز به پایان نرسیده است و قابل بایگانی نیست")
+
+    sessions = Session.objects.filter(schedule=schedule).select_related(*PEOPLE).prefetch_related(
+        'judges__judge'
+    ).order_by('id')
+    with transaction.atomic():
+        rows = (archived_session(session) for session in sessions.iterator(chunk_size=ARCHIVE_BATCH_SIZE))
+        count = 0
+        while batch := list(islice(rows, ARCHIVE_BATCH_SIZE)):
+            ArchivedSession.objects.bulk_create(batch)
+            count += len(batch)
+
+        # moving to the archive is not a change of the sessions
+        with history.suspended(), notifications.suspended(), judge_counts.suspended():
+            JudgeAssignment.objects.filter(session__schedule=schedule).delete()
+            Session.objects.filter(schedule=schedule).delete()
+        schedule.archived_at = timezone.now()
+        # its partitions are empty now; partition_sessions drops them, without locking the tables here
+        schedule.save(update_fields=['archived_at'])
+
+    if export_path:
+        export_archive(schedule, export_path)
+    return count
+
+
+def export_archive(schedule, path):
+    """ Write the archived sessions of `schedule` to `path` as gzipped JSON lines (a loaddata fixture) """
+    with gzip.open(path, 'wt', encoding='utf-8') as stream:
+        serializers.serialize(
+            'jsonl', ArchivedSession.objects.filter(schedule=schedule).order_by('id').iterator(), stream=stream,
+            ensure_ascii=False,
+        )
@@ -0,0 +1,45 @@
+"""
+System check of the session tables against the shape the code expects (run by migrate and
+`check --database default`): either both plain, or both partitioned by partition_sessions
+with the primary keys and foreign key of assignment.partitions.
+"""
+from django.core.checks import Error, Tags, register
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from . import partitions
+
+HINT = "run `manage.py partition_sessions`, which repairs the foreign key of partitioned tables"
+
+
+@register(Tags.database)
+def check_session_partitions(app_configs, databases=None, **kwargs):
+    if not databases or DEFAULT_DB_ALIAS not in databases:
+        return []
+    connection = connections[DEFAULT_DB_ALIAS]
+    if connection.vendor != 'postgresql':
+        return []
+
+    with connection.cursor() as cursor:
+        keys = {table: partitions.primary_key(cursor, table) for table in partitions.TABLES}
+        if None in keys.values():
+            return []  # not migrated yet
+        partitioned = {table: partitions.is_partitioned(table) for table in partitions.TABLES}
+        foreign_keys = partitions.session_foreign_keys(cursor)
+
+    if len(set(partitioned.values())) > 1:
+        return [Error(
+            f"only {', '.join(table for table, done in partitioned.items() if done)} is partitioned",
+            hint="restore the database from before the interrupted conversion", id='assignment.E001',
+        )]
+
+    expected = partitions.PARTITIONED_PRIMARY_KEY if partitioned[partitions.SESSION_TABLE] else 'PRIMARY KEY (id)'
+    errors = [Error(f"{table} has {key}, expected {expected}", id='assignment.E002')
+              for table, key in keys.items() if key != expected]
+    if errors or not partitioned[partitions.SESSION_TABLE]:
+        return errors
+    if list(foreign_keys.values()) != [partitions.SESSION_FK_DEFINITION]:
+        errors.append(Error(
+            f"the judges reference sessions with {'; '.join(foreign_keys.values()) or 'no foreign key'}, "
+            f"expected {partitions.SESSION_FK_DEFINITION}", hint=HINT, id='assignment.E003',
+        ))
+    return errors
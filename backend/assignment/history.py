@@ -0,0 +1,193 @@
+"""
+Change history of sessions and judge assignments (SessionHistory).
+
+Saves and deletes are diffed in the post_save / post_delete signals (assignment.signals)
+against the values the instance was loaded with. Entries are only published once the
+transaction commits, and a request publishes all of its entries to a Redis stream in
+one round trip when it ends (ChangeHistoryMiddleware). flush_session_history, run by
+celery beat, reads the stream through a consumer group and bulk-inserts the entries.
+"""
+import json
+import logging
+import os
+import socket
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError, ResponseError
+
+logger = logging.getLogger(__name__)
+
+HISTORY_STREAM_KEY = "session_history"
+HISTORY_GROUP = "history_writer"
+# Upper bound of buffered entries if the worker is down for a long time
+HISTORY_MAX_BUFFERED = 100_000
+# Entries read by a writer that died are taken over after this long (ms)
+HISTORY_CLAIM_IDLE_MS = 60_000
+
+# Bookkeeping set on every save; fields that are not editable (timestamps, is_active,
+# the judges' copy of the schedule) are left out as well
+IGNORED_FIELDS = {'created_by', 'updated_by'}
+
+_actor = ContextVar('history_actor', default=None)
+_outbox = ContextVar('history_outbox', default=None)
+_suspended = ContextVar('history_suspended', default=False)
+
+
+def get_redis():
+    return get_redis_connection("default")
+
+
+@contextmanager
+def request_scope(get_user):
+    """
+    Attribute the changes of the block to `get_user()` (called lazily, once something
+    changed) and publish them together when the block ends
+    """
+    outbox = []
+    actor_token, outbox_token = _actor.set(get_user), _outbox.set(outbox)
+    try:
+        yield
+    finally:
+        _actor.reset(actor_token)
+        _outbox.reset(outbox_token)
+        if outbox:
+            publish(outbox)
+
+
+@contextmanager
+def suspended():
+    """ Record nothing in the block, e.g. sessions moved to the archive """
+    token = _suspended.set(True)
+    try:
+        yield
+    finally:
+        _suspended.reset(token)
+
+
+def tracked_fields(instance):
+    return [field for field in instance._meta.concrete_fields
+            if field.editable and not field.primary_key and field.attname not in IGNORED_FIELDS
+            and field.attname in instance.__dict__]
+
+
+def diff(instance, created):
+    """ {attname: [old, new]} of the fields a save changed; every filled in field on create """
+    loaded = {} if created else getattr(instance, '_loaded_values', None)
+    changes = {}
+    for field in tracked_fields(instance):
+        new = getattr(instance, field.attname)
+        if loaded is None:
+            # saved without being loaded from the database, nothing to compare with
+            changes[field.attname] = [None, new]
+        elif created and new in (None, ''):
+            continue
+        elif field.attname not in loaded or loaded[field.attname] != new:
+            changes[field.attname] = [loaded.get(field.attname), new]
+    return changes
+
+
+def deleted(instance):
+    """ {attname: [value, None]}: what the deleted row held """
+    return {field.attname: [getattr(instance, field.attname), None] for field in tracked_fields(instance)
+            if getattr(instance, field.attname) not in (None, '')}
+
+
+def record(instance, action, changes):
+    """ Queue one entry for `instance` (a Session or a JudgeAssignment) """
+    if _suspended.get() or (action == 'update' and not changes):
+        return
+    get_user = _actor.get()
+    is_judge = instance._meta.model_name == 'judgeassignment'
+    entry = {
+        'session': instance.session_id if is_judge else instance.pk,
+        'model': 'judge' if is_judge else 'session',
+        'object': instance.pk,
+        'action': action,
+        'changes': json.dumps(changes, cls=DjangoJSONEncoder, ensure_ascii=False),
+        'user': (get_user() if get_user else None) or '',
+        'at': timezone.now().isoformat(),
+    }
+    # a change that is rolled back never happened
+    transaction.on_commit(lambda: _committed(entry))
+
+
+def _committed(entry):
+    outbox = _outbox.get()
+    if outbox is not None:
+        outbox.append(entry)
+    else:
+        publish([entry])
+
+
+def publish(entries):
+    """ Add the entries to the stream in one round trip; written directly if Redis is down """
+    try:
+        pipeline = get_redis().pipeline(transaction=False)
+        for entry in entries:
+            pipeline.xadd(HISTORY_STREAM_KEY, entry, maxlen=HISTORY_MAX_BUFFERED, approximate=True)
+        pipeline.execute()
+    except RedisError:
+        logger.warning("history stream unavailable, writing %d entries directly", len(entries), exc_info=True)
+        _write_history_batch([(None, entry) for entry in entries])
+
+
+def flush_session_history(batch_size=1000):
+    """
+    Write up to `batch_size` entries of the stream in one INSERT and acknowledge them.
+    Entries another writer read but never acknowledged are taken over first.
+    Returns the number of entries handled.
+    """
+    redis = get_redis()
+    try:
+        redis.xgroup_create(HISTORY_STREAM_KEY, HISTORY_GROUP, id='0', mkstream=True)
+    except ResponseError as error:
+        if 'BUSYGROUP' not in str(error):
+            raise
+
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    messages = redis.xautoclaim(HISTORY_STREAM_KEY, HISTORY_GROUP, consumer, HISTORY_CLAIM_IDLE_MS,
+                                start_id='0-0', count=batch_size)[1]
+    if len(messages) < batch_size:
+        read = redis.xreadgroup(HISTORY_GROUP, consumer, {HISTORY_STREAM_KEY: '>'},
+                                count=batch_size - len(messages))
+        if read:
+            messages += read[0][1]
+    if not messages:
+        return 0
+
+    entries = [(entry_id.decode(), {key.decode(): value.decode() for key, value in fields.items()})
+               for entry_id, fields in messages]
+    _write_history_batch(entries)
+
+    ids = [entry_id for entry_id, _ in messages]
+    pipeline = redis.pipeline(transaction=False)
+    pipeline.xack(HISTORY_STREAM_KEY, HISTORY_GROUP, *ids)
+    pipeline.xdel(HISTORY_STREAM_KEY, *ids)
+    pipeline.execute()
+    return len(messages)
+
+
+def _write_history_batch(entries):
+    from .models import SessionHistory
+
+    rows = [
+        SessionHistory(
+            entry_id=entry_id,
+            session_id=int(entry['session']),
+            model=entry['model'],
+            object_id=int(entry['object']),
+            action=entry['action'],
+            changes=json.loads(entry['changes']),
+            user=entry['user'] or None,
+            changed_at=parse_datetime(entry['at']),
+        )
+        for entry_id, entry in entries
+    ]
+    # entries written before a crash that kept them from being acknowledged are skipped
+    SessionHistory.objects.bulk_create(rows, ignore_conflicts=True)
@@ -0,0 +1,80 @@
+"""
+Session.judge_count, the number of judges of a session, and is_active, which is true
+while that number is above zero.
+
+Both are kept up to date with UPDATEs of their own, never by Session.save: a save of a
+judge (assignment.signals) adds or subtracts one in a single statement that also sets
+is_active, so concurrent saves never lose a judge. Blocks that save or delete many
+judges run in `deferred()` and recount the sessions they touched once at the end.
+Writes that skip the signals (bulk_create, raw SQL, loaddata) leave the counts to
+`recount`, which the repair_judge_counts command runs over every session.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThan
+
+from .models import JudgeAssignment, Session
+
+_pending = ContextVar('judge_counts_pending', default=None)
+_suspended = ContextVar('judge_counts_suspended', default=False)
+
+
+@contextmanager
+def suspended():
+    """ Count nothing in the block, e.g. judges deleted along with their sessions """
+    token = _suspended.set(True)
+    try:
+        yield
+    finally:
+        _suspended.reset(token)
+
+
+@contextmanager
+def deferred():
+    """ Recount the sessions whose judges changed in the block once, when it ends without an error """
+    pending = {}
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+    for schedule_id, session_ids in pending.items():
+        recount(Session.objects.filter(schedule_id=schedule_id, pk__in=session_ids))
+
+
+def add(session_id, schedule_id, delta):
+    """ Add `delta` judges to the session """
+    if _suspended.get() or session_id is None:
+        return
+    pending = _pending.get()
+    if pending is not None:
+        pending.setdefault(schedule_id, set()).add(session_id)
+        return
+    # both columns are computed from the row as it was before the update
+    Session.objects.filter(pk=session_id, schedule_id=schedule_id).update(
+        judge_count=F('judge_count') + delta,
+        is_active=Case(When(judge_count__gt=-delta, then=Value(True)), default=Value(False)),
+    )
+
+
+def counted():
+    """ The number of judges of the outer session, from JudgeAssignment """
+    judges = JudgeAssignment.objects.filter(
+        session=OuterRef('pk'), schedule=OuterRef('schedule'),
+    ).order_by().values('session').annotate(count=Count('*')).values('count')
+    return Coalesce(Subquery(judges), 0)
+
+
+def drifted(queryset):
+    """ Sessions of `queryset` whose judge_count or is_active does not match their judges """
+    return queryset.alias(counted=counted()).filter(
+        ~Q(judge_count=F('counted')) | Q(is_active=True, counted=0) | Q(is_active=False, counted__gt=0)
+    )
+
+
+def recount(queryset):
+    """ Set judge_count and is_active of the drifted sessions of `queryset`; returns how many were fixed """
+    return drifted(queryset).update(judge_count=counted(), is_active=GreaterThan(counted(), 0))
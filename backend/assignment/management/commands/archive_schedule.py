@@ -0,0 +1,47 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from assignment.archive import ArchiveError, archive_schedule
+from schedule.models import Schedule
+
+
+class Command(BaseCommand):
+    help = ("Move the sessions and judges of finished schedules into the archive (ArchivedSession), "
+            "optionally writing them to gzipped JSON lines files too.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('schedule_ids', nargs='*', type=int, help="schedules to archive")
+        parser.add_argument('--all-finished', action='store_true',
+                            help="archive every finished schedule that is not archived yet")
+        parser.add_argument('--export-dir', type=Path, default=None,
+                            help="also write schedule-<id>.jsonl.gz here (restore with loaddata)")
+
+    def handle(self, *args, **options):
+        if options['all_finished']:
+            schedules = [schedule for schedule in Schedule.objects.filter(archived_at__isnull=True).order_by('id')
+                         if schedule.is_finished]
+        elif options['schedule_ids']:
+            schedules = list(Schedule.objects.filter(id__in=options['schedule_ids']).order_by('id'))
+            missing = set(options['schedule_ids']) - {schedule.id for schedule in schedules}
+            if missing:
+                raise CommandError(f"no schedule with id {', '.join(map(str, sorted(missing)))}")
+        else:
+            raise CommandError("give schedule ids or --all-finished")
+
+        export_dir = options['export_dir']
+        if export_dir:
+            export_dir.mkdir(parents=True, exist_ok=True)
+
+        for schedule in schedules:
+            start = time.perf_counter()
+            export_path = export_dir / f"schedule-{schedule.id}.jsonl.gz" if export_dir else None
+            try:
+                count = archive_schedule(schedule, export_path=export_path)
+            except ArchiveError as error:
+                raise CommandError(f"schedule {schedule.id}: {error}")
+            self.stdout.write(self.style.SUCCESS(
+                f"schedule {schedule.id}: {count} sessions archived in {time.perf_counter() - start:.1f} s"
+                + (f", written to {export_path}" if export_path else "")
+            ))
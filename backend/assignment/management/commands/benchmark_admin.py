@@ -0,0 +1,179 @@
+import json
+import secrets
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.urls import reverse
+
+from account.custom_admin import custom_admin_site
+from assignment.benchmarks import admin_client, form_post_data, measure
+from assignment.models import Session, JudgeAssignment
+from schedule.models import Schedule
+from university_adminstration.models import Student, Teacher
+
+DEFAULT_BUDGETS = Path(__file__).resolve().parents[2] / 'benchmark_budgets.json'
+DEFAULT_OUTPUT_DIR = Path(settings.BASE_DIR) / 'benchmark_results'
+
+# model -> changelist url name; every list filter of these admins is benchmarked too
+CHANGELISTS = {
+    'session': (Session, 'assignment_session_changelist'),
+    'student': (Student, 'university_adminstration_student_changelist'),
+    'teacher': (Teacher, 'university_adminstration_teacher_changelist'),
+    'user': (get_user_model(), 'account_user_changelist'),
+}
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the admin through the test client: changelists with every list filter, the session "
+            "change form (GET and POST with judges), autocomplete and download_session. Records query count, "
+            "wall time and peak memory, writes the results as JSON and fails when a budget is exceeded.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', action='append',
+                            help="staff user to run as, can be repeated (default: load_all)")
+        parser.add_argument('--sizes', type=int, nargs='+',
+                            help="regenerate load data with this many sessions before each run "
+                                 "(students and teachers are scaled from it); default: use the current data")
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--budgets', default=str(DEFAULT_BUDGETS),
+                            help="JSON file of {scenario or '*': {metric: max}}")
+        parser.add_argument('--output', help="result file (default: benchmark_results/admin-<timestamp>.json)")
+
+    def handle(self, *args, **options):
+        budgets = self.load_budgets(options['budgets'])
+        usernames = options['username'] or ['load_all']
+
+        runs = []
+        for size in options['sizes'] or [None]:
+            if size is not None:
+                self.stdout.write(f"generating {size} sessions ...")
+                call_command(
+                    'generate_load_data', clear=True, sessions=size, students=max(1_000, size // 4),
+                    teachers=max(200, size // 60), schedules=3, stdout=self.stdout,
+                    # the client logs in without one
+                    password=secrets.token_urlsafe(),
+                )
+            dataset = {
+                'sessions': Session.objects.count(),
+                'judges': JudgeAssignment.objects.count(),
+                'students': Student.objects.count(),
+                'teachers': Teacher.objects.count(),
+                'users': get_user_model().objects.count(),
+            }
+            for username in usernames:
+                user = get_user_model().objects.filter(username=username).first()
+                if user is None:
+                    raise CommandError(f"user {username} does not exist")
+                self.stdout.write(f"\n{username} (role {user.role}) | {dataset}")
+                results = self.run_scenarios(user, options['repeat'])
+                runs.append({'user': username, 'role': user.role, 'dataset': dataset, 'results': results})
+
+        failures = [
+            f"{run['user']} @ {run['dataset']['sessions']} sessions: {failure}"
+            for run in runs for failure in check_budgets(run['results'], budgets)
+        ]
+
+        output = Path(options['output'] or DEFAULT_OUTPUT_DIR / f"admin-{datetime.now():%Y%m%d-%H%M%S}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps({
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            'budgets': budgets,
+            'runs': runs,
+            'failures': failures,
+        }, ensure_ascii=False, indent=2))
+        self.stdout.write(f"\nresults written to {output}")
+
+        if failures:
+            raise CommandError("budget exceeded:\n" + "\n".join(failures))
+        self.stdout.write(self.style.SUCCESS("all scenarios within budget"))
+
+    def load_budgets(self, path):
+        try:
+            return json.loads(Path(path).read_text())
+        except FileNotFoundError:
+            raise CommandError(f"budget file {path} does not exist")
+        except json.JSONDecodeError as e:
+            raise CommandError(f"budget file {path} is not valid JSON: {e}")
+
+    def run_scenarios(self, user, repeat):
+        results = {}
+        with admin_client(user) as client:
+            for name, method, path, data, expected, rollback in self.scenarios(user):
+                result = measure(client, method, path, data, repeat=repeat, rollback=rollback)
+                result['path'] = path
+                result['expected_status'] = expected
+                results[name] = result
+                self.stdout.write(
+                    f"{name:<60} {result['status']} | median {result['ms_median']:8.1f} ms | "
+                    f"{result['queries']:4d} queries | peak {result['peak_kib']:9.1f} KiB"
+                )
+        return results
+
+    def scenarios(self, user):
+        """ (name, method, path, data, expected status, rollback) of every benchmarked request """
+        request = RequestFactory().get('/')
+        request.user = user
+
+        for name, (model, url_name) in CHANGELISTS.items():
+            path = reverse(f'custom_admin:{url_name}')
+            yield f'{name}_changelist', 'get', path, None, 200, False
+            model_admin = custom_admin_site.get_model_admin(model)
+            changelist = model_admin.get_changelist_instance(request)
+            for spec in changelist.filter_specs:
+                choice = next((c for c in spec.choices(changelist) if not c['selected']), None)
+                if choice is None:
+                    continue
+                query_string = choice['query_string'].lstrip('?')
+                yield f'{name}_changelist?{query_string}', 'get', f'{path}?{query_string}', None, 200, False
+
+        session = (custom_admin_site.get_model_admin(Session).get_queryset(request)
+                   .filter(judges__isnull=False).order_by('-id').first())
+        if session is not None:
+            path = reverse('custom_admin:assignment_session_change', args=[session.pk])
+            yield 'session_change', 'get', path, None, 200, False
+            yield 'session_change_post', 'post', path, session_post_data(request, session), 302, True
+
+        autocomplete = reverse('custom_admin:autocomplete')
+        for field_name in ('student', 'supervisor1'):
+            query = urlencode({'app_label': 'assignment', 'model_name': 'session',
+                               'field_name': field_name, 'term': ''})
+            yield f'autocomplete_{field_name}', 'get', f'{autocomplete}?{query}', None, 200, False
+
+        download = reverse('custom_admin:download_session')
+        yield 'download_session', 'get', download, None, 200, False
+        schedule = Schedule.objects.order_by('-id').first()
+        if schedule is not None:
+            yield ('download_session_post', 'post', download,
+                   {'schedule': schedule.pk, 'faculty': '10'}, 200, False)
+
+
+def session_post_data(request, session):
+    """ Change form payload that re-saves `session` and its judges unchanged """
+    model_admin = custom_admin_site.get_model_admin(Session)
+    form = model_admin.get_form(request, session, change=True)(instance=session)
+    formsets = []
+    for formset_class, inline in model_admin.get_formsets_with_inlines(request, session):
+        formsets.append(formset_class(instance=session, prefix=formset_class.get_default_prefix()))
+    return form_post_data(form, formsets)
+
+
+def check_budgets(results, budgets):
+    """ Budget violations of one run; a scenario's own budget overrides the '*' defaults """
+    failures = []
+    for name, result in results.items():
+        if result['status'] != result['expected_status']:
+            failures.append(f"{name}: status {result['status']}, expected {result['expected_status']}")
+        limits = {**budgets.get('*', {}), **budgets.get(name.split('?')[0], {}), **budgets.get(name, {})}
+        for metric, limit in limits.items():
+            if metric in result and result[metric] > limit:
+                failures.append(f"{name}: {metric} {result[metric]} > {limit}")
+    return failures
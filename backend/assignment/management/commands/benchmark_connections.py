@@ -0,0 +1,77 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.db.backends.signals import connection_created
+from django.urls import reverse
+
+from account.models import User
+from assignment.benchmarks import admin_client
+
+
+class Command(BaseCommand):
+    help = ("Compare an admin page with a new database connection per request (CONN_MAX_AGE=0) against a "
+            "persistent, health-checked one (DB_CONN_MAX_AGE), and time connecting and the health check alone.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', default=None, help="staff user to request as (default: first superuser)")
+        parser.add_argument('--path', default=None, help="page to request (default: the session changelist)")
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        user = (User.objects.filter(username=options['username']) if options['username']
+                else User.objects.filter(is_superuser=True)).first()
+        if user is None:
+            raise CommandError("no such user")
+        path = options['path'] or reverse('custom_admin:assignment_session_changelist')
+        repeat = options['repeat']
+        max_age = settings.DB_CONN_MAX_AGE or 300
+        saved = connection.settings_dict['CONN_MAX_AGE'], connection.settings_dict['CONN_HEALTH_CHECKS']
+
+        opened = []
+        receiver = lambda **kwargs: opened.append(1)  # noqa: E731
+        connection_created.connect(receiver)
+        try:
+            connect_ms = self.time(connection.connect, connection.close, repeat)
+            connection.ensure_connection()
+            health_check_ms = self.time(connection.is_usable, lambda: None, repeat)
+            self.stdout.write(f"connect: {connect_ms:.2f} ms, health check: {health_check_ms:.2f} ms (median)")
+
+            with admin_client(user) as client:
+                results = {}
+                for label, conn_max_age in (('per request', 0), (f'persistent ({max_age} s)', max_age)):
+                    connection.settings_dict.update(CONN_MAX_AGE=conn_max_age, CONN_HEALTH_CHECKS=True)
+                    connection.close()
+                    client.get(path)  # warm up caches and templates
+                    opened.clear()
+                    timings = []
+                    for _ in range(repeat):
+                        # what the request_started / request_finished handlers do around a real request
+                        close_old_connections()
+                        start = time.perf_counter()
+                        response = client.get(path)
+                        timings.append((time.perf_counter() - start) * 1000)
+                        close_old_connections()
+                    if response.status_code != 200:
+                        raise CommandError(f"{path} returned {response.status_code}")
+                    results[label] = statistics.median(timings)
+                    self.stdout.write(f"{label:<20}{results[label]:8.1f} ms median, "
+                                      f"{len(opened)} connections for {repeat} requests")
+        finally:
+            connection_created.disconnect(receiver)
+            connection.close()
+            connection.settings_dict['CONN_MAX_AGE'], connection.settings_dict['CONN_HEALTH_CHECKS'] = saved
+
+        first, second = results.values()
+        self.stdout.write(self.style.SUCCESS(f"persistent connections save {first - second:.1f} ms per request"))
+
+    def time(self, func, reset, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+            reset()
+        return statistics.median(timings)
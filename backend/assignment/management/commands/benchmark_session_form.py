@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from account.custom_admin import custom_admin_site
+from assignment.benchmarks import admin_client, measure
+from assignment.models import Session
+
+
+class Command(BaseCommand):
+    help = ("Measure render time, query count and HTML size of the session add/change form, "
+            "with the student autocomplete widget and with a plain <select> for comparison.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', required=True, help="staff user the form is rendered for")
+        parser.add_argument('--session-id', type=int, help="render the change form of this session (default: add form)")
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f"user {options['username']} does not exist")
+
+        if options['session_id']:
+            url = f"/admin/assignment/session/{options['session_id']}/change/"
+        else:
+            url = "/admin/assignment/session/add/"
+
+        model_admin = custom_admin_site.get_model_admin(Session)
+        autocomplete_fields = list(model_admin.autocomplete_fields)
+        plain_fields = [field for field in autocomplete_fields if field != 'student']
+
+        with admin_client(user) as client:
+            try:
+                for label, fields in (('select', plain_fields), ('autocomplete', autocomplete_fields)):
+                    model_admin.autocomplete_fields = fields
+                    self.report(label, client, url, options['repeat'])
+            finally:
+                model_admin.autocomplete_fields = autocomplete_fields
+
+    def report(self, label, client, url, repeat):
+        result = measure(client, 'get', url, repeat=repeat)
+        if result['status'] != 200:
+            raise CommandError(f"{url} returned {result['status']}")
+
+        self.stdout.write(
+            f"{label:<13} median {result['ms_median']:8.1f} ms | "
+            f"{result['queries']:4d} queries | {result['kib']:9.1f} KiB"
+        )
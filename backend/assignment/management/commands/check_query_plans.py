@@ -0,0 +1,108 @@
+import json
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+
+from assignment.models import Session, JudgeAssignment
+from assignment.reminders import upcoming
+from university_adminstration.models import FacultyEducationalGroup
+
+# Tables that must never be read with a sequential scan by the queries below
+CHECKED_TABLES = {Session._meta.db_table, JudgeAssignment._meta.db_table}
+INDEX_NODES = {'Index Scan', 'Index Only Scan', 'Bitmap Index Scan', 'Bitmap Heap Scan'}
+
+
+class Command(BaseCommand):
+    help = ("EXPLAIN the conflict-check and changelist query shapes on the current data (run it on the "
+            "generate_load_data set) and fail when one of them reads sessions or judges without an index.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-analyze', action='store_true',
+                            help="skip ANALYZE, use the planner statistics as they are")
+        parser.add_argument('--verbose-plans', action='store_true', help="print every plan")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("query plans are only checked on PostgreSQL")
+
+        session = Session.objects.filter(judges__isnull=False).order_by('-id').first()
+        if session is None:
+            raise CommandError("no sessions with judges, run generate_load_data first")
+
+        if not options['no_analyze']:
+            with connection.cursor() as cursor:
+                for table in CHECKED_TABLES:
+                    cursor.execute(f'ANALYZE "{table}"')
+
+        failures = []
+        for name, queryset in query_shapes(session):
+            plan = json.loads(queryset.explain(format='json'))[0]['Plan']
+            scans = list(table_scans(plan))
+            bad = [(node, table) for node, table, _ in scans if is_checked(table) and node not in INDEX_NODES]
+            summary = ", ".join(f"{node} {index or table}" for node, table, index in scans)
+            self.stdout.write(f"{'FAIL' if bad else 'ok':<5}{name:<28}{summary}")
+            if options['verbose_plans']:
+                self.stdout.write(queryset.explain(format='text'))
+            if bad:
+                failures.append(name)
+
+        if failures:
+            raise CommandError(f"sequential scans in: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("every query shape uses an index"))
+
+
+def is_checked(table):
+    # partitions (see assignment.partitions) count as their table, except the DEFAULT
+    # partition that only catches strays and is usually empty
+    return bool(table) and not table.endswith('_default') and any(
+        table == checked or table.startswith(f"{checked}_s") for checked in CHECKED_TABLES
+    )
+
+
+def table_scans(plan):
+    """ (node type, table, index) of every node of a JSON plan that reads a table or an index """
+    if 'Relation Name' in plan or 'Index Name' in plan:
+        yield plan['Node Type'], plan.get('Relation Name'), plan.get('Index Name')
+    for child in plan.get('Plans', []):
+        yield from table_scans(child)
+
+
+def query_shapes(session):
+    """ The queries of SessionAdminForm / JudgeAssignmentFormSet and the changelists, for `session` """
+    professors = [teacher for teacher in (session.supervisor1_id, session.supervisor2_id, session.supervisor3_id,
+                                          session.supervisor4_id, session.graduate_monitor_id) if teacher]
+    judges = list(session.judges.values_list('judge_id', flat=True))
+    same_day = Session.objects.filter(date=session.date, schedule=session.schedule_id).exclude(id=session.id)
+    overlaps = Q(start_time__lt=session.end_time, end_time__gt=session.start_time)
+
+    def as_professor(teachers):
+        return (Q(supervisor1__in=teachers) | Q(supervisor2__in=teachers) | Q(supervisor3__in=teachers)
+                | Q(supervisor4__in=teachers) | Q(graduate_monitor__in=teachers))
+
+    # SessionAdmin filters a faculty on the ids of its groups
+    faculty_groups = list(FacultyEducationalGroup.objects.filter(
+        faculty=session.faculty_educational_group.faculty).values_list('id', flat=True))
+    reminder_start = datetime.combine(session.date, session.start_time)
+
+    return [
+        # the sessions of the room that day, their times are compared in Python
+        ('room_overlap', same_day.filter(class_number=session.class_number)),
+        ('student_overlap', same_day.filter(Q(student=session.student_id) & overlaps)),
+        ('professor_overlap', same_day.filter(as_professor(professors) & overlaps)),
+        ('judge_as_professor', same_day.filter(as_professor(judges) & overlaps)),
+        ('judge_overlap', same_day.filter(judges__judge__in=judges, judges__schedule=session.schedule_id)
+         .filter(overlaps)),
+        ('professor_as_judge', same_day.filter(judges__judge__in=professors, judges__schedule=session.schedule_id)
+         .filter(overlaps)),
+        ('judge_sessions', JudgeAssignment.objects.filter(judge=judges[0]).values('session')),
+        ('changelist_faculty',
+         Session.objects.filter(faculty_educational_group__in=faculty_groups).order_by('-id')[:100]),
+        ('changelist_created_at', Session.objects.order_by('-created_at')[:100]),
+        ('changelist_updated_at', Session.objects.order_by('-updated_at')[:100]),
+        ('created_at_range', Session.objects.filter(created_at__gte=session.created_at).values('id', 'created_at')),
+        ('inactive_sessions', Session.objects.filter(is_active=False).order_by('-id')[:100]),
+        ('changelist_judge_count', Session.objects.order_by('judge_count', '-id')[:100]),
+        ('upcoming_reminders', upcoming(reminder_start, reminder_start + timedelta(days=2)).values('id')[:200]),
+    ]
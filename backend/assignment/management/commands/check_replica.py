@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router, transaction
+
+from core import db_router
+from assignment.models import Session
+
+
+class Command(BaseCommand):
+    help = ("Report the read replica's lag and where reads are routed: outside and inside use_replica(), "
+            "inside a transaction on the primary, and while the replica lags too much.")
+
+    def handle(self, *args, **options):
+        if not db_router.replica_configured():
+            raise CommandError("no replica configured, set REPLICA_DATABASE_URL")
+
+        lag = db_router.replica_lag(refresh=True)
+        if lag is None:
+            self.stdout.write(self.style.WARNING("replica unreachable, every read goes to the primary"))
+        else:
+            self.stdout.write(f"replica lag: {lag:.3f} s (limit {db_router.REPLICA_MAX_LAG} s)")
+            with connections[db_router.REPLICA_DB_ALIAS].cursor() as cursor:
+                cursor.execute("SELECT pg_is_in_recovery()")
+                if not cursor.fetchone()[0]:
+                    self.stdout.write(self.style.WARNING("the replica is not in recovery, is it a primary?"))
+
+        self.report("outside use_replica()")
+        with db_router.use_replica():
+            self.report("inside use_replica()")
+            with transaction.atomic():
+                self.report("inside a transaction")
+            max_lag = db_router.REPLICA_MAX_LAG
+            db_router.REPLICA_MAX_LAG = -1
+            try:
+                self.report("replica lagging")
+            finally:
+                db_router.REPLICA_MAX_LAG = max_lag
+
+        if lag is not None:
+            primary = Session.objects.using('default').count()
+            replica = Session.objects.using(db_router.REPLICA_DB_ALIAS).count()
+            self.stdout.write(f"sessions on the primary: {primary}, on the replica: {replica}")
+
+    def report(self, label):
+        self.stdout.write(f"{label:<24}reads from {router.db_for_read(Session)}")
@@ -0,0 +1,288 @@
+import math
+import multiprocessing
+import random
+from datetime import date, datetime, timedelta
+
+import jdatetime
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from faker import Faker
+
+from assignment import judge_counts, notifications
+from assignment.models import Session, JudgeAssignment
+from schedule.models import Schedule
+from university_adminstration.models import (
+    FacultyEducationalGroup, Student, Teacher, TeacherFacultyEducationalGroupAssignment,
+)
+
+# Every generated row carries one of these markers so --clear only removes load data
+STUDENT_PREFIX = 'LD'
+TEACHER_PREFIX = 'LD'
+CREATED_BY = 'generate_load_data'
+
+# (start month, start day, end month, end day) of each semester inside its Jalali year
+SEMESTER_WINDOWS = {
+    'one': (7, 1, 10, 30),
+    'two': (1, 10, 4, 10),
+    'third': (4, 11, 6, 31),
+}
+DAY_START = 7 * 60  # sessions are placed between 07:00 and 21:00
+DAY_MINUTES = 14 * 60
+SLOT_MINUTES_MIN = 15
+# more slots than this would not fit between DAY_START and the end of the day
+SLOTS_PER_DAY_MAX = DAY_MINUTES // SLOT_MINUTES_MIN
+# teachers drawn for one session: its five professors and up to three judges
+TEACHERS_PER_SESSION = 8
+
+
+class Command(BaseCommand):
+    help = ("Fill the database with a realistic, deterministic data set for load testing: faculty groups, "
+            "students, teachers, schedules and sessions with judges that pass the overlap validators.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=50_000)
+        parser.add_argument('--teachers', type=int, default=3_000)
+        parser.add_argument('--schedules', type=int, default=10)
+        parser.add_argument('--sessions', type=int, default=200_000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--workers', type=int, default=1,
+                            help="generate the sessions of different schedules in parallel processes")
+        parser.add_argument('--password', required=True, help="password of the generated admin users, "
+                                                              "which are superusers")
+        parser.add_argument('--clear', action='store_true', help="remove previously generated load data first")
+
+    def handle(self, *args, **options):
+        if options['sessions'] and (options['students'] < 1 or options['teachers'] < TEACHERS_PER_SESSION):
+            raise CommandError(f"sessions need at least 1 student and {TEACHERS_PER_SESSION} teachers")
+        if options['clear']:
+            self.clear()
+
+        rng = random.Random(options['seed'])
+        fake = Faker('fa_IR')
+        fake.seed_instance(options['seed'])
+
+        groups = self.create_faculty_groups()
+        self.create_admin_users(groups, options['password'])
+        student_ids = self.create_students(options['students'], groups, rng, fake, options['batch_size'])
+        teacher_ids = self.create_teachers(options['teachers'], groups, rng, fake, options['batch_size'])
+        schedules = self.create_schedules(options['schedules'])
+
+        student_groups = dict(Student.objects.filter(pk__in=student_ids)
+                              .values_list('id', 'faculty_educational_group_id'))
+        # sessions of one slot share nobody, so small pools run fewer of them at once
+        parallel = min(len(Session.CLASS_CHOICES), len(student_ids), len(teacher_ids) // TEACHERS_PER_SESSION)
+        per_schedule = spread_sessions(options['sessions'], [
+            schedule_capacity(schedule.start_date, schedule.end_date, parallel) for schedule in schedules
+        ])
+        jobs = [
+            (schedule.id, schedule.start_date, schedule.end_date, count, options['seed'] + index,
+             student_groups, teacher_ids, parallel, options['batch_size'])
+            for index, (schedule, count) in enumerate(zip(schedules, per_schedule))
+        ]
+
+        if options['workers'] > 1:
+            # children must open their own connections
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(options['workers']) as pool:
+                created = pool.starmap(generate_schedule_sessions, jobs)
+        else:
+            created = [generate_schedule_sessions(*job) for job in jobs]
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(student_ids)} students, {len(teacher_ids)} teachers, {len(schedules)} schedules, "
+            f"{sum(sessions for sessions, _ in created)} sessions, {sum(judges for _, judges in created)} judges"
+        ))
+
+    def clear(self):
+        # generated people have made up addresses; their sessions go with their judges
+        with transaction.atomic(), notifications.suspended(), judge_counts.suspended():
+            Session.objects.filter(created_by=CREATED_BY).delete()
+            Student.objects.filter(student_number__startswith=STUDENT_PREFIX).delete()
+            Teacher.objects.filter(faculty_id__startswith=TEACHER_PREFIX).delete()
+            get_user_model().objects.filter(username__startswith='load_').delete()
+
+    def create_faculty_groups(self):
+        FacultyEducationalGroup.objects.bulk_create([
+            FacultyEducationalGroup(faculty=faculty, educational_group=group)
+            for faculty in FacultyEducationalGroup.FACULTY_CHOICES_DICT
+            for group, _ in FacultyEducationalGroup.EDUCATIONAL_GROUP_CHOICES.get(faculty, [])
+        ], ignore_conflicts=True)
+        return list(FacultyEducationalGroup.objects.values_list('id', 'faculty'))
+
+    def create_admin_users(self, groups, password):
+        User = get_user_model()
+        roles = ['ALL'] + sorted({faculty for _, faculty in groups})
+        for index, role in enumerate(roles):
+            username = f"load_{role.lower()}"
+            if User.objects.filter(username=username).exists():
+                continue
+            User.objects.create_superuser(
+                username=username, password=password, email=f"{username}@guilan.ac.ir",
+                phone_number=f"0990{index:07d}", first_name='کاربر', last_name='آزمایشی', role=role,
+            )
+
+    def create_students(self, count, groups, rng, fake, batch_size):
+        students = []
+        for i in range(count):
+            gender = rng.choice(['Male', 'Female'])
+            students.append(Student(
+                first_name=fake.first_name_male() if gender == 'Male' else fake.first_name_female(),
+                last_name=fake.last_name(),
+                email=f"ld.student{i}@guilan.ac.ir",
+                phone_number=f"0911{i:07d}",
+                student_number=f"{STUDENT_PREFIX}{i:08d}",
+                role=rng.choices(['Master', 'Ph.D.'], weights=[4, 1])[0],
+                status=rng.choices(['Current', 'Defended'], weights=[3, 1])[0],
+                admission_year=rng.randint(1395, 1403),
+                gender=gender,
+                military_status=rng.choice(['Subject', 'NotSubject']),
+                program_type=rng.choice(['Day', 'Night', 'Campus']),
+                faculty_educational_group_id=rng.choice(groups)[0],
+            ))
+        Student.objects.bulk_create(students, batch_size=batch_size, ignore_conflicts=True)
+        return list(Student.objects.filter(student_number__startswith=STUDENT_PREFIX)
+                    .order_by('id').values_list('id', flat=True))
+
+    def create_teachers(self, count, groups, rng, fake, batch_size):
+        Teacher.objects.bulk_create([
+            Teacher(
+                first_name=fake.first_name(),
+                last_name=fake.last_name(),
+                email=f"ld.teacher{i}@guilan.ac.ir",
+                phone_number=f"0912{i:07d}",
+                national_code=f"9{i:09d}",
+                faculty_id=f"{TEACHER_PREFIX}{i:08d}",
+                degree=rng.choices(['PHD', 'MASTER'], weights=[5, 1])[0],
+            )
+            for i in range(count)
+        ], batch_size=batch_size, ignore_conflicts=True)
+        teacher_ids = list(Teacher.objects.filter(faculty_id__startswith=TEACHER_PREFIX)
+                           .order_by('id').values_list('id', flat=True))
+
+        assigned = set(TeacherFacultyEducationalGroupAssignment.objects.filter(teacher__in=teacher_ids)
+                       .values_list('teacher_id', flat=True))
+        TeacherFacultyEducationalGroupAssignment.objects.bulk_create([
+            TeacherFacultyEducationalGroupAssignment(teacher_id=teacher_id, faculty_educational_group_id=group_id)
+            for teacher_id in teacher_ids if teacher_id not in assigned
+            for group_id, _ in rng.sample(groups, min(len(groups), rng.randint(1, 2)))
+        ], batch_size=batch_size)
+        return teacher_ids
+
+    def create_schedules(self, count):
+        schedules = []
+        semesters = list(SEMESTER_WINDOWS)
+        for index in range(count):
+            year = 1396 + index // len(semesters)
+            semester = semesters[index % len(semesters)]
+            start_month, start_day, end_month, end_day = SEMESTER_WINDOWS[semester]
+            schedule, _ = Schedule.objects.get_or_create(year=year, semester=semester, defaults={
+                'start_date': jdatetime.date(year, start_month, start_day).togregorian(),
+                'end_date': jdatetime.date(year, end_month, end_day).togregorian(),
+            })
+            schedules.append(schedule)
+        return schedules
+
+
+def schedule_capacity(start_date, end_date, parallel):
+    """ Sessions that fit in a schedule: `parallel` classes in every slot of every day """
+    days = (end_date - start_date).days + 1
+    return days * parallel * SLOTS_PER_DAY_MAX
+
+
+def spread_sessions(total, capacities):
+    """ Split `total` sessions evenly over the schedules, moving what a full one cannot hold to the others """
+    if total > sum(capacities):
+        raise CommandError(f"{total} sessions do not fit in the schedules, at most {sum(capacities)} do; "
+                           "use more schedules or fewer sessions")
+    counts = [0] * len(capacities)
+    open_schedules = list(range(len(capacities)))
+    while total:
+        share = max(1, total // len(open_schedules))
+        for index in list(open_schedules):
+            placed = min(share, capacities[index] - counts[index], total)
+            counts[index] += placed
+            total -= placed
+            if counts[index] == capacities[index]:
+                open_schedules.remove(index)
+            if not total:
+                break
+    return counts
+
+
+def generate_schedule_sessions(schedule_id, start_date, end_date, count, seed,
+                               student_groups, teacher_ids, parallel, batch_size):
+    """
+    Place `count` sessions in one schedule. Days are cut into equal time slots and
+    at most `parallel` sessions, one per class, run in a slot; everybody taking part
+    in a slot (students, professors, judges) is drawn without replacement, so no
+    room, student, professor or judge ever overlaps.
+    """
+    if not count:
+        return 0, 0
+    rng = random.Random(seed)
+    days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    rooms = [number for number, _ in Session.CLASS_CHOICES]
+    per_day = math.ceil(count / len(days))
+    # capped so the last slot still ends by 21:00 (spread_sessions keeps `count` within that)
+    slots_per_day = min(math.ceil(per_day / parallel), SLOTS_PER_DAY_MAX)
+    per_day = min(per_day, slots_per_day * parallel)
+    slot_minutes = max(SLOT_MINUTES_MIN, min(120, DAY_MINUTES // slots_per_day))
+    student_ids = list(student_groups)
+    today = date.today()
+
+    sessions, judges = [], []
+    created_sessions = created_judges = 0
+    for day in days:
+        placed_today = 0
+        for slot in range(slots_per_day):
+            concurrent = min(parallel, count - created_sessions - len(sessions), per_day - placed_today)
+            if concurrent <= 0:
+                break
+            start = datetime.combine(day, datetime.min.time()) + timedelta(minutes=DAY_START + slot * slot_minutes)
+            start_time, end_time = start.time(), (start + timedelta(minutes=slot_minutes)).time()
+            placed_today += concurrent
+
+            students = rng.sample(student_ids, concurrent)
+            teachers = iter(rng.sample(teacher_ids, concurrent * TEACHERS_PER_SESSION))
+            for room, student_id in zip(rng.sample(rooms, concurrent), students):
+                people = [next(teachers) for _ in range(TEACHERS_PER_SESSION)]
+                session_judges = people[5:5 + rng.choice([2, 3, 3])]
+                sessions.append(Session(
+                    schedule_id=schedule_id, date=day, start_time=start_time, end_time=end_time,
+                    class_number=room, student_id=student_id,
+                    faculty_educational_group_id=student_groups[student_id],
+                    supervisor1_id=people[0],
+                    supervisor2_id=people[1] if rng.random() < 0.3 else None,
+                    supervisor3_id=people[2] if rng.random() < 0.5 else None,
+                    supervisor4_id=people[3] if rng.random() < 0.2 else None,
+                    graduate_monitor_id=people[4],
+                    session_status=day < today,
+                    # bulk_create sends no signals, the counters are set here
+                    judge_count=len(session_judges), is_active=True,
+                    created_by=CREATED_BY, updated_by=CREATED_BY,
+                ))
+                judges.append(session_judges)
+
+        if len(sessions) >= batch_size:
+            created_judges += _save_batch(sessions, judges)
+            created_sessions += len(sessions)
+            sessions, judges = [], []
+
+    if sessions:
+        created_judges += _save_batch(sessions, judges)
+        created_sessions += len(sessions)
+    return created_sessions, created_judges
+
+
+def _save_batch(sessions, judges):
+    with transaction.atomic():
+        Session.objects.bulk_create(sessions)
+        assignments = [
+            JudgeAssignment(session_id=session.pk, schedule_id=session.schedule_id, judge_id=judge_id)
+            for session, session_judges in zip(sessions, judges)
+            for judge_id in session_judges
+        ]
+        JudgeAssignment.objects.bulk_create(assignments)
+    return len(assignments)
@@ -0,0 +1,97 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, migrations, transaction
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+
+from assignment import partitions
+from assignment.checks import check_session_partitions
+from schedule.models import Schedule
+
+MIGRATION_NAME = 'partition_sessions'
+
+
+class Command(BaseCommand):
+    help = ("Write the migration converting assignment_session and assignment_judgeassignment into PostgreSQL "
+            "tables partitioned by schedule (`migrate` moves the existing rows in one transaction, the tables "
+            "are locked meanwhile). Once they are partitioned, drop the partitions of deleted and archived "
+            "schedules and create the missing ones.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="print the SQL without writing or running it")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("table partitioning needs PostgreSQL")
+        # the foreign key of the judges is the only mismatch this command repairs
+        errors = [error for error in check_session_partitions(None, databases=[DEFAULT_DB_ALIAS])
+                  if error.id != 'assignment.E003']
+        if errors:
+            raise CommandError("\n".join(error.msg for error in errors))
+        if partitions.is_partitioned():
+            self.repair(options['dry_run'])
+            return
+
+        with connection.cursor() as cursor:
+            blocking = partitions.incoming_foreign_keys(cursor)
+        if blocking:
+            raise CommandError(f"these tables reference sessions and must be handled first: {', '.join(blocking)}")
+
+        if options['dry_run']:
+            schedule_ids = list(Schedule.objects.order_by('id').values_list('id', flat=True))
+            statements = partitions.partition_tables(schedule_ids, dry_run=True)
+            self.stdout.write(";\n".join(statements) + ";")
+            return
+        path = self.write_migration()
+        self.stdout.write(self.style.SUCCESS(
+            f"wrote {path}; run `migrate` during a maintenance window to partition the tables"
+        ))
+
+    def write_migration(self):
+        """ The migration running partitions.partition, after the latest one of assignment """
+        loader = MigrationLoader(None, ignore_no_migrations=True)
+        written = [name for app_label, name in loader.disk_migrations
+                   if app_label == 'assignment' and name.endswith(MIGRATION_NAME)]
+        if written:
+            raise CommandError(f"{written[0]} is already written, run `migrate`")
+        leaves = loader.graph.leaf_nodes('assignment')
+        if len(leaves) != 1:
+            raise CommandError("assignment has no migrations or conflicting ones, run `makemigrations` first")
+        number = int(leaves[0][1].split('_')[0]) + 1
+
+        migration = migrations.Migration(f"{number:04d}_{MIGRATION_NAME}", 'assignment')
+        migration.dependencies = leaves
+        migration.operations = [migrations.RunPython(partitions.partition)]
+        writer = MigrationWriter(migration)
+        with open(writer.path, 'w', encoding='utf-8') as file:
+            file.write(writer.as_string())
+        return writer.path
+
+    def repair(self, dry_run):
+        with connection.cursor() as cursor:
+            foreign_keys = partitions.session_foreign_keys(cursor)
+            statements = [] if list(foreign_keys.values()) == [partitions.SESSION_FK_DEFINITION] \
+                else partitions.session_fk_statements(cursor)
+            existing = partitions.schedule_partitions(cursor)
+        open_schedules = set(Schedule.objects.filter(archived_at__isnull=True).values_list('id', flat=True))
+        # their sessions were deleted or archived along with them
+        unused = sorted(existing - open_schedules)
+        if dry_run:
+            self.stdout.write(";\n".join(statements) + ";" if statements else "the foreign key of the judges is fine")
+            self.stdout.write(f"partitions to drop: {', '.join(map(str, unused)) or 'none'}")
+            return
+        with transaction.atomic(), connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+        start = time.perf_counter()
+        for schedule_id in unused:
+            # one short transaction per schedule, each locks the tables only while detaching
+            with transaction.atomic():
+                partitions.drop_schedule_partitions(schedule_id)
+        # new schedules get their partitions from assignment.signals; add any that are missing
+        for schedule_id in open_schedules - existing:
+            partitions.create_schedule_partitions(schedule_id)
+        self.stdout.write("already partitioned, " + ("foreign key of the judges replaced, " if statements else "")
+                          + f"{len(unused)} unused schedule partitions dropped in {time.perf_counter() - start:.1f} s "
+                          f"and missing ones created")
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from assignment import judge_counts
+from assignment.models import Session
+from schedule.models import Schedule
+
+
+class Command(BaseCommand):
+    help = ("Recount Session.judge_count and is_active from the judges, one schedule at a time, and report "
+            "the sessions that had drifted (after bulk imports, raw SQL or the first migrate).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('schedule_ids', nargs='*', type=int, help="schedules to check (default: all)")
+        parser.add_argument('--dry-run', action='store_true', help="only report the drifted sessions")
+
+    def handle(self, *args, **options):
+        schedules = Schedule.objects.filter(archived_at__isnull=True).order_by('id')
+        if options['schedule_ids']:
+            schedules = schedules.filter(id__in=options['schedule_ids'])
+            missing = set(options['schedule_ids']) - set(schedules.values_list('id', flat=True))
+            if missing:
+                raise CommandError(f"no open schedule with id {', '.join(map(str, sorted(missing)))}")
+
+        total = 0
+        for schedule_id in schedules.values_list('id', flat=True):
+            start = time.perf_counter()
+            sessions = Session.objects.filter(schedule_id=schedule_id)
+            if options['dry_run']:
+                drifted = list(judge_counts.drifted(sessions).order_by('id').values_list('id', flat=True))
+                count = len(drifted)
+                if drifted:
+                    sample = ', '.join(map(str, drifted[:20])) + (' ...' if count > 20 else '')
+                    self.stdout.write(f"schedule {schedule_id}: {count} drifted sessions: {sample}")
+                    total += count
+                continue
+            count = judge_counts.recount(sessions)  # a single UPDATE per schedule
+            total += count
+            self.stdout.write(f"schedule {schedule_id}: {count} sessions fixed in {time.perf_counter() - start:.1f} s")
+
+        style = self.style.SUCCESS if not total or not options['dry_run'] else self.style.WARNING
+        self.stdout.write(style(f"{total} sessions {'drifted' if options['dry_run'] else 'fixed'}"))
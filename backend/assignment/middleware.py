@@ -0,0 +1,14 @@
+from . import history
+
+
+class ChangeHistoryMiddleware:
+    """
+    Session and judge changes made during the request are attributed to its user and
+    sent to the history stream together at the end (see assignment.history)
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with history.request_scope(lambda: request.user.username if request.user.is_authenticated else None):
+            return self.get_response(request)
@@ -1,11 +1,28 @@
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Q, Case, When, F, Value, CharField
 from django.db.models.functions import Concat
 from jalali_date import date2jalali
 
-class Session(models.Model):
+class TrackChangesMixin:
+    """ Remembers the values an instance was loaded with, so assignment.history can diff a save """
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # the next save is compared with what was just written
+        self._loaded_values = {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields if field.attname in self.__dict__
+        }
+
+
+class Session(TrackChangesMixin, models.Model):
 
     CLASS_CHOICES = [
         ('1', 'کلاس شماره 1'),
@@ -37,6 +54,17 @@ class Session(models.Model):
         help_text="تاریخ برنامه",
         verbose_name='تاریخ',
     )
+    # The schedule.CalendarDay of `date`, joined in reports; it has no column of its own
+    calendar_day = models.ForeignObject(
+        'schedule.CalendarDay',
+        on_delete=models.DO_NOTHING,
+        from_fields=['date'],
+        to_fields=['date'],
+        null=True,
+        editable=False,
+        related_name='sessions',
+        verbose_name="روز تقویم",
+    )
     start_time = models.TimeField(
         help_text="زمان شروع را تعیین کنید",
         verbose_name='زمان شروع'
@@ -108,6 +136,14 @@ class Session(models.Model):
         help_text="ناظر تحصیلات تکمیلی را انتخاب کنید (اجباری)"
     )
 
+    # Kept by assignment.judge_counts, not by forms
+    judge_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="تعداد داوران",
+        help_text="تعداد داوران تخصیص داده شده به این نشست",
+    )
+
     is_active = models.BooleanField(
         default=False,
         editable=False,
@@ -167,6 +203,25 @@ class Session(models.Model):
             models.UniqueConstraint(fields=['schedule', 'date', 'class_number',
                                             'start_time', 'end_time', 'faculty_educational_group'],
                                     name='unique_session',)]
+        indexes = [
+            # Conflict checks filter one day of a schedule and compare times and people;
+            # covering them lets PostgreSQL answer from the index alone
+            models.Index(fields=['schedule', 'date', 'start_time'],
+                         include=['end_time', 'class_number', 'student', 'supervisor1', 'supervisor2',
+                                  'supervisor3', 'supervisor4', 'graduate_monitor'],
+                         name='session_day_slot_idx'),
+            # Changelists: faculty scoped users, newest first
+            models.Index(fields=['faculty_educational_group', '-id'], name='session_feg_recent_idx'),
+            models.Index(fields=['-created_at'], name='session_created_at_idx'),
+            models.Index(fields=['-updated_at'], name='session_updated_at_idx'),
+            # Few rows match these, so partial indexes stay small
+            models.Index(fields=['-id'], condition=Q(is_active=False), name='session_inactive_idx'),
+            # Changelist sorted by the number of judges ("sessions without judges" first)
+            models.Index(fields=['judge_count', '-id'], name='session_judge_count_idx'),
+            # Upcoming sessions by (date, start_time): the reminder scan, see assignment.reminders
+            models.Index(fields=['date', 'start_time'], condition=Q(session_status=False),
+                         name='session_pending_slot_idx'),
+        ]
 
     @property
     def get_date_jalali(self):
@@ -175,13 +230,23 @@ class Session(models.Model):
         else:
             return "ثبت نشده است"
 
+    def save(self, *args, **kwargs):
+        loaded_schedule_id = getattr(self, '_loaded_values', {}).get('schedule_id')
+        if loaded_schedule_id is None or loaded_schedule_id == self.schedule_id:
+            return super().save(*args, **kwargs)
+        # judges are stored next to their session (partitioned by schedule) and are moved here only,
+        # the foreign key of partitioned tables is deferred to the end of this transaction
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            self.judges.update(schedule=self.schedule_id)
+
     def __str__(self):
         show_id = f" جلسه دفاعیه با شناسه {self.id}"
         show_date = f'{self.schedule} / تاریخ :  {self.get_date_jalali} / ساعت برگزاری : {self.start_time} الی  {self.end_time}'
         show_person = f"{self.student}"
         return f"{show_id} | {show_person} | {show_date}"
 
-class JudgeAssignment(models.Model):
+class JudgeAssignment(TrackChangesMixin, models.Model):
     session = models.ForeignKey(
         'Session',
         on_delete=models.CASCADE,
@@ -195,6 +260,172 @@ class JudgeAssignment(models.Model):
         verbose_name="داور",
         help_text="داور تخصیص داده شده"
     )
+    # Copy of session.schedule: the partition key of this table, see assignment.partitions
+    schedule = models.ForeignKey(
+        'schedule.Schedule',
+        on_delete=models.CASCADE,
+        related_name='+',
+        null=True,
+        editable=False,
+        verbose_name="زمانبندی",
+    )
+
+    def save(self, *args, **kwargs):
+        self.schedule_id = self.session.schedule_id
+        super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            # "sessions of these judges": judges first, the session id comes from the index
+            models.Index(fields=['judge', 'session'], name='judge_session_idx'),
+        ]
 
     def __str__(self):
         return f"{self.session} - {self.judge}"
+
+
+class ArchivedSession(models.Model):
+    """
+    A session of a closed schedule, moved out of Session by assignment.archive. One row
+    per session: the people and the judges are kept by id and name in `people`, so the
+    row still reads the same after teachers or students change or leave.
+    """
+    # the id the session had, so old references and exports still match
+    id = models.BigIntegerField(primary_key=True, verbose_name="شناسه جلسه")
+    schedule = models.ForeignKey(
+        'schedule.Schedule',
+        on_delete=models.CASCADE,
+        related_name='archived_sessions',
+        verbose_name="زمانبندی",
+    )
+    faculty_educational_group = models.ForeignKey(
+        'university_adminstration.FacultyEducationalGroup',
+        on_delete=models.CASCADE,
+        related_name='archived_sessions',
+        verbose_name="دانشکده و گروه آموزشی",
+    )
+    date = models.DateField(verbose_name='تاریخ')
+    calendar_day = models.ForeignObject('schedule.CalendarDay', on_delete=models.DO_NOTHING, from_fields=['date'],
+                                        to_fields=['date'], null=True, editable=False,
+                                        related_name='archived_sessions', verbose_name="روز تقویم")
+    start_time = models.TimeField(verbose_name='زمان شروع')
+    end_time = models.TimeField(verbose_name='زمان پایان')
+    class_number = models.CharField(max_length=1, choices=Session.CLASS_CHOICES, verbose_name="کلاس")
+    student_name = models.CharField(max_length=301, verbose_name="دانشجو")
+    # {"student": {"id": .., "name": ..}, "supervisor1": {..} or null, ..., "judges": [{..}, ..]}
+    people = models.JSONField(verbose_name="دانشجو، اساتید و داوران")
+    description = models.TextField(blank=True, null=True, verbose_name="توضیحات جلسه")
+    is_active = models.BooleanField(verbose_name="آیا این جلسه قابل برگزاری هست یا خیر")
+    session_status = models.BooleanField(verbose_name="وضعیت اتمام نشست")
+    created_at = models.DateTimeField(verbose_name="ساخته شده در زمان")
+    updated_at = models.DateTimeField(verbose_name="آخرین ویرایش در زمان")
+    created_by = models.CharField(max_length=100, null=True, blank=True, verbose_name="ایجاد شده توسط")
+    updated_by = models.CharField(max_length=100, null=True, blank=True, verbose_name="ویرایش شده توسط")
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name="بایگانی شده در زمان")
+
+    class Meta:
+        verbose_name = 'جلسه بایگانی شده'
+        verbose_name_plural = 'جلسات بایگانی شده'
+        indexes = [
+            models.Index(fields=['schedule', 'faculty_educational_group', 'date'], name='archived_schedule_idx'),
+        ]
+
+    @property
+    def get_date_jalali(self):
+        return date2jalali(self.date).strftime('%a, %d %b %Y')
+
+    def person_name(self, role):
+        person = self.people.get(role)
+        return person['name'] if person else None
+
+    @property
+    def judge_names(self):
+        return ", ".join(judge['name'] for judge in self.people.get('judges', []))
+
+    def __str__(self):
+        return f" جلسه دفاعیه بایگانی شده با شناسه {self.id} | {self.student_name} | {self.schedule} / تاریخ :  {self.get_date_jalali}"
+
+
+class SessionHistory(models.Model):
+    """
+    Append-only change history of sessions and their judges, written in batches by
+    assignment.history from a Redis stream. Rows are never updated or deleted; they
+    outlive the session (no foreign key) so archived and deleted sessions keep theirs.
+    """
+    ACTION_CHOICES = [
+        ('create', 'ایجاد'),
+        ('update', 'ویرایش'),
+        ('delete', 'حذف'),
+    ]
+    MODEL_CHOICES = [
+        ('session', 'جلسه'),
+        ('judge', 'داور'),
+    ]
+
+    session_id = models.BigIntegerField(verbose_name="شناسه جلسه")
+    model = models.CharField(max_length=7, choices=MODEL_CHOICES, verbose_name="نوع")
+    object_id = models.BigIntegerField(verbose_name="شناسه")
+    action = models.CharField(max_length=6, choices=ACTION_CHOICES, verbose_name="عملیات")
+    # {"field attname": [old, new], ...}, only the fields that changed
+    changes = models.JSONField(default=dict, verbose_name="تغییرات")
+    user = models.CharField(max_length=150, null=True, blank=True, verbose_name="کاربر")
+    changed_at = models.DateTimeField(verbose_name="زمان تغییر")
+    # id of the Redis stream entry, so a batch written twice (worker crash before the ack) is stored once
+    entry_id = models.CharField(max_length=32, unique=True, null=True, editable=False)
+
+    class Meta:
+        verbose_name = 'تاریخچه تغییرات جلسه'
+        verbose_name_plural = 'تاریخچه تغییرات جلسات'
+        indexes = [
+            # the timeline of one session, newest first
+            models.Index(fields=['session_id', '-changed_at'], name='history_session_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValidationError("تاریخچه تغییرات قابل ویرایش نیست")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValidationError("تاریخچه تغییرات قابل حذف نیست")
+
+    def __str__(self):
+        return f"{self.get_action_display()} {self.get_model_display()} {self.object_id} | جلسه {self.session_id}"
+
+
+class SessionReminder(models.Model):
+    """
+    A reminder of an upcoming session for one of its people, see assignment.reminders.
+    The row is created before the reminder is sent and the unique constraint keeps a
+    person from being reminded of the same session (on the same day) twice.
+    """
+    # no database constraint: on a partitioned database the session id alone is not unique
+    # (assignment.partitions); deleting a session still deletes its reminders
+    session = models.ForeignKey(
+        'Session',
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        db_index=False,  # the unique constraint starts with the session
+        related_name='reminders',
+        verbose_name="نشست",
+    )
+    # 'teacher:<pk>' or 'student:<pk>', as in assignment.notifications
+    recipient = models.CharField(max_length=32, verbose_name="گیرنده")
+    # the session's date when the reminder was due; a session moved to another day is reminded of again
+    date = models.DateField(verbose_name="تاریخ جلسه")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="زمان ثبت")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="زمان ارسال")
+
+    class Meta:
+        verbose_name = 'یادآوری جلسه'
+        verbose_name_plural = 'یادآوری جلسات'
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'recipient', 'date'], name='unique_session_reminder'),
+        ]
+        indexes = [
+            # reminders waiting to be sent, few at any time
+            models.Index(fields=['session'], condition=Q(sent_at__isnull=True), name='reminder_unsent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient} | جلسه {self.session_id}"
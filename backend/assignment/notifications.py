@@ -0,0 +1,329 @@
+"""
+Email notifications of session changes, and a daily digest of each teacher's duties.
+
+Nothing is sent on the request path. Once the transaction commits, a save or delete of
+a session or judge (assignment.signals) adds a member to the NOTIFY_DUE_KEY sorted set
+in Redis, scored with the time of the change:
+"changed:<session id>" tells everyone in the session, and "removed:<person>:<session id>"
+tells someone who is no longer part of it. Repeated edits of a session only move its
+score, so a session is announced once it has been left alone for NOTIFICATION_DELAY
+seconds.
+
+send_due_notifications (celery beat) claims the due members by moving them to
+NOTIFY_PROCESSING_KEY, loads their sessions, and writes one email per recipient covering
+all of their sessions. The emails are then sent NOTIFICATION_BATCH_SIZE at a time, over
+one SMTP connection per batch, by the rate limited send_email_batch_task. Members leave
+NOTIFY_PROCESSING_KEY once their emails are queued; the ones of a run that failed go
+back to NOTIFY_DUE_KEY after NOTIFICATION_CLAIM_TIMEOUT seconds.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from university_adminstration.models import Student, Teacher
+
+from .models import Session
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_DUE_KEY = "notifications:due"
+# Claimed members whose emails are not queued yet, scored with the time of the claim
+NOTIFY_PROCESSING_KEY = "notifications:processing"
+# Descriptions of deleted sessions, for the people they are announced to
+NOTIFY_DELETED_KEY = "notifications:deleted"
+DIGEST_SENT_KEY = "notifications:digest:{date}"
+# Members claimed per run of send_due_notifications
+CLAIM_SIZE = 5000
+
+PROFESSOR_ROLES = ('supervisor1', 'supervisor2', 'supervisor3', 'supervisor4', 'graduate_monitor')
+# A change of any other field (description, status...) is not announced
+NOTIFY_FIELDS = {'schedule_id', 'date', 'start_time', 'end_time', 'class_number', 'student_id',
+                 *(f'{role}_id' for role in PROFESSOR_ROLES)}
+JUDGE_ROLE = "داور"
+STUDENT_ROLE = "دانشجو"
+
+_suspended = ContextVar('notifications_suspended', default=False)
+
+
+def get_redis():
+    return get_redis_connection("default")
+
+
+@contextmanager
+def suspended():
+    """ Announce nothing in the block, e.g. sessions moved to the archive """
+    token = _suspended.set(True)
+    try:
+        yield
+    finally:
+        _suspended.reset(token)
+
+
+def _person(kind, pk):
+    return f"{kind}:{pk}"
+
+
+def describe(session):
+    """ One line about a session; also used for deleted sessions, so it reads no relation """
+    return (f"نشست شماره {session.pk} در تاریخ {session.get_date_jalali} از ساعت {session.start_time:%H:%M} "
+            f"تا {session.end_time:%H:%M} در کلاس {session.class_number}")
+
+
+def _mark(members, deleted=None):
+    if _suspended.get() or not members:
+        return
+
+    def publish():
+        now = time.time()
+        try:
+            pipeline = get_redis().pipeline(transaction=False)
+            if deleted:
+                pipeline.hset(NOTIFY_DELETED_KEY, mapping=deleted)
+            pipeline.zadd(NOTIFY_DUE_KEY, {member: now for member in members})
+            pipeline.execute()
+        except RedisError:
+            logger.warning("notification queue unavailable, %d notifications dropped", len(members),
+                           exc_info=True)
+
+    transaction.on_commit(publish)
+
+
+def session_saved(session, created, changes):
+    """ `changes` as computed by assignment.history.diff """
+    if not (created or NOTIFY_FIELDS & changes.keys()):
+        return
+    members = [f"changed:{session.pk}"]
+    # people replaced by this save are told they no longer take part
+    for attname in changes.keys() & {'student_id', *(f'{role}_id' for role in PROFESSOR_ROLES)}:
+        old = changes[attname][0]
+        if old and not created:
+            kind = 'student' if attname == 'student_id' else 'teacher'
+            members.append(f"removed:{_person(kind, old)}:{session.pk}")
+    _mark(members)
+
+
+def session_deleted(session):
+    members = [f"removed:{_person('student', session.student_id)}:{session.pk}"]
+    members += [f"removed:{_person('teacher', getattr(session, f'{role}_id'))}:{session.pk}"
+                for role in PROFESSOR_ROLES if getattr(session, f'{role}_id')]
+    _mark(members, deleted={session.pk: describe(session)})
+
+
+def judge_saved(judge_assignment, created, changes):
+    if not (created or 'judge_id' in changes):
+        return
+    members = [f"changed:{judge_assignment.session_id}"]
+    if not created and changes['judge_id'][0]:
+        members.append(f"removed:{_person('teacher', changes['judge_id'][0])}:{judge_assignment.session_id}")
+    _mark(members)
+
+
+def judge_deleted(judge_assignment):
+    # also sent along with the deletion of its session, which describes the session
+    _mark([f"changed:{judge_assignment.session_id}",
+           f"removed:{_person('teacher', judge_assignment.judge_id)}:{judge_assignment.session_id}"])
+
+
+def participants(session):
+    """ [(person, role label, Teacher or Student)] of a session loaded with sessions_with_people """
+    people = [(_person('student', session.student_id), STUDENT_ROLE, session.student)]
+    for role in PROFESSOR_ROLES:
+        teacher = getattr(session, role)
+        if teacher is not None:
+            people.append((_person('teacher', teacher.pk), Session._meta.get_field(role).verbose_name, teacher))
+    people += [(_person('teacher', judge.judge_id), JUDGE_ROLE, judge.judge) for judge in session.judges.all()]
+    return people
+
+
+def sessions_with_people(queryset):
+    return queryset.select_related('schedule', 'student', *PROFESSOR_ROLES).prefetch_related('judges__judge')
+
+
+def _load_people(keys):
+    """ {person: Teacher or Student} of 'teacher:<pk>' / 'student:<pk>' keys """
+    ids = {'teacher': set(), 'student': set()}
+    for key in keys:
+        kind, pk = key.split(':')
+        ids[kind].add(int(pk))
+    people = {_person('teacher', teacher.pk): teacher for teacher in Teacher.objects.filter(pk__in=ids['teacher'])}
+    people.update((_person('student', student.pk), student)
+                  for student in Student.objects.filter(pk__in=ids['student']))
+    return people
+
+
+def _requeue_stale(redis):
+    """ Put the members of runs that did not queue their emails in time back in the due set """
+    stale = redis.zrangebyscore(NOTIFY_PROCESSING_KEY, '-inf', time.time() - settings.NOTIFICATION_CLAIM_TIMEOUT,
+                                withscores=True)
+    if not stale:
+        return
+    logger.warning("%d notifications were not queued in time, retrying them", len(stale))
+    pipeline = redis.pipeline(transaction=False)
+    # nx keeps the score of a member changed again in the meantime
+    pipeline.zadd(NOTIFY_DUE_KEY, dict(stale), nx=True)
+    pipeline.zrem(NOTIFY_PROCESSING_KEY, *(member for member, _ in stale))
+    pipeline.execute()
+
+
+def _claim_due():
+    """
+    Move the members whose delay has passed from the due set to the processing set; a
+    member is claimed by one run only. They stay there until _release.
+    """
+    redis = get_redis()
+    _requeue_stale(redis)
+    now = time.time()
+    due = redis.zrangebyscore(NOTIFY_DUE_KEY, '-inf', now - settings.NOTIFICATION_DELAY, start=0, num=CLAIM_SIZE)
+    if not due:
+        return []
+    pipeline = redis.pipeline(transaction=False)
+    for member in due:
+        pipeline.zrem(NOTIFY_DUE_KEY, member)
+    claimed = [member for member, removed in zip(due, pipeline.execute()) if removed]
+    if claimed:
+        redis.zadd(NOTIFY_PROCESSING_KEY, {member: now for member in claimed})
+    return [member.decode() for member in claimed]
+
+
+def _release(members, deleted_ids):
+    """ Forget the claimed members once their emails are queued """
+    pipeline = get_redis().pipeline(transaction=False)
+    pipeline.zrem(NOTIFY_PROCESSING_KEY, *members)
+    if deleted_ids:
+        pipeline.hdel(NOTIFY_DELETED_KEY, *deleted_ids)
+    pipeline.execute()
+
+
+def send_due_notifications():
+    """
+    Write one email per recipient of the changes whose delay has passed and queue them
+    for sending. Returns the number of emails queued.
+    """
+    from .tasks import send_email_batch_task
+
+    members = _claim_due()
+    if not members:
+        return 0
+    changed, removed = set(), []
+    for member in members:
+        kind, rest = member.split(':', 1)
+        if kind == 'changed':
+            changed.add(int(rest))
+        else:
+            person, session_id = rest.rsplit(':', 1)
+            removed.append((person, int(session_id)))
+
+    sessions = {session.pk: session for session in sessions_with_people(
+        Session.objects.filter(pk__in=changed | {session_id for _, session_id in removed}))}
+    deleted_ids = [session_id for _, session_id in removed if session_id not in sessions]
+    deleted = dict(zip(deleted_ids, get_redis().hmget(NOTIFY_DELETED_KEY, deleted_ids))) if deleted_ids else {}
+
+    # recipient -> what to tell them
+    updates, removals, people = {}, {}, {}
+    for session_id in changed:
+        if session_id not in sessions:
+            continue  # deleted in the meantime, its people are told through "removed"
+        for person, role, obj in participants(sessions[session_id]):
+            updates.setdefault(person, []).append((sessions[session_id], role))
+            people[person] = obj
+    for person, session_id in removed:
+        session = sessions.get(session_id)
+        if session is not None and any(person == key for key, _, _ in participants(session)):
+            continue  # replaced and added back before the delay passed
+        if session is not None:
+            description = describe(session)
+        else:
+            description = (deleted.get(session_id) or f"نشست شماره {session_id}".encode()).decode()
+        removals.setdefault(person, []).append(description)
+    people.update(_load_people(removals.keys() - people.keys()))
+
+    messages = []
+    for person in updates.keys() | removals.keys():
+        recipient = people.get(person)
+        if recipient is None or not recipient.email:
+            continue
+        body = render_to_string('assignment/emails/session_changes.txt', {
+            'name': recipient.name,
+            'updates': sorted(updates.get(person, []), key=lambda item: (item[0].date, item[0].start_time)),
+            'removals': removals.get(person, []),
+        })
+        messages.append((recipient.email, "تغییر در جلسات دفاع شما", body))
+
+    queued = queue_emails(messages, send_email_batch_task)
+    _release(members, deleted_ids)
+    return queued
+
+
+def send_daily_digest(today=None):
+    """
+    Email every teacher their sessions of the next NOTIFICATION_DIGEST_DAYS days, once
+    per day however often it is called: the day is only marked sent once every email is
+    queued. Returns the number of emails queued.
+    """
+    from .tasks import send_email_batch_task
+
+    today = today or timezone.localdate()
+    key = DIGEST_SENT_KEY.format(date=today.isoformat())
+    # a run in progress holds the key until NOTIFICATION_CLAIM_TIMEOUT, so two runs never both send
+    if not get_redis().set(key, 'sending', nx=True, ex=settings.NOTIFICATION_CLAIM_TIMEOUT):
+        return 0
+    try:
+        queued = _queue_digest(today, send_email_batch_task)
+    except Exception:
+        get_redis().delete(key)
+        raise
+    get_redis().set(key, 'sent', ex=2 * 24 * 3600)
+    return queued
+
+
+def _queue_digest(today, task):
+    sessions = sessions_with_people(Session.objects.filter(
+        date__gte=today, date__lt=today + timedelta(days=settings.NOTIFICATION_DIGEST_DAYS), session_status=False,
+    )).order_by('date', 'start_time')
+
+    duties, teachers = {}, {}
+    for session in sessions:
+        for person, role, obj in participants(session):
+            if person.startswith('teacher:'):
+                duties.setdefault(person, []).append((session, role))
+                teachers[person] = obj
+
+    messages = [
+        (teacher.email, "برنامه جلسات دفاع پیش رو",
+         render_to_string('assignment/emails/daily_digest.txt', {
+             'name': teacher.name, 'duties': duties[person], 'days': settings.NOTIFICATION_DIGEST_DAYS,
+         }))
+        for person, teacher in teachers.items() if teacher.email
+    ]
+    return queue_emails(messages, task)
+
+
+def queue_emails(messages, task):
+    size = settings.NOTIFICATION_BATCH_SIZE
+    for start in range(0, len(messages), size):
+        task.delay(messages[start:start + size])
+    return len(messages)
+
+
+def send_emails(messages):
+    """ Send (to, subject, body) messages over one connection; returns the ones that failed """
+    failed = []
+    with get_connection() as connection:
+        for to, subject, body in messages:
+            try:
+                EmailMessage(subject, body, to=[to], connection=connection).send()
+            except OSError:  # smtplib.SMTPException is an OSError
+                logger.warning("sending a notification to %s failed", to, exc_info=True)
+                failed.append((to, subject, body))
+    return failed
+
@@ -0,0 +1,146 @@
+"""
+Occupancy of one day of a schedule, for the live conflict check of the session form.
+
+The snapshot lists every session of a (schedule, date) with its time, class, student,
+professors and judges, and is built with a few queries and kept in the cache. Saves and
+deletes of sessions and judges bump the day's version (assignment.signals), so a check
+never reads a snapshot older than the last committed change. The check itself compares
+a proposed session against the snapshot in Python; the full validators of
+SessionAdminForm and JudgeAssignmentFormSet still run when the form is submitted.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+from schedule.models import Schedule
+from university_adminstration.models import FacultyEducationalGroup, Teacher
+
+from .models import JudgeAssignment, Session
+
+OCCUPANCY_CACHE_SECONDS = 15 * 60
+PROFESSOR_ROLES = ('supervisor1', 'supervisor2', 'supervisor3', 'supervisor4', 'graduate_monitor')
+
+
+def _version_key(schedule_id, date=None):
+    return f"occupancy:version:{schedule_id}:{date.isoformat() if date else 'all'}"
+
+
+def snapshot(schedule_id, date):
+    """ The cached occupancy of `date` in the schedule; None if there is no such schedule """
+    version_keys = [_version_key(schedule_id), _version_key(schedule_id, date)]
+    versions = cache.get_many(version_keys)
+    key = f"occupancy:{schedule_id}:{date.isoformat()}:" + ".".join(str(versions.get(k, 0)) for k in version_keys)
+    occupancy = cache.get(key)
+    if occupancy is None:
+        occupancy = build_snapshot(schedule_id, date)
+        if occupancy is not None:
+            cache.set(key, occupancy, OCCUPANCY_CACHE_SECONDS)
+    return occupancy
+
+
+def build_snapshot(schedule_id, date):
+    schedule = Schedule.objects.filter(pk=schedule_id).values('start_date', 'end_date').first()
+    if schedule is None:
+        return None
+    sessions = {
+        row['id']: dict(row, judges=[])
+        for row in Session.objects.filter(schedule_id=schedule_id, date=date).values(
+            'id', 'start_time', 'end_time', 'class_number', 'student_id', 'faculty_educational_group_id',
+            *(f'{role}_id' for role in PROFESSOR_ROLES),
+        )
+    }
+    for session_id, judge_id in JudgeAssignment.objects.filter(
+        schedule_id=schedule_id, session__date=date,
+    ).values_list('session_id', 'judge_id'):
+        sessions[session_id]['judges'].append(judge_id)
+
+    teacher_ids = {session[f'{role}_id'] for session in sessions.values() for role in PROFESSOR_ROLES}
+    teacher_ids.update(judge for session in sessions.values() for judge in session['judges'])
+    teacher_ids.discard(None)
+    group_ids = {session['faculty_educational_group_id'] for session in sessions.values()}
+    return {
+        'start_date': schedule['start_date'],
+        'end_date': schedule['end_date'],
+        'sessions': list(sessions.values()),
+        'teachers': {
+            pk: f'{first_name} {last_name}'
+            for pk, first_name, last_name in Teacher.objects.filter(pk__in=teacher_ids).values_list(
+                'pk', 'first_name', 'last_name')
+        },
+        'groups': {
+            group.pk: f"{group.get_faculty_display()} و گروه آموزشی {group.get_educational_group_display()}"
+            for group in FacultyEducationalGroup.objects.filter(pk__in=group_ids)
+        },
+    }
+
+
+def invalidate(schedule_id, date=None):
+    """
+    Drop the snapshot of the day (of every day of the schedule without `date`) once the
+    current transaction commits
+    """
+    if schedule_id is None:
+        return
+    key = _version_key(schedule_id, date)
+
+    def bump():
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+    transaction.on_commit(bump, robust=True)
+
+
+def find_conflicts(occupancy, proposal, session_id=None):
+    """
+    Conflicts of `proposal` (the form's values: start_time, end_time, date, class_number,
+    student, the PROFESSOR_ROLES and a list of judges, all people as ids) with the sessions
+    of `occupancy`. Returns [{'field', 'value', 'session', 'message'}].
+    """
+    conflicts = []
+
+    def add(field, message, value=None, session=None):
+        conflicts.append({'field': field, 'value': value, 'session': session, 'message': message})
+
+    start, end = proposal['start_time'], proposal['end_time']
+    if not occupancy['start_date'] <= proposal['date'] <= occupancy['end_date']:
+        add('date', "تاریخ برگزاری جلسه میبایست در بین تاریخ شروع و پایان نیم سال تحصیلی باشد")
+    if start >= end:
+        add('end_time', "زمان شروع جلسه باید قبل از زمان پایان باشد")
+        return conflicts
+
+    professors = {role: proposal.get(role) for role in PROFESSOR_ROLES if proposal.get(role)}
+    seen = set()
+    for role, teacher in professors.items():
+        if teacher in seen:
+            add(role, "اساتید یک نشست نمی‌توانند تکراری باشند", teacher)
+        seen.add(teacher)
+    judges = proposal.get('judges', [])
+    seen_judges = set()
+    for judge in judges:
+        if judge in seen:
+            add('judge', "داور نمی‌تواند یکی از اساتید یا ناظر همین نشست باشد", judge)
+        elif judge in seen_judges:
+            add('judge', "داوران در یک نشست نمیتوانند تکراری باشند", judge)
+        seen_judges.add(judge)
+
+    teachers = occupancy['teachers']
+    for other in occupancy['sessions']:
+        if other['id'] == session_id or not (start < other['end_time'] and end > other['start_time']):
+            continue
+        where = (f"در کلاس {other['class_number']} در {occupancy['groups'][other['faculty_educational_group_id']]} "
+                 f"در بازه زمانی {other['start_time']} تا {other['end_time']} (شناسه نشست {other['id']})")
+
+        if proposal.get('class_number') and other['class_number'] == proposal['class_number']:
+            add('class_number', f"این کلاس در این زمان رزرو شده است: نشست دیگری {where}", session=other['id'])
+        if proposal.get('student') and other['student_id'] == proposal['student']:
+            add('student', f"دانشجو در نشست دیگری {where} حضور دارد", proposal['student'], other['id'])
+
+        busy = {other[f'{role}_id']: Session._meta.get_field(role).verbose_name
+                for role in PROFESSOR_ROLES if other[f'{role}_id']}
+        busy.update((judge, 'داور') for judge in other['judges'])
+        for field, teacher in [*professors.items(), *(('judge', judge) for judge in seen_judges)]:
+            if teacher in busy:
+                add(field, f"استاد {teachers.get(teacher, teacher)} به عنوان {busy[teacher]} در نشست دیگری "
+                           f"{where} حضور دارد", teacher, other['id'])
+    return conflicts
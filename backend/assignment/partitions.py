@@ -0,0 +1,211 @@
+"""
+PostgreSQL LIST partitioning of sessions and their judges by schedule.
+
+Every schedule (one semester) gets its own partition of assignment_session and,
+co-located with it, of assignment_judgeassignment; a DEFAULT partition catches rows
+of schedules that have none yet. Queries that filter on the schedule (the conflict
+checks, download_session) only read the partitions of that semester.
+
+The conversion is a migration of the environment (migrations are not kept in the
+repository): `manage.py partition_sessions` writes it after the latest assignment
+migration and `migrate` runs `partition`. New schedules get their partitions from the
+signals in assignment.signals; the partitions of deleted and archived schedules are
+dropped by `partition_sessions` again, outside of the requests that delete them.
+Django 5.1 cannot describe a primary key of two columns, so the migration state keeps
+the single column one; the system check in assignment.checks refuses a database whose
+tables do not match either shape.
+
+Judges reference their session by (session_id, schedule_id). The foreign key is
+deferred and does not cascade updates: Session.save moves the judges of a session
+whose schedule changed, on every database.
+"""
+import re
+
+from django.db import connection, transaction
+
+from .models import Session, JudgeAssignment
+
+SESSION_TABLE = Session._meta.db_table
+JUDGE_TABLE = JudgeAssignment._meta.db_table
+TABLES = (SESSION_TABLE, JUDGE_TABLE)
+
+# unique keys of a partitioned table must contain the partition key
+PARTITIONED_PRIMARY_KEY = 'PRIMARY KEY (id, schedule_id)'
+SESSION_FK = f"{JUDGE_TABLE}_session_fk"
+# as pg_get_constraintdef prints it
+SESSION_FK_DEFINITION = (f'FOREIGN KEY (session_id, schedule_id) REFERENCES {SESSION_TABLE}(id, schedule_id) '
+                         f'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED')
+
+
+def is_partitioned(table=SESSION_TABLE):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def primary_key(cursor, table):
+    """ Definition of the primary key of `table`, None when the table does not exist """
+    cursor.execute(
+        "SELECT pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p'",
+        [table],
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def session_foreign_keys(cursor):
+    """ {name: definition} of the judges' foreign keys to sessions, without the copies on partitions """
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE contype = 'f' "
+        "AND conrelid = %s::regclass AND confrelid = %s::regclass AND conparentid = 0",
+        [JUDGE_TABLE, SESSION_TABLE],
+    )
+    return dict(cursor.fetchall())
+
+
+def session_fk_statements(cursor):
+    """ SQL replacing the judges' foreign keys to the partitioned sessions with SESSION_FK """
+    statements = [f'ALTER TABLE "{JUDGE_TABLE}" DROP CONSTRAINT "{name}"' for name in session_foreign_keys(cursor)]
+    return statements + [f'ALTER TABLE "{JUDGE_TABLE}" ADD CONSTRAINT "{SESSION_FK}" {SESSION_FK_DEFINITION}']
+
+
+def partition_name(table, schedule_id):
+    return f"{table}_s{schedule_id}"
+
+
+def create_schedule_partitions(schedule_id):
+    """ Partitions of both tables for one schedule; no-op when they exist or nothing is partitioned """
+    if not is_partitioned():
+        return
+    with connection.cursor() as cursor:
+        for table in TABLES:
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS "{partition_name(table, schedule_id)}" '
+                f'PARTITION OF "{table}" FOR VALUES IN ({int(schedule_id)})'
+            )
+
+
+def drop_schedule_partitions(schedule_id):
+    if not is_partitioned():
+        return
+    with connection.cursor() as cursor:
+        # judges first, their foreign key points at the session partition; detaching
+        # removes the foreign key's dependency on the partition so it can be dropped
+        for table in (JUDGE_TABLE, SESSION_TABLE):
+            name = partition_name(table, schedule_id)
+            cursor.execute("SELECT to_regclass(%s)", [name])
+            if cursor.fetchone()[0] is None:
+                continue
+            cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"')
+            cursor.execute(f'DROP TABLE "{name}"')
+
+
+def schedule_partitions(cursor):
+    """ Schedule ids that have a session partition """
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass",
+        [SESSION_TABLE],
+    )
+    pattern = re.compile(rf'{re.escape(SESSION_TABLE)}_s(\d+)')
+    return {int(match[1]) for (name,) in cursor.fetchall() if (match := pattern.fullmatch(name))}
+
+
+def partition_statements(cursor, schedule_ids):
+    """
+    SQL converting both plain tables into partitioned ones, in order. Indexes and
+    constraints are read from the catalog, so the ones added by later migrations
+    are carried over too.
+    """
+    statements = [
+        # Django's foreign keys are deferred; their pending checks would block dropping the old tables
+        'SET CONSTRAINTS ALL IMMEDIATE',
+        # judges created before the schedule column existed
+        f'UPDATE "{JUDGE_TABLE}" j SET schedule_id = s.schedule_id FROM "{SESSION_TABLE}" s '
+        f'WHERE s.id = j.session_id AND j.schedule_id IS NULL',
+    ]
+    deferred = []
+    for table in TABLES:
+        old = f"{table}_unpartitioned"
+        cursor.execute(
+            "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f')", [table],
+        )
+        constraints = cursor.fetchall()
+        # plain indexes; the ones backing the primary key and unique constraints come with them
+        cursor.execute(
+            "SELECT i.relname, pg_get_indexdef(i.oid) FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid "
+            "WHERE x.indrelid = %s::regclass AND NOT EXISTS "
+            "(SELECT 1 FROM pg_constraint c WHERE c.conindid = i.oid AND c.conrelid = x.indrelid)", [table],
+        )
+        indexes = cursor.fetchall()
+
+        statements += [
+            f'ALTER TABLE "{table}" RENAME TO "{old}"',
+            f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS) PARTITION BY LIST (schedule_id)',
+            f'ALTER TABLE "{table}" ALTER COLUMN schedule_id SET NOT NULL',
+            # identity columns of partitioned tables need PostgreSQL 17, a sequence works everywhere
+            f'CREATE SEQUENCE "{table}_id_part_seq" OWNED BY "{table}".id',
+            f'ALTER TABLE "{table}" ALTER COLUMN id SET DEFAULT nextval(\'"{table}_id_part_seq"\')',
+            f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT',
+        ]
+        statements += [
+            f'CREATE TABLE "{partition_name(table, schedule_id)}" PARTITION OF "{table}" FOR VALUES IN ({schedule_id})'
+            for schedule_id in schedule_ids
+        ]
+        statements += [
+            f'INSERT INTO "{table}" SELECT * FROM "{old}"',
+            f'SELECT setval(\'"{table}_id_part_seq"\', COALESCE((SELECT MAX(id) FROM "{table}"), 0) + 1, false)',
+        ]
+        for name, definition in indexes:
+            statements += [
+                f'ALTER INDEX "{name}" RENAME TO "{name[:50]}_unpart"',
+                # read before the rename, so the definition already names the new table
+                definition,
+            ]
+        for name, kind, definition in constraints:
+            if kind == 'p':
+                definition = PARTITIONED_PRIMARY_KEY
+            elif kind == 'f' and table == JUDGE_TABLE and 'REFERENCES ' + SESSION_TABLE in definition:
+                # the session key alone is not unique any more
+                deferred.append(f'ALTER TABLE "{table}" ADD CONSTRAINT "{SESSION_FK}" {SESSION_FK_DEFINITION}')
+                continue
+            statements += [
+                f'ALTER TABLE "{old}" RENAME CONSTRAINT "{name}" TO "{name[:50]}_unpart"',
+                f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}',
+            ]
+
+    statements += deferred
+    statements += [f'DROP TABLE "{JUDGE_TABLE}_unpartitioned"', f'DROP TABLE "{SESSION_TABLE}_unpartitioned"']
+    statements += [f'ANALYZE "{table}"' for table in TABLES]
+    return statements
+
+
+def incoming_foreign_keys(cursor):
+    """ Tables other than the judges that reference sessions; they would block the conversion """
+    cursor.execute(
+        "SELECT conrelid::regclass::text FROM pg_constraint WHERE contype = 'f' "
+        "AND confrelid = %s::regclass AND conrelid <> %s::regclass", [SESSION_TABLE, JUDGE_TABLE],
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def partition(apps, schema_editor):
+    """ RunPython of the migration written by partition_sessions """
+    if schema_editor.connection.vendor != 'postgresql' or is_partitioned():
+        return
+    Schedule = apps.get_model('schedule', 'Schedule')
+    partition_tables(list(Schedule.objects.order_by('id').values_list('id', flat=True)))
+
+
+def partition_tables(schedule_ids, dry_run=False):
+    """ Convert both tables in one transaction; returns the executed (or planned) statements """
+    with transaction.atomic(), connection.cursor() as cursor:
+        statements = partition_statements(cursor, schedule_ids)
+        if not dry_run:
+            for statement in statements:
+                cursor.execute(statement)
+    return statements
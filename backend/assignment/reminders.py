@@ -0,0 +1,176 @@
+"""
+Reminders of upcoming sessions, emailed to everyone taking part in them.
+
+schedule_reminders (celery beat) reads the sessions that entered the reminder window,
+the next REMINDER_DAYS_AHEAD days, since its last run. It uses one range query on
+(date, start_time), served by session_pending_slot_idx, and walks it REMINDER_CHUNK_SIZE
+sessions at a time. For each chunk it creates one SessionReminder per person and queues
+one send_reminders_task. The end of the window is kept in Redis (REMINDER_HORIZON_KEY),
+and the next run starts there instead of scanning the window again.
+
+Sessions that are added to the window behind the horizon, or that get new people, are
+queued by the signals (REMINDER_LATE_KEY) and handled by the next run. SessionReminder's
+unique constraint makes every step safe to repeat: a lost horizon only costs a rescan,
+never a second email.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from . import notifications
+from .models import JudgeAssignment, Session, SessionReminder
+
+REMINDER_HORIZON_KEY = "reminders:horizon"
+REMINDER_LATE_KEY = "reminders:late"
+SCAN_FIELDS = ('id', 'schedule_id', 'date', 'start_time', 'student_id',
+               *(f'{role}_id' for role in notifications.PROFESSOR_ROLES))
+
+
+def get_redis():
+    return get_redis_connection("default")
+
+
+def _after(date, start_time, pk=None):
+    """ Sessions after (date, start_time[, pk]) in (date, start_time, id) order """
+    after = Q(date__gt=date) | Q(date=date, start_time__gt=start_time)
+    if pk is not None:
+        after |= Q(date=date, start_time=start_time, id__gt=pk)
+    return after
+
+
+def upcoming(start, end):
+    """ Sessions not finished yet that start after `start` and no later than `end` """
+    return Session.objects.filter(
+        _after(start.date(), start.time()) & (Q(date__lt=end.date()) | Q(date=end.date(), start_time__lte=end.time())),
+        session_status=False,
+    ).order_by('date', 'start_time', 'id')
+
+
+def _chunks(queryset):
+    """ Rows of `queryset` (in upcoming's order) REMINDER_CHUNK_SIZE at a time, by keyset """
+    size = settings.REMINDER_CHUNK_SIZE
+    last = None
+    while True:
+        page = queryset.filter(_after(*last)) if last else queryset
+        chunk = list(page.values(*SCAN_FIELDS)[:size])
+        if chunk:
+            yield chunk
+        if len(chunk) < size:
+            return
+        last = chunk[-1]['date'], chunk[-1]['start_time'], chunk[-1]['id']
+
+
+def _create_reminders(sessions):
+    """ A SessionReminder per person of each session (SCAN_FIELDS dicts), skipping the existing ones """
+    judges = JudgeAssignment.objects.filter(
+        session_id__in=[session['id'] for session in sessions],
+        schedule_id__in={session['schedule_id'] for session in sessions},
+    ).values_list('session_id', 'judge_id')
+    teachers = {session['id']: {session[f'{role}_id'] for role in notifications.PROFESSOR_ROLES} - {None}
+                for session in sessions}
+    for session_id, judge_id in judges:
+        teachers[session_id].add(judge_id)
+
+    rows = []
+    for session in sessions:
+        recipients = [f"student:{session['student_id']}", *(f"teacher:{pk}" for pk in teachers[session['id']])]
+        rows += [SessionReminder(session_id=session['id'], recipient=recipient, date=session['date'])
+                 for recipient in recipients]
+    SessionReminder.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def schedule_reminders(now=None):
+    """
+    Create the reminders of the sessions that entered the window since the last run, and
+    of the late ones, and queue them for sending one chunk per task. Returns the number
+    of sessions handled.
+    """
+    from .tasks import send_reminders_task
+
+    now = now or timezone.localtime()
+    end = now + timedelta(days=settings.REMINDER_DAYS_AHEAD)
+    redis = get_redis()
+    pipeline = redis.pipeline(transaction=False)
+    pipeline.get(REMINDER_HORIZON_KEY)
+    pipeline.smembers(REMINDER_LATE_KEY)
+    horizon, late = pipeline.execute()
+    start = max(now, datetime.fromisoformat(horizon.decode())) if horizon else now
+
+    count = 0
+    querysets = [upcoming(start, end)]
+    if late:
+        querysets.append(upcoming(now, end).filter(pk__in=[int(pk) for pk in late]))
+    for queryset in querysets:
+        for chunk in _chunks(queryset):
+            _create_reminders(chunk)
+            send_reminders_task.delay([session['id'] for session in chunk])
+            count += len(chunk)
+    pipeline = redis.pipeline(transaction=False)
+    if late:
+        pipeline.srem(REMINDER_LATE_KEY, *late)
+    if end > start:
+        pipeline.set(REMINDER_HORIZON_KEY, end.isoformat())
+    pipeline.execute()
+    return count
+
+
+def send_reminders(session_ids):
+    """
+    Send the unsent reminders of the sessions; a reminder is marked sent in the same
+    transaction that claims it. Returns the number of emails queued.
+    """
+    from .tasks import send_email_batch_task
+
+    with transaction.atomic():
+        reminders = list(SessionReminder.objects.select_for_update(skip_locked=True).filter(
+            session_id__in=session_ids, sent_at__isnull=True,
+        ))
+        if not reminders:
+            return 0
+        sessions = {session.pk: session for session in notifications.sessions_with_people(
+            Session.objects.filter(pk__in={reminder.session_id for reminder in reminders}))}
+        people = {session.pk: {person: (role, obj) for person, role, obj in notifications.participants(session)}
+                  for session in sessions.values()}
+
+        messages, sent, stale = [], [], []
+        for reminder in reminders:
+            session = sessions.get(reminder.session_id)
+            if session is None or session.date != reminder.date or reminder.recipient not in people[session.pk]:
+                # moved or no longer taking part since the reminder was created
+                stale.append(reminder.pk)
+                continue
+            role, recipient = people[session.pk][reminder.recipient]
+            sent.append(reminder.pk)
+            if recipient.email:
+                messages.append((recipient.email, "یادآوری جلسه دفاع", render_to_string(
+                    'assignment/emails/reminder.txt', {'name': recipient.name, 'session': session, 'role': role},
+                )))
+        SessionReminder.objects.filter(pk__in=sent).update(sent_at=timezone.now())
+        SessionReminder.objects.filter(pk__in=stale).delete()
+        transaction.on_commit(lambda: notifications.queue_emails(messages, send_email_batch_task))
+    return len(messages)
+
+
+def _queue_late(session):
+    if session.session_status:
+        return
+    now = timezone.localtime()
+    if now.date() <= session.date <= (now + timedelta(days=settings.REMINDER_DAYS_AHEAD)).date():
+        # the window may have passed it already; the next run creates what is missing
+        transaction.on_commit(lambda: get_redis().sadd(REMINDER_LATE_KEY, session.pk), robust=True)
+
+
+def session_saved(session, created, changes):
+    """ `changes` as computed by assignment.history.diff """
+    if created or notifications.NOTIFY_FIELDS & changes.keys():
+        _queue_late(session)
+
+
+def judge_saved(judge_assignment, created, changes):
+    if created or 'judge_id' in changes:
+        _queue_late(judge_assignment.session)
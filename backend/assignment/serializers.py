@@ -0,0 +1,52 @@
+from rest_framework import serializers
+
+from schedule.models import Schedule
+from university_adminstration.serializers import FacultyEducationalGroupSerializer
+
+from .models import JudgeAssignment, Session
+
+
+class ScheduleSerializer(serializers.ModelSerializer):
+    semester_display = serializers.CharField(source='get_semester_display')
+
+    class Meta:
+        model = Schedule
+        fields = ['id', 'year', 'semester', 'semester_display', 'start_date', 'end_date', 'archived_at']
+
+
+class PersonSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+
+
+class StudentRefSerializer(PersonSerializer):
+    student_number = serializers.CharField()
+
+
+class JudgeSerializer(serializers.ModelSerializer):
+    judge = PersonSerializer()
+
+    class Meta:
+        model = JudgeAssignment
+        fields = ['id', 'judge']
+
+
+class SessionSerializer(serializers.ModelSerializer):
+    """ Every relation is read from select_related / prefetch_related (see SessionViewSet) """
+    schedule = ScheduleSerializer()
+    faculty_educational_group = FacultyEducationalGroupSerializer()
+    student = StudentRefSerializer()
+    supervisor1 = PersonSerializer()
+    supervisor2 = PersonSerializer(allow_null=True)
+    supervisor3 = PersonSerializer(allow_null=True)
+    supervisor4 = PersonSerializer(allow_null=True)
+    graduate_monitor = PersonSerializer()
+    judges = JudgeSerializer(many=True)
+    date_jalali = serializers.CharField(source='get_date_jalali')
+
+    class Meta:
+        model = Session
+        fields = ['id', 'schedule', 'faculty_educational_group', 'date', 'date_jalali', 'start_time', 'end_time',
+                  'class_number', 'student', 'supervisor1', 'supervisor2', 'supervisor3', 'supervisor4',
+                  'graduate_monitor', 'judges', 'judge_count', 'is_active', 'session_status', 'description',
+                  'created_at', 'updated_at']
@@ -0,0 +1,99 @@
+from django.db import connections, router
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from schedule.models import Schedule
+
+from . import history, judge_counts, notifications, occupancy, reminders
+from .models import JudgeAssignment, Session
+from .partitions import create_schedule_partitions
+
+
+@receiver(post_save, sender=Schedule)
+def create_partitions(sender, instance, created, **kwargs):
+    # before any session of the new semester is saved, so it never lands in the default partition
+    if created:
+        create_schedule_partitions(instance.pk)
+
+
+# The changes of a save are computed once and shared by the history, the notifications and the reminders
+@receiver(post_save, sender=Session)
+def session_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        changes = history.diff(instance, created)
+        history.record(instance, 'create' if created else 'update', changes)
+        notifications.session_saved(instance, created, changes)
+        reminders.session_saved(instance, created, changes)
+
+
+@receiver(post_save, sender=JudgeAssignment)
+def judge_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        changes = history.diff(instance, created)
+        history.record(instance, 'create' if created else 'update', changes)
+        notifications.judge_saved(instance, created, changes)
+        reminders.judge_saved(instance, created, changes)
+
+
+@receiver(post_delete, sender=Session)
+@receiver(post_delete, sender=JudgeAssignment)
+def record_delete(sender, instance, **kwargs):
+    history.record(instance, 'delete', history.deleted(instance))
+
+
+@receiver(post_save, sender=JudgeAssignment)
+def count_judge_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return  # loaddata: counted by repair_judge_counts
+    loaded = getattr(instance, '_loaded_values', {})
+    if not created and loaded.get('session_id') == instance.session_id:
+        return
+    if not created:
+        # moved to another session
+        judge_counts.add(loaded.get('session_id'), loaded.get('schedule_id'), -1)
+    judge_counts.add(instance.session_id, instance.schedule_id, 1)
+
+
+@receiver(post_delete, sender=JudgeAssignment)
+def count_judge_deleted(sender, instance, **kwargs):
+    judge_counts.add(instance.session_id, instance.schedule_id, -1)
+
+
+@receiver(post_save, sender=Session)
+@receiver(post_delete, sender=Session)
+def invalidate_session_occupancy(sender, instance, **kwargs):
+    loaded = getattr(instance, '_loaded_values', {})
+    occupancy.invalidate(instance.schedule_id, instance.date)
+    if (loaded.get('schedule_id'), loaded.get('date')) not in ((None, None), (instance.schedule_id, instance.date)):
+        # moved to another day, which it no longer occupies
+        occupancy.invalidate(loaded.get('schedule_id'), loaded.get('date'))
+
+
+@receiver(post_save, sender=JudgeAssignment)
+@receiver(post_delete, sender=JudgeAssignment)
+def invalidate_judge_occupancy(sender, instance, **kwargs):
+    if JudgeAssignment.session.is_cached(instance):
+        occupancy.invalidate(instance.schedule_id, instance.session.date)
+    else:
+        # e.g. deleted along with its teacher: the day is not known without a query per judge
+        occupancy.invalidate(instance.schedule_id)
+
+
+@receiver(post_delete, sender=Session)
+def notify_session_deleted(sender, instance, **kwargs):
+    notifications.session_deleted(instance)
+
+
+@receiver(post_delete, sender=JudgeAssignment)
+def notify_judge_deleted(sender, instance, **kwargs):
+    notifications.judge_deleted(instance)
+
+
+def count_judges(sender, using, **kwargs):
+    """ post_migrate of this app (AssignmentConfig.ready): sessions migrated with judges get their counts """
+    if not router.allow_migrate_model(using, Session):
+        return
+    # a migrate back to before the sessions
+    if Session._meta.db_table not in connections[using].introspection.table_names():
+        return
+    judge_counts.recount(Session.objects.using(using))
@@ -0,0 +1,47 @@
+from celery import shared_task
+from django.conf import settings
+
+from . import notifications, reminders
+from .history import flush_session_history
+
+
+@shared_task(queue='queue3', ignore_result=True)
+def flush_session_history_task(batch_size=1000):
+    # Drain the stream, one batch per INSERT
+    while flush_session_history(batch_size) == batch_size:
+        pass
+
+
+@shared_task(queue='queue2', ignore_result=True)
+def send_due_notifications_task():
+    # Claims at most notifications.CLAIM_SIZE changes; the rest waits for the next run
+    notifications.send_due_notifications()
+
+
+@shared_task(queue='queue2', ignore_result=True)
+def send_daily_digest_task():
+    notifications.send_daily_digest()
+
+
+@shared_task(queue='queue2', ignore_result=True)
+def schedule_reminders_task():
+    reminders.schedule_reminders()
+
+
+@shared_task(queue='queue2', ignore_result=True)
+def send_reminders_task(session_ids):
+    # One chunk of schedule_reminders; the emails go out through send_email_batch_task
+    reminders.send_reminders(session_ids)
+
+
+@shared_task(bind=True, queue='queue2', ignore_result=True, rate_limit=settings.NOTIFICATION_RATE_LIMIT,
+             max_retries=5)
+def send_email_batch_task(self, messages):
+    # One SMTP connection per batch; only the messages that failed are retried
+    countdown = 60 * 2 ** self.request.retries
+    try:
+        failed = notifications.send_emails(messages)
+    except OSError as error:  # the SMTP server could not be reached
+        raise self.retry(exc=error, countdown=countdown)
+    if failed:
+        raise self.retry(args=(failed,), countdown=countdown)
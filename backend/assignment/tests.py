@@ -0,0 +1,549 @@
+import json
+from datetime import datetime, time, timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+import jdatetime
+from django.core.cache.backends.locmem import LocMemCache
+from django.apps import apps
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings, tag
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from . import history, judge_counts, notifications, occupancy, reminders, signals
+from .benchmarks import admin_client
+from .management.commands.check_query_plans import (
+    CHECKED_TABLES, INDEX_NODES, is_checked, query_shapes, table_scans,
+)
+from .models import JudgeAssignment, Session, SessionHistory, SessionReminder
+
+# The indexes each query shape of check_query_plans is meant to read: index names, or the
+# column of a single column index (Django names its foreign key indexes with a hash). The
+# overlap checks filter one day of a schedule, which unique_session serves as well as
+# session_day_slot_idx; the planner picks either.
+DAY_INDEXES = {'unique_session', 'session_day_slot_idx'}
+EXPECTED_INDEXES = {
+    'room_overlap': DAY_INDEXES,
+    'student_overlap': DAY_INDEXES | {'student_id'},
+    'professor_overlap': DAY_INDEXES,
+    'judge_as_professor': DAY_INDEXES,
+    'judge_overlap': DAY_INDEXES,
+    'professor_as_judge': DAY_INDEXES,
+    'judge_sessions': {'judge_session_idx', 'judge_id'},
+    'changelist_faculty': {'session_feg_recent_idx', 'assignment_session_pkey'},
+    'changelist_created_at': {'session_created_at_idx'},
+    'changelist_updated_at': {'session_updated_at_idx'},
+    'created_at_range': {'session_created_at_idx'},
+    'inactive_sessions': {'session_inactive_idx'},
+    'changelist_judge_count': {'session_judge_count_idx'},
+    'upcoming_reminders': {'session_pending_slot_idx'},
+}
+
+
+@tag('slow')
+@skipUnless(connection.vendor == 'postgresql', "query plans are only checked on PostgreSQL")
+class QueryPlanTests(TestCase):
+    """
+    EXPLAIN the shapes of check_query_plans on a generate_load_data set large enough for the
+    planner to choose as it does in production, with its settings untouched: every shape must
+    read sessions and judges through an index, and through the one meant for it. Generating
+    the set takes about half a minute; `manage.py test --exclude-tag slow` leaves this out.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        with history.suspended(), notifications.suspended():
+            call_command('generate_load_data', students=5000, teachers=600, schedules=3, sessions=50_000,
+                         password='load-test', stdout=StringIO())
+        # a few sessions without judges, for the partial index
+        Session.objects.filter(pk__in=Session.objects.order_by('id').values('pk')[:5]).update(
+            judge_count=0, is_active=False)
+        with connection.cursor() as cursor:
+            for table in CHECKED_TABLES:
+                cursor.execute(f'ANALYZE "{table}"')
+            # on partitioned tables (assignment.partitions) the plans name the indexes of the partitions
+            cursor.execute("SELECT c.relname, p.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                           "JOIN pg_class p ON p.oid = i.inhparent WHERE c.relkind = 'i'")
+            cls.parent_indexes = dict(cursor.fetchall())
+            cursor.execute("SELECT i.relname, a.attname FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid "
+                           "JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = x.indkey[0] "
+                           "WHERE x.indnatts = 1")
+            cls.index_columns = dict(cursor.fetchall())
+        cls.session = Session.objects.filter(judges__isnull=False).order_by('-id').first()
+
+    def assertUsesIndex(self, queryset, indexes=None):
+        """ No sequential scan of sessions or judges, and one of `indexes` is read when given """
+        scans = list(table_scans(json.loads(queryset.explain(format='json'))[0]['Plan']))
+        self.assertFalse([table for node, table, _ in scans if is_checked(table) and node not in INDEX_NODES],
+                         f"sequential scan: {scans}")
+        if indexes is None:
+            return
+        self.assertTrue(any(
+            node in INDEX_NODES and {self.parent_indexes.get(index, index), self.index_columns.get(index)} & indexes
+            for node, _, index in scans
+        ), f"none of {sorted(indexes)} used: {scans}")
+
+    def test_shapes_use_their_index(self):
+        for name, queryset in query_shapes(self.session):
+            with self.subTest(shape=name):
+                self.assertUsesIndex(queryset, EXPECTED_INDEXES.get(name))
+
+    def test_day_slot_index(self):
+        # sessions of a day starting in a time range: start_time is only a key column of this index
+        slot = Session.objects.filter(schedule=self.session.schedule_id, date=self.session.date,
+                                      start_time__gte=self.session.start_time, start_time__lt=self.session.end_time)
+        self.assertUsesIndex(slot, {'session_day_slot_idx'})
+
+    def test_faculty_group_changelist(self):
+        # a small group: walking the primary key backwards would read every other group's sessions first
+        group, other = Session.objects.values_list('faculty_educational_group', flat=True).distinct()[:2]
+        kept = Session.objects.filter(faculty_educational_group=group).order_by('id').values('pk')[:20]
+        Session.objects.filter(faculty_educational_group=group).exclude(pk__in=kept).update(
+            faculty_educational_group=other)
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE "{Session._meta.db_table}"')
+        sessions = Session.objects.filter(faculty_educational_group=group).order_by('-id')[:100]
+        # with this few rows sorting the group's sessions is as cheap as reading them in order
+        self.assertUsesIndex(sessions, {'session_feg_recent_idx', 'faculty_educational_group_id'})
+
+
+class SessionApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        with history.suspended(), notifications.suspended():
+            call_command('generate_load_data', students=200, teachers=50, schedules=1, sessions=300,
+                         password='load-test', stdout=StringIO())
+
+    def test_queries_per_page(self):
+        # the user, the page of sessions with its relations, and their judges
+        faculty = Session.objects.values_list('faculty_educational_group__faculty', flat=True).first()
+        for username in ('load_all', f'load_{faculty.lower()}'):
+            with admin_client(get_user_model().objects.get(username=username)) as client:
+                for page_size in (5, 100):
+                    with self.subTest(user=username, page_size=page_size), self.assertNumQueries(3):
+                        response = client.get('/assignment/api/sessions/', {'page_size': page_size})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertTrue(response.json()['results'])
+
+
+def generate_small_load_data():
+    """ A schedule of 40 sessions with judges, for the tests of what saves trigger """
+    with history.suspended(), notifications.suspended():
+        call_command('generate_load_data', students=40, teachers=40, schedules=1, sessions=40,
+                     password='load-test', stdout=StringIO())
+
+
+class HistoryTests(TestCase):
+    """ assignment.history: the diff of a save, the request outbox and the stream writer """
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_small_load_data()
+
+    def setUp(self):
+        history.get_redis().delete(history.HISTORY_STREAM_KEY)
+        self.addCleanup(history.get_redis().delete, history.HISTORY_STREAM_KEY)
+        self.session = Session.objects.filter(judges__isnull=False).first()
+
+    def test_diff_of_an_update(self):
+        old_end = self.session.end_time
+        self.session.end_time = time(23, 0)
+        self.session.description = 'جابجا شد'
+        self.session.updated_by = 'someone'
+        self.assertEqual(history.diff(self.session, created=False), {
+            'end_time': [old_end, time(23, 0)],
+            'description': [None, 'جابجا شد'],
+        })
+
+    def test_diff_of_an_unchanged_save_is_empty(self):
+        self.assertEqual(history.diff(self.session, created=False), {})
+
+    def test_diff_of_a_create_leaves_out_empty_fields(self):
+        judge = self.session.judges.first()
+        changes = history.diff(JudgeAssignment(session=self.session, judge_id=judge.judge_id), created=True)
+        self.assertEqual(changes, {'session_id': [None, self.session.pk], 'judge_id': [None, judge.judge_id]})
+
+    def test_request_publishes_its_changes_once_committed(self):
+        with mock.patch.object(history, 'publish', wraps=history.publish) as publish:
+            with history.request_scope(lambda: 'tester'), self.captureOnCommitCallbacks(execute=True):
+                self.session.description = 'اول'
+                self.session.save()
+                self.session.judges.first().delete()
+                publish.assert_not_called()  # held until the request ends
+        publish.assert_called_once()
+        self.assertEqual(history.flush_session_history(), 2)
+
+        entries = SessionHistory.objects.filter(session_id=self.session.pk).order_by('id')
+        self.assertEqual([(entry.model, entry.action, entry.user) for entry in entries],
+                         [('session', 'update', 'tester'), ('judge', 'delete', 'tester')])
+        self.assertEqual(entries[0].changes, {'description': [None, 'اول']})
+        self.assertEqual(history.flush_session_history(), 0)  # acknowledged
+
+    def test_rolled_back_changes_are_not_recorded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.session.description = 'لغو شد'
+                self.session.save()
+                raise RuntimeError
+        self.assertEqual(history.flush_session_history(), 0)
+
+    def test_suspended_changes_are_not_recorded(self):
+        with history.suspended(), self.captureOnCommitCallbacks(execute=True):
+            self.session.description = 'بایگانی'
+            self.session.save()
+        self.assertEqual(history.flush_session_history(), 0)
+
+    def test_entries_are_written_directly_without_redis(self):
+        with mock.patch.object(history, 'get_redis', side_effect=RedisError), \
+                self.assertLogs('assignment.history', 'WARNING'), self.captureOnCommitCallbacks(execute=True):
+            self.session.description = 'بدون ردیس'
+            self.session.save()
+        entry = SessionHistory.objects.get(session_id=self.session.pk)
+        self.assertIsNone(entry.entry_id)
+        self.assertEqual(entry.changes, {'description': [None, 'بدون ردیس']})
+
+
+class OccupancyTests(TestCase):
+    """ assignment.occupancy: the cached snapshot of a day and the conflict check of the session form """
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_small_load_data()
+        cls.user = get_user_model().objects.get(username='load_all')
+
+    def setUp(self):
+        # a cache of its own, so no snapshot of an earlier test database is read
+        cache = LocMemCache('occupancy-tests', {})
+        cache.clear()
+        patcher = mock.patch.object(occupancy, 'cache', cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.session = Session.objects.filter(judges__isnull=False).first()
+
+    def day(self):
+        return occupancy.snapshot(self.session.schedule_id, self.session.date)
+
+    def check(self, **values):
+        """ The conflicts reported for a copy of self.session with `values` changed """
+        session = self.session
+        params = {
+            'schedule': session.schedule_id,
+            'date': jdatetime.date.fromgregorian(date=session.date).strftime('%Y-%m-%d'),
+            'start_time': session.start_time.strftime('%H:%M'),
+            'end_time': session.end_time.strftime('%H:%M'),
+            'class_number': session.class_number,
+            'student': session.student_id,
+            'supervisor1': session.supervisor1_id,
+            'judge': list(session.judges.values_list('judge_id', flat=True)),
+        }
+        params.update(values)
+        with admin_client(self.user) as client:
+            response = client.get('/admin/assignment/session/check_conflicts',
+                                  {name: value for name, value in params.items() if value is not None})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['conflicts']
+
+    def test_snapshot_is_cached(self):
+        day = self.day()
+        self.assertIn(self.session.pk, [session['id'] for session in day['sessions']])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.day(), day)
+
+    def test_session_save_drops_the_day(self):
+        self.day()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.session.end_time = time(23, 0)
+            self.session.save()
+        sessions = {session['id']: session for session in self.day()['sessions']}
+        self.assertEqual(sessions[self.session.pk]['end_time'], time(23, 0))
+
+    def test_judge_delete_drops_the_day(self):
+        judge = self.session.judges.first()
+        self.day()
+        with self.captureOnCommitCallbacks(execute=True):
+            judge.delete()
+        sessions = {session['id']: session for session in self.day()['sessions']}
+        self.assertNotIn(judge.judge_id, sessions[self.session.pk]['judges'])
+
+    def test_session_conflicts_with_a_copy_of_itself(self):
+        judge = self.session.judges.values_list('judge_id', flat=True).first()
+        conflicts = self.check()
+        self.assertEqual({conflict['session'] for conflict in conflicts}, {self.session.pk})
+        self.assertTrue({('class_number', None), ('student', self.session.student_id),
+                         ('supervisor1', self.session.supervisor1_id), ('judge', judge)}
+                        <= {(conflict['field'], conflict['value']) for conflict in conflicts})
+
+    def test_session_does_not_conflict_with_itself(self):
+        self.assertEqual(self.check(session=self.session.pk), [])
+
+    def test_judge_among_the_professors(self):
+        conflicts = self.check(session=self.session.pk, judge=[self.session.supervisor1_id])
+        self.assertEqual([(conflict['field'], conflict['value']) for conflict in conflicts],
+                         [('judge', self.session.supervisor1_id)])
+
+    def test_incomplete_form_is_not_checked(self):
+        self.assertEqual(self.check(start_time=None), [])
+        self.assertEqual(self.check(schedule=0), [])
+
+
+@override_settings(NOTIFICATION_DELAY=120, NOTIFICATION_CLAIM_TIMEOUT=600)
+class NotificationTests(TestCase):
+    """ assignment.notifications: the Redis queue of changes and the emails written from it """
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_small_load_data()
+
+    def setUp(self):
+        keys = (notifications.NOTIFY_DUE_KEY, notifications.NOTIFY_PROCESSING_KEY, notifications.NOTIFY_DELETED_KEY)
+        notifications.get_redis().delete(*keys)
+        self.addCleanup(notifications.get_redis().delete, *keys)
+        self.now = notifications.time.time()
+        patcher = mock.patch.object(notifications, 'time', mock.Mock(time=lambda: self.now))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.session = Session.objects.filter(judges__isnull=False).first()
+
+    def due(self):
+        return {member.decode(): score for member, score in
+                notifications.get_redis().zrange(notifications.NOTIFY_DUE_KEY, 0, -1, withscores=True)}
+
+    def save(self, **values):
+        with self.captureOnCommitCallbacks(execute=True):
+            for name, value in values.items():
+                setattr(self.session, name, value)
+            self.session.save()
+
+    def send(self):
+        """ The (to, subject, body) messages queued by send_due_notifications """
+        with mock.patch('assignment.tasks.send_email_batch_task.delay') as delay:
+            queued = notifications.send_due_notifications()
+        messages = [message for call in delay.call_args_list for message in call.args[0]]
+        self.assertEqual(queued, len(messages))
+        return messages
+
+    def recipients(self, session):
+        return {person.email for _, _, person in notifications.participants(
+            notifications.sessions_with_people(Session.objects.filter(pk=session.pk)).get())}
+
+    def test_change_is_queued_once_committed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.session.end_time = time(23, 0)
+            self.session.save()
+            self.assertEqual(self.due(), {})
+        self.assertEqual(self.due(), {f'changed:{self.session.pk}': self.now})
+
+    def test_other_fields_are_not_announced(self):
+        self.save(description='توضیح تازه')
+        self.assertEqual(self.due(), {})
+
+    def test_suspended_changes_are_not_queued(self):
+        with notifications.suspended():
+            self.save(end_time=time(23, 0))
+        self.assertEqual(self.due(), {})
+
+    def test_replaced_student_is_told(self):
+        old_student = self.session.student_id
+        other = Session.objects.exclude(student_id=old_student).values_list('student_id', flat=True).first()
+        self.save(student_id=other)
+        self.assertEqual(self.due().keys(), {f'changed:{self.session.pk}',
+                                             f'removed:student:{old_student}:{self.session.pk}'})
+
+    def test_repeated_edits_move_the_score(self):
+        self.save(end_time=time(22, 0))
+        self.now += 30
+        self.save(end_time=time(23, 0))
+        self.assertEqual(self.due(), {f'changed:{self.session.pk}': self.now})
+
+    def test_due_change_is_emailed_to_each_participant(self):
+        self.save(end_time=time(23, 0))
+        self.now += 119
+        self.assertEqual(self.send(), [])
+        self.now += 1
+        messages = self.send()
+        self.assertEqual({to for to, _, _ in messages}, self.recipients(self.session))
+        self.assertEqual(self.due(), {})
+        self.assertFalse(notifications.get_redis().exists(notifications.NOTIFY_PROCESSING_KEY))
+
+    def test_deleted_session_is_described(self):
+        recipients = self.recipients(self.session)
+        description = notifications.describe(self.session)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.session.delete()
+        self.now += 120
+        messages = self.send()
+        self.assertEqual({to for to, _, _ in messages}, recipients)
+        self.assertTrue(all(description in body for _, _, body in messages))
+        self.assertFalse(notifications.get_redis().exists(notifications.NOTIFY_DELETED_KEY))
+
+    def test_claim_of_a_failed_run_is_retried(self):
+        self.save(end_time=time(23, 0))
+        self.now += 120
+        self.assertEqual(notifications._claim_due(), [f'changed:{self.session.pk}'])  # and never queued
+        self.assertEqual(self.send(), [])
+        self.now += 600
+        with self.assertLogs('assignment.notifications', 'WARNING'):
+            self.assertEqual({to for to, _, _ in self.send()}, self.recipients(self.session))
+
+
+@override_settings(REMINDER_DAYS_AHEAD=2, REMINDER_CHUNK_SIZE=1)
+class ReminderTests(TestCase):
+    """ assignment.reminders: the window scanned once per horizon, and one reminder per person """
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_small_load_data()
+        # the generated schedule is in the past; take its sessions as still ahead
+        Session.objects.update(session_status=False)
+        first = Session.objects.order_by('date', 'start_time').first()
+        cls.now = timezone.make_aware(datetime.combine(first.date, time(0, 0)))
+
+    def setUp(self):
+        keys = (reminders.REMINDER_HORIZON_KEY, reminders.REMINDER_LATE_KEY)
+        reminders.get_redis().delete(*keys)
+        self.addCleanup(reminders.get_redis().delete, *keys)
+        patcher = mock.patch('assignment.tasks.send_reminders_task.delay')
+        self.delay = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def window(self, start):
+        return list(reminders.upcoming(start, start + timedelta(days=2)).values_list('id', flat=True))
+
+    def people(self, session_ids):
+        return sum(len(notifications.participants(session)) for session in
+                   notifications.sessions_with_people(Session.objects.filter(pk__in=session_ids)))
+
+    def test_window_is_scanned_once(self):
+        sessions = self.window(self.now)
+        self.assertTrue(sessions)
+        self.assertEqual(reminders.schedule_reminders(self.now), len(sessions))
+        self.assertEqual([call.args[0] for call in self.delay.call_args_list], [[pk] for pk in sessions])
+        self.assertEqual(SessionReminder.objects.count(), self.people(sessions))
+        self.assertEqual(reminders.schedule_reminders(self.now), 0)
+
+        # a day later only the sessions of the day that entered the window are read
+        later = self.now + timedelta(days=1)
+        entered = [pk for pk in self.window(later) if pk not in sessions]
+        self.assertEqual(reminders.schedule_reminders(later), len(entered))
+
+    def test_lost_horizon_does_not_remind_twice(self):
+        reminders.schedule_reminders(self.now)
+        created = SessionReminder.objects.count()
+        reminders.get_redis().delete(reminders.REMINDER_HORIZON_KEY)
+        self.assertEqual(reminders.schedule_reminders(self.now), len(self.window(self.now)))
+        self.assertEqual(SessionReminder.objects.count(), created)
+
+    def test_session_moved_behind_the_horizon_is_reminded(self):
+        reminders.schedule_reminders(self.now)
+        session = Session.objects.exclude(pk__in=self.window(self.now)).order_by('date').last()
+        with mock.patch.object(reminders, 'timezone', mock.Mock(localtime=lambda: self.now)), \
+                self.captureOnCommitCallbacks(execute=True):
+            session.date = (self.now + timedelta(days=1)).date()
+            session.start_time, session.end_time = time(22, 0), time(23, 0)
+            session.save()
+        self.assertEqual(reminders.schedule_reminders(self.now), 1)
+        self.assertEqual(SessionReminder.objects.filter(session=session).count(), self.people([session.pk]))
+        self.assertFalse(reminders.get_redis().exists(reminders.REMINDER_LATE_KEY))
+
+    def test_reminders_are_sent_once(self):
+        reminders.schedule_reminders(self.now)
+        sessions = self.window(self.now)
+        with mock.patch('assignment.tasks.send_email_batch_task.delay') as send, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(reminders.send_reminders(sessions), self.people(sessions))
+        self.assertEqual(sum(len(call.args[0]) for call in send.call_args_list), self.people(sessions))
+        self.assertFalse(SessionReminder.objects.filter(sent_at__isnull=True).exists())
+        self.assertEqual(reminders.send_reminders(sessions), 0)
+
+    def test_reminder_of_a_moved_session_is_dropped(self):
+        reminders.schedule_reminders(self.now)
+        session = Session.objects.get(pk=self.window(self.now)[0])
+        Session.objects.filter(pk=session.pk).update(date=session.date + timedelta(days=30))
+        with mock.patch('assignment.tasks.send_email_batch_task.delay'), self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(reminders.send_reminders([session.pk]), 0)
+        self.assertFalse(SessionReminder.objects.filter(session=session).exists())
+
+
+class JudgeCountTests(TestCase):
+    """ assignment.judge_counts: Session.judge_count and is_active kept by the saves of the judges """
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_small_load_data()
+
+    def setUp(self):
+        self.session = Session.objects.filter(judges__isnull=False).first()
+        self.judges = list(self.session.judges.all())
+
+    def assertCounted(self, judge_count, is_active=None, session=None):
+        session = Session.objects.get(pk=(session or self.session).pk)
+        self.assertEqual((session.judge_count, session.is_active),
+                         (judge_count, judge_count > 0 if is_active is None else is_active))
+
+    def drift(self, sessions):
+        Session.objects.filter(pk__in=[session.pk for session in sessions]).update(judge_count=7, is_active=False)
+
+    def test_judges_are_counted(self):
+        self.assertCounted(len(self.judges))
+        self.judges[0].delete()
+        self.assertCounted(len(self.judges) - 1)
+        JudgeAssignment.objects.create(session=self.session, judge_id=self.judges[0].judge_id)
+        self.assertCounted(len(self.judges))
+
+    def test_judge_moved_to_another_session(self):
+        other = Session.objects.filter(judges__isnull=False).exclude(pk=self.session.pk).first()
+        other_judges = other.judge_count
+        judge = JudgeAssignment.objects.get(pk=self.judges[0].pk)
+        judge.session = other
+        judge.save()
+        self.assertCounted(len(self.judges) - 1)
+        self.assertCounted(other_judges + 1, session=other)
+
+    def test_last_judge_deactivates(self):
+        for judge in self.judges:
+            judge.delete()
+        self.assertCounted(0, is_active=False)
+
+    def test_deferred_counts_once_at_the_end(self):
+        with judge_counts.deferred():
+            for judge in self.judges:
+                judge.delete()
+            self.assertCounted(len(self.judges))
+        self.assertCounted(0, is_active=False)
+
+    def test_suspended_deletes_are_not_counted(self):
+        with judge_counts.suspended():
+            self.judges[0].delete()
+        self.assertCounted(len(self.judges))
+        self.assertEqual(list(judge_counts.drifted(Session.objects.all())), [self.session])
+
+    def test_recount_fixes_the_drifted_sessions(self):
+        self.drift([self.session])
+        self.assertEqual(list(judge_counts.drifted(Session.objects.all())), [self.session])
+        self.assertEqual(judge_counts.recount(Session.objects.all()), 1)
+        self.assertCounted(len(self.judges))
+        self.assertEqual(judge_counts.recount(Session.objects.all()), 0)
+
+    def test_repair_judge_counts(self):
+        sessions = list(Session.objects.order_by('id')[:2])
+        self.drift(sessions)
+        out = StringIO()
+        call_command('repair_judge_counts', dry_run=True, stdout=out)
+        self.assertIn(f"2 drifted sessions: {sessions[0].pk}, {sessions[1].pk}", out.getvalue())
+        self.assertCounted(7, is_active=False, session=sessions[0])
+
+        out = StringIO()
+        call_command('repair_judge_counts', self.session.schedule_id, stdout=out)
+        self.assertIn("2 sessions fixed", out.getvalue())
+        self.assertFalse(judge_counts.drifted(Session.objects.all()).exists())
+        with self.assertRaisesMessage(CommandError, "no open schedule with id 0"):
+            call_command('repair_judge_counts', 0, stdout=StringIO())
+
+    def test_migrate_counts_the_judges(self):
+        self.drift([self.session])
+        signals.count_judges(apps.get_app_config('assignment'), using=DEFAULT_DB_ALIAS)
+        self.assertCounted(len(self.judges))
@@ -1,5 +1,9 @@
-from django.urls import path
+from rest_framework.routers import SimpleRouter
 
-urlpatterns = [
+from .views import ScheduleViewSet, SessionViewSet
 
-]
+router = SimpleRouter()
+router.register('api/sessions', SessionViewSet, basename='api-session')
+router.register('api/schedules', ScheduleViewSet, basename='api-schedule')
+
+urlpatterns = router.urls
@@ -0,0 +1,52 @@
+from django.db.models import Prefetch
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from core.api import ReadOnlyApiViewSet
+from schedule.models import Schedule
+
+from .models import JudgeAssignment, Session
+from .serializers import ScheduleSerializer, SessionSerializer
+
+
+class SessionViewSet(ReadOnlyApiViewSet):
+    """
+    /assignment/api/sessions/: sessions with their judges, scoped like SessionAdmin.
+    Three queries per request whatever the page size: the user, the page and its judges. Filters: schedule, faculty_educational_group,
+    date_from / date_to (YYYY-MM-DD) and updated_since (ISO datetime, for incremental syncs).
+    """
+    queryset = Session.objects.select_related(
+        'schedule', 'faculty_educational_group', 'student', 'supervisor1', 'supervisor2', 'supervisor3',
+        'supervisor4', 'graduate_monitor',
+    ).prefetch_related(Prefetch('judges', queryset=JudgeAssignment.objects.select_related('judge').order_by('id')))
+    serializer_class = SessionSerializer
+    faculty_lookup = 'faculty_educational_group__faculty'
+
+    FILTERS = {
+        'schedule': ('schedule', int),
+        'faculty_educational_group': ('faculty_educational_group', int),
+        'date_from': ('date__gte', parse_date),
+        'date_to': ('date__lte', parse_date),
+        'updated_since': ('updated_at__gte', parse_datetime),
+    }
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        for param, (lookup, parse) in self.FILTERS.items():
+            raw = self.request.query_params.get(param)
+            if raw is None:
+                continue
+            try:
+                value = parse(raw)
+            except ValueError:
+                value = None
+            if value is None:
+                raise ValidationError({param: "مقدار نامعتبر است"})
+            queryset = queryset.filter(**{lookup: value})
+        return queryset
+
+
+class ScheduleViewSet(ReadOnlyApiViewSet):
+    """ /assignment/api/schedules/: semesters are shared by every faculty """
+    queryset = Schedule.objects.all()
+    serializer_class = ScheduleSerializer
@@ -0,0 +1,48 @@
+"""
+Shared pieces of the read-only REST API (assignment.views, university_adminstration.views).
+
+Every list is scoped to the user's faculty (`role`) the way the admin changelists are,
+paginated with an opaque cursor, and answered with an ETag: a client that sends it back
+in If-None-Match gets an empty 304 while nothing it would receive has changed.
+"""
+from django.middleware.http import ConditionalGetMiddleware
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import decorator_from_middleware, method_decorator
+from rest_framework import viewsets
+from rest_framework.pagination import CursorPagination
+
+conditional_get = decorator_from_middleware(ConditionalGetMiddleware)
+
+
+class ApiCursorPagination(CursorPagination):
+    """ Stable pages while rows are added, and no COUNT(*) over the table """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = '-id'
+
+
+class ReadOnlyApiViewSet(viewsets.ReadOnlyModelViewSet):
+    # path from the model to its faculty code; None when every faculty sees every row
+    faculty_lookup = None
+    pagination_class = ApiCursorPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        role = self.request.user.role
+        if self.faculty_lookup is None or role == 'ALL':
+            return queryset
+        return self.scope_to_faculty(queryset, role)
+
+    def scope_to_faculty(self, queryset, faculty):
+        return queryset.filter(**{self.faculty_lookup: faculty})
+
+    @method_decorator(conditional_get)
+    def dispatch(self, request, *args, **kwargs):
+        return super().dispatch(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        # cached copies must be revalidated, and only the user's own (the rows depend on the role)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -3,7 +3,9 @@
 from __future__ import absolute_import, unicode_literals
 import os
 from celery import Celery
+from celery.signals import worker_init
 from django.conf import settings
+from django.db import connections
 from datetime import timedelta
 from celery.schedules import crontab
 
@@ -36,8 +38,44 @@ app.conf.task_queues = (
 #     }
 # }
 
+app.conf.beat_schedule = {
+    'flush_login_audit': {
+        'task': 'account.tasks.flush_login_audit_task',
+        'schedule': timedelta(seconds=10),
+    },
+    'flush_session_history': {
+        'task': 'assignment.tasks.flush_session_history_task',
+        'schedule': timedelta(seconds=10),
+    },
+    'send_due_notifications': {
+        'task': 'assignment.tasks.send_due_notifications_task',
+        'schedule': timedelta(seconds=30),
+    },
+    'schedule_reminders': {
+        'task': 'assignment.tasks.schedule_reminders_task',
+        'schedule': timedelta(minutes=10),
+    },
+    'send_daily_digest': {
+        'task': 'assignment.tasks.send_daily_digest_task',
+        # sent once a day; the later runs only retry a digest that failed
+        'schedule': crontab(hour='7-12', minute=0),
+    },
+}
+
 # Add the new setting to handle connection retry on startup
 app.conf.broker_connection_retry_on_startup = True
 
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
+
+
+# Registers the task timing signal handlers
+from core import metrics  # noqa: E402
+
+
+@worker_init.connect
+def use_worker_db_settings(**kwargs):
+    # runs before the pool processes are forked, they inherit it
+    for connection in connections.all():
+        connection.settings_dict['CONN_MAX_AGE'] = settings.DB_CONN_MAX_AGE_WORKER
+    metrics.PROCESS_ROLE = 'worker'
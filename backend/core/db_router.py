@@ -0,0 +1,94 @@
+"""
+Optional read replica (settings.REPLICA_DATABASE_URL).
+
+Reads go to the replica only inside `use_replica()`: the read-only admin pages switched
+on by ReplicaRoutingMiddleware, exports and reports. Everything else, writes, and every
+read inside a transaction on the primary (the conflict checks of a save run in one)
+stay on the primary. The replica is skipped while it lags more than REPLICA_MAX_LAG
+seconds behind or cannot be reached.
+"""
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+REPLICA_DB_ALIAS = 'replica'
+
+REPLICA_MAX_LAG = getattr(settings, 'REPLICA_MAX_LAG', 5)
+REPLICA_LAG_CHECK_INTERVAL = getattr(settings, 'REPLICA_LAG_CHECK_INTERVAL', 5)
+
+# Seconds of replay delay; 0 when the replica has replayed everything it received
+LAG_SQL = """
+    SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0
+                WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+           END
+"""
+
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+_replica_state = {'checked_at': None, 'lag': None}
+
+
+@contextmanager
+def use_replica(enabled=True):
+    """ Send the reads of this block to the replica when it is healthy """
+    token = _use_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def replica_lag(refresh=False):
+    """ Replica lag in seconds, None when it cannot be reached; re-measured every REPLICA_LAG_CHECK_INTERVAL """
+    now = time.monotonic()
+    checked_at = _replica_state['checked_at']
+    if not refresh and checked_at is not None and now - checked_at < REPLICA_LAG_CHECK_INTERVAL:
+        return _replica_state['lag']
+
+    try:
+        with connections[REPLICA_DB_ALIAS].cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            lag = float(cursor.fetchone()[0])
+    except Exception:
+        logger.warning("read replica unavailable, reading from the primary", exc_info=True)
+        connections[REPLICA_DB_ALIAS].close()
+        lag = None
+    _replica_state.update(checked_at=now, lag=lag)
+    return lag
+
+
+def replica_usable():
+    lag = replica_lag()
+    return lag is not None and lag <= REPLICA_MAX_LAG
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _use_replica.get() or not replica_configured():
+            return None
+        # what a transaction on the primary reads must be what it is about to write
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if replica_usable():
+            return REPLICA_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,107 @@
+"""
+Prometheus metrics, exposed as text at /metrics.
+
+With several processes (gunicorn workers, celery children) set PROMETHEUS_MULTIPROC_DIR
+to a directory shared by all of them, and empty it on deploy; every process then writes
+its samples there and /metrics adds them up.
+"""
+import hmac
+import os
+import time
+
+from celery.signals import task_postrun, task_prerun
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+)
+
+QUERY_BUCKETS = (0, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+ROW_BUCKETS = (10, 100, 1000, 5000, 10000, 50000, 100000, 500000)
+REDIS_BUCKETS = (.0001, .00025, .0005, .001, .0025, .005, .01, .05, .1)
+
+REQUEST_LATENCY = Histogram(
+    'django_request_duration_seconds', "Request latency per view",
+    ['view', 'method', 'status'],
+)
+REQUEST_QUERIES = Histogram(
+    'django_request_queries', "SQL queries per request",
+    ['view'], buckets=QUERY_BUCKETS,
+)
+VALIDATION_DURATION = Histogram(
+    'session_validation_duration_seconds', "Duration of each session / judge validation step",
+    ['form', 'step'],
+)
+EXPORT_DURATION = Histogram(
+    'export_duration_seconds', "Duration of Excel exports",
+    ['export'], buckets=(.1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+EXPORT_ROWS = Histogram(
+    'export_rows', "Rows written per Excel export",
+    ['export'], buckets=ROW_BUCKETS,
+)
+USER_SESSION_LOOKUPS = Counter(
+    'user_session_lookups_total', "OneSessionPerUserMiddleware lookups by where they were answered",
+    ['source'],
+)
+REDIS_ROUNDTRIP = Histogram(
+    'user_session_redis_duration_seconds', "Redis round trips for the single-session check",
+    ['operation'], buckets=REDIS_BUCKETS,
+)
+CELERY_TASK_DURATION = Histogram(
+    'celery_task_duration_seconds', "Celery task run time",
+    ['task', 'state'], buckets=(.01, .05, .1, .5, 1, 5, 10, 30, 60, 300, 900),
+)
+DB_CONNECTIONS_OPENED = Counter(
+    'django_db_connections_opened_total', "Database connections opened, by web and celery processes",
+    ['alias', 'process'],
+)
+DB_CONNECTION_REUSE = Counter(
+    'django_db_connection_reuse_total', "Requests that found the default connection open (reused) or not (new)",
+    ['outcome'],
+)
+
+# 'worker' in celery processes, see core.celery_config
+PROCESS_ROLE = 'web'
+
+
+def observe_export(export, started, rows):
+    """ `started` is the time.perf_counter() value taken when the export began """
+    EXPORT_DURATION.labels(export=export).observe(time.perf_counter() - started)
+    EXPORT_ROWS.labels(export=export).observe(rows)
+
+
+def metrics_view(request):
+    # closed unless a scraper sends the token or a staff user is logged in
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    authorized = bool(token) and hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}")
+    if not (authorized or request.user.is_staff):
+        return HttpResponseForbidden()
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+_task_started = {}
+
+
+@task_prerun.connect
+def _start_task_timer(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _observe_task(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        CELERY_TASK_DURATION.labels(task=task.name, state=state or 'UNKNOWN').observe(time.perf_counter() - started)
+
+
+@connection_created.connect
+def _count_connection(sender, connection=None, **kwargs):
+    DB_CONNECTIONS_OPENED.labels(alias=connection.alias, process=PROCESS_ROLE).inc()
@@ -0,0 +1,107 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.urls import Resolver404, resolve
+
+from account import sql_profiler
+
+from . import metrics
+from .db_router import use_replica
+
+
+class SQLProfilerMiddleware:
+    """
+    Opt-in (settings.SQL_PROFILER_ENABLED): records the SQL of a sample of requests,
+    grouped by fingerprint, into a rolling Redis log shown at /admin/sql-profiler/.
+    Fingerprints repeated within one request are reported as N+1 suspects.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not sql_profiler.should_profile(request):
+            return self.get_response(request)
+
+        recorder = sql_profiler.QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        sql_profiler.record_profile(request, response, recorder, (time.perf_counter() - start) * 1000)
+        return response
+
+
+class MetricsMiddleware:
+    """ Latency and SQL query count of every request, per resolved view, for /metrics """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0]
+        # close_old_connections already ran for this request, an open connection gets reused
+        outcome = 'reused' if connections[DEFAULT_DB_ALIAS].connection is not None else 'new'
+        metrics.DB_CONNECTION_REUSE.labels(outcome=outcome).inc()
+
+        def count(execute, *args):
+            queries[0] += 1
+            return execute(*args)
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        # unresolved paths (404s, scanners) share one label to keep the series count bounded
+        view = getattr(request.resolver_match, 'view_name', None) or 'unresolved'
+        metrics.REQUEST_LATENCY.labels(view=view, method=request.method, status=response.status_code).observe(elapsed)
+        metrics.REQUEST_QUERIES.labels(view=view).observe(queries[0])
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Reads of read-only admin pages go to the replica (see core.db_router): changelist
+    GETs and the views named in settings.REPLICA_READ_VIEWS. After a user writes
+    something, their reads stay on the primary for REPLICA_PIN_SECONDS so they see it.
+    """
+    PIN_COOKIE = 'primary_pin'
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.read_views = set(getattr(settings, 'REPLICA_READ_VIEWS', []))
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+
+    def __call__(self, request):
+        read_only = self.is_read_only(request)
+        if read_only and not self.pinned(request):
+            # the whole response, so a TemplateResponse is rendered from the replica as well
+            with use_replica():
+                return self.get_response(request)
+
+        response = self.get_response(request)
+        if request.method not in self.SAFE_METHODS and not read_only:
+            response.set_cookie(self.PIN_COOKIE, str(int(time.time()) + self.pin_seconds),
+                                max_age=self.pin_seconds, httponly=True, samesite='Lax')
+        return response
+
+    def is_read_only(self, request):
+        # the view is resolved here already, its reads have to start inside use_replica()
+        try:
+            url_name = resolve(request.path_info, getattr(request, 'urlconf', None)).url_name or ''
+        except Resolver404:
+            return False
+        if url_name in self.read_views:
+            return True
+        return request.method in ('GET', 'HEAD') and url_name.endswith('_changelist')
+
+    def pinned(self, request):
+        try:
+            return int(request.COOKIES.get(self.PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
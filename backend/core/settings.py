@@ -46,6 +46,7 @@ INSTALLED_APPS = [
     'university_adminstration.apps.UniversityAdminstrationConfig',
     # === third party modules ===
     'rest_framework',
+    'rest_framework.authtoken',
     'jalali_date',
     'django_flatpickr',
 ]
@@ -60,8 +61,36 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     # === custom ===
     'account.middleware.OneSessionPerUserMiddleware',
+    'assignment.middleware.ChangeHistoryMiddleware',
 ]
 
+# Opt-in SQL profiler with N+1 detection, results at /admin/sql-profiler/ (see account.sql_profiler)
+SQL_PROFILER_ENABLED = os.getenv('SQL_PROFILER_ENABLED') == 'True'
+SQL_PROFILER_SAMPLE_RATE = float(os.getenv('SQL_PROFILER_SAMPLE_RATE', 1.0))
+SQL_PROFILER_N_PLUS_ONE_THRESHOLD = int(os.getenv('SQL_PROFILER_N_PLUS_ONE_THRESHOLD', 5))
+SQL_PROFILER_LOG_SIZE = int(os.getenv('SQL_PROFILER_LOG_SIZE', 500))
+# Requests are timed per view for /metrics (see core.metrics). With several worker processes
+# PROMETHEUS_MULTIPROC_DIR must point to a directory shared by them, emptied on every deploy.
+# /metrics answers "Authorization: Bearer <METRICS_TOKEN>" and logged in staff users only; without
+# the token set, scrapers are refused.
+MIDDLEWARE.insert(1, 'core.middleware.MetricsMiddleware')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# Span trees of session saves (see core.tracing). TRACING_SINK is a dotted path such as
+# core.tracing.JSONFileSink or core.tracing.OTLPJSONSink; empty disables exporting.
+# Saves slower than TRACING_SLOW_SAVE_SECONDS are logged with their span tree to the
+# "tracing.slow_save" logger either way.
+TRACING_SINK = os.getenv('TRACING_SINK')
+TRACING_FILE = os.getenv('TRACING_FILE', str(BASE_DIR / 'traces.jsonl'))
+TRACING_OTLP_ENDPOINT = os.getenv('TRACING_OTLP_ENDPOINT')
+# Traces waiting to be POSTed to the endpoint; more are dropped while the collector is slow or down
+TRACING_QUEUE_SIZE = int(os.getenv('TRACING_QUEUE_SIZE', 1000))
+TRACING_SLOW_SAVE_SECONDS = float(os.getenv('TRACING_SLOW_SAVE_SECONDS', 2.0))
+
+if SQL_PROFILER_ENABLED:
+    # right after SecurityMiddleware, so session and auth queries are recorded too
+    MIDDLEWARE.insert(1, 'core.middleware.SQLProfilerMiddleware')
+
 ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
@@ -117,6 +146,33 @@ else:
     }
 
 
+# Optional read replica for changelists, exports and reports, see core.db_router
+REPLICA_DATABASE_URL = os.getenv('REPLICA_DATABASE_URL')
+if REPLICA_DATABASE_URL:
+    DATABASES['replica'] = dj_database_url.parse(REPLICA_DATABASE_URL)
+    DATABASES['replica'].setdefault('OPTIONS', {})['connect_timeout'] = 2
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+    DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+    MIDDLEWARE.append('core.middleware.ReplicaRoutingMiddleware')
+# Seconds of replication delay after which the primary is read instead
+REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', 5))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('REPLICA_LAG_CHECK_INTERVAL', 5))
+# After a write the user reads from the primary for this long
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 10))
+# url names (besides every changelist GET) whose reads may use the replica
+REPLICA_READ_VIEWS = ['download_session', 'api-session-list', 'api-session-detail', 'api-teacher-list',
+                      'api-teacher-detail', 'api-student-list', 'api-student-detail']
+
+# Persistent connections: a gunicorn worker / celery process keeps its database connection
+# for this many seconds instead of connecting for every request / task, and pings it
+# before reusing it. Celery processes use DB_CONN_MAX_AGE_WORKER (set in core.celery_config).
+# Every process holds one connection per database, keep max_connections above their count.
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', 300))
+DB_CONN_MAX_AGE_WORKER = int(os.getenv('DB_CONN_MAX_AGE_WORKER', 600))
+for _database in DATABASES.values():
+    _database['CONN_MAX_AGE'] = DB_CONN_MAX_AGE
+    _database['CONN_HEALTH_CHECKS'] = True
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -170,6 +226,32 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # celery configuration
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND')
+# crontab entries of the beat schedule are in local time
+CELERY_TIMEZONE = TIME_ZONE
+
+# Outgoing email (assignment.notifications). Locally, the mailpit service of docker-compose
+# catches everything: EMAIL_HOST=mailpit (localhost outside docker), EMAIL_PORT=1025
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', 25))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS') == 'True'
+EMAIL_TIMEOUT = 10
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'webmaster@localhost')
+
+# A changed session is announced once it has not been edited for this many seconds
+NOTIFICATION_DELAY = int(os.getenv('NOTIFICATION_DELAY', 120))
+NOTIFICATION_BATCH_SIZE = int(os.getenv('NOTIFICATION_BATCH_SIZE', 50))
+# Claimed notifications and digests not queued within this many seconds are retried
+NOTIFICATION_CLAIM_TIMEOUT = int(os.getenv('NOTIFICATION_CLAIM_TIMEOUT', 600))
+# Batches a worker sends at most (celery rate limit)
+NOTIFICATION_RATE_LIMIT = os.getenv('NOTIFICATION_RATE_LIMIT', '12/m')
+# Days ahead covered by the daily digest of teachers' sessions
+NOTIFICATION_DIGEST_DAYS = int(os.getenv('NOTIFICATION_DIGEST_DAYS', 7))
+# Everyone in a session is reminded this many days before it (assignment.reminders)
+REMINDER_DAYS_AHEAD = int(os.getenv('REMINDER_DAYS_AHEAD', 2))
+# Sessions per send_reminders_task
+REMINDER_CHUNK_SIZE = int(os.getenv('REMINDER_CHUNK_SIZE', 200))
 
 
 # default settings (optional)
@@ -201,6 +283,23 @@ JALALI_DATE_DEFAULTS = {
 
 AUTH_USER_MODEL = 'account.User'
 
+# Read-only API (core.api) for staff users: the admin session, or a token for scripts
+# ("Authorization: Token <key>", keys are created in the admin)
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.TokenAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.IsAdminUser'],
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+}
+
+# Locked accounts are rejected before the password is hashed, see account.login_attempts
+AUTHENTICATION_BACKENDS = ['account.backends.LockoutModelBackend']
+LOGIN_FAILURE_LIMIT = 5
+LOGIN_FAILURE_WINDOW = 15 * 60  # seconds
+LOGIN_LOCKOUT_DURATION = 15 * 60  # seconds
+
 # LOGGING = {
 #     'version': 1,
 #     'disable_existing_loggers': False,
@@ -218,7 +317,8 @@ AUTH_USER_MODEL = 'account.User'
 #     },
 # }
 
-SESSION_ENGINE = "django.contrib.sessions.backends.cache"
+# Cache sessions that skip unchanged writes, see account.session_store
+SESSION_ENGINE = "account.session_store"
 SESSION_CACHE_ALIAS = "default"
 
 CACHES = {
@@ -234,3 +334,8 @@ CACHES = {
 SESSION_COOKIE_AGE = 3600  # Sessions expire after 1 hour
 SESSION_SAVE_EVERY_REQUEST = True
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
+# Unchanged sessions get their expiry extended at most once per this many seconds
+SESSION_TOUCH_INTERVAL = int(os.getenv('SESSION_TOUCH_INTERVAL', 60))
+
+# Seconds OneSessionPerUserMiddleware trusts its in-process copy of a user's session key
+USER_SESSION_CACHE_TTL = int(os.getenv('USER_SESSION_CACHE_TTL', 5))
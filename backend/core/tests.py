@@ -0,0 +1,164 @@
+import time
+from datetime import date
+from unittest import mock, skipUnless
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from schedule.models import Schedule
+
+from . import db_router
+from .db_router import REPLICA_DB_ALIAS, ReplicaRouter, replica_configured, replica_lag, use_replica
+from .middleware import ReplicaRoutingMiddleware
+
+CHANGELIST = '/admin/assignment/session/'
+
+
+class ReplicaRoutingTests(SimpleTestCase):
+    """
+    Where ReplicaRouter and ReplicaRoutingMiddleware send reads, for a configured and healthy
+    replica; nothing connects to it. SimpleTestCase runs no test in a transaction, so reads
+    outside atomic() can be checked.
+    """
+    databases = {DEFAULT_DB_ALIAS}
+
+    def setUp(self):
+        for name in ('replica_configured', 'replica_usable'):
+            patcher = mock.patch.object(db_router, name, return_value=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        self.routed = []
+
+    def db_for_read(self):
+        return self.router.db_for_read(Schedule) or DEFAULT_DB_ALIAS
+
+    def get_response(self, request):
+        # where the view would read from
+        self.routed.append(self.db_for_read())
+        return HttpResponse()
+
+    def request(self, method='get', path=CHANGELIST, **cookies):
+        request = getattr(self.factory, method)(path)
+        request.COOKIES.update(cookies)
+        return ReplicaRoutingMiddleware(self.get_response)(request)
+
+    def test_reads_stay_on_primary_outside_use_replica(self):
+        self.assertEqual(self.db_for_read(), DEFAULT_DB_ALIAS)
+
+    def test_reads_use_replica(self):
+        with use_replica():
+            self.assertEqual(self.db_for_read(), REPLICA_DB_ALIAS)
+            with use_replica(False):
+                self.assertEqual(self.db_for_read(), DEFAULT_DB_ALIAS)
+
+    def test_reads_in_atomic_stay_on_primary(self):
+        with use_replica():
+            with transaction.atomic():
+                self.assertEqual(self.db_for_read(), DEFAULT_DB_ALIAS)
+            self.assertEqual(self.db_for_read(), REPLICA_DB_ALIAS)
+
+    def test_unusable_replica_is_not_read(self):
+        with mock.patch.object(db_router, 'replica_usable', return_value=False), use_replica():
+            self.assertEqual(self.db_for_read(), DEFAULT_DB_ALIAS)
+
+    def test_writes_go_to_primary(self):
+        with use_replica():
+            self.assertEqual(self.router.db_for_write(Schedule), DEFAULT_DB_ALIAS)
+
+    def test_changelist_reads_use_replica(self):
+        self.request()
+        self.assertEqual(self.routed, [REPLICA_DB_ALIAS])
+        self.assertEqual(self.db_for_read(), DEFAULT_DB_ALIAS)
+
+    def test_other_views_read_primary(self):
+        self.request(path='/admin/assignment/session/add/')
+        self.request(path='/no-such-page/')
+        self.assertEqual(self.routed, [DEFAULT_DB_ALIAS, DEFAULT_DB_ALIAS])
+
+    def test_post_pins_reads_to_primary(self):
+        response = self.request('post', path='/admin/assignment/session/add/')
+        self.assertEqual(self.routed, [DEFAULT_DB_ALIAS])
+        pin = response.cookies[ReplicaRoutingMiddleware.PIN_COOKIE].value
+        self.assertGreater(int(pin), time.time())
+
+        self.request(**{ReplicaRoutingMiddleware.PIN_COOKIE: pin})
+        self.assertEqual(self.routed[-1], DEFAULT_DB_ALIAS)
+
+    def test_expired_pin_uses_replica(self):
+        self.request(**{ReplicaRoutingMiddleware.PIN_COOKIE: str(int(time.time()) - 1)})
+        self.assertEqual(self.routed, [REPLICA_DB_ALIAS])
+
+
+@skipUnless(replica_configured(), "needs REPLICA_DATABASE_URL, a streaming replica such as postgresDB_replica")
+class ReplicaInstanceTests(TransactionTestCase):
+    """
+    The router against a real streaming replica of the test database (TEST MIRROR of
+    default: the replica replays the test database the primary creates). Rows are
+    committed, so they reach the replica the way production writes do.
+    """
+    databases = '__all__'
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        db_router._replica_state.update(checked_at=None, lag=None)
+        self.addCleanup(db_router._replica_state.update, checked_at=None, lag=None)
+        with connections[REPLICA_DB_ALIAS].cursor() as cursor:
+            cursor.execute("SELECT pg_is_in_recovery()")
+            if not cursor.fetchone()[0]:
+                self.skipTest("REPLICA_DATABASE_URL is not a streaming replica")
+
+    def wait_for_replay(self, schedule_id, timeout=10):
+        deadline = time.monotonic() + timeout
+        while not Schedule.objects.using(REPLICA_DB_ALIAS).filter(pk=schedule_id).exists():
+            self.assertLess(time.monotonic(), deadline, "the replica did not replay the commit")
+            time.sleep(0.1)
+
+    def test_reads_of_committed_rows_come_from_replica(self):
+        schedule = Schedule.objects.create(year=1403, semester='1', start_date=date(2024, 9, 22),
+                                           end_date=date(2025, 2, 7))
+        self.wait_for_replay(schedule.pk)
+        with use_replica(), CaptureQueriesContext(connections[REPLICA_DB_ALIAS]) as replica_queries:
+            self.assertTrue(Schedule.objects.filter(pk=schedule.pk).exists())
+        self.assertEqual(len(replica_queries), 2)  # the lag, then the read
+        self.assertLessEqual(replica_lag(), db_router.REPLICA_MAX_LAG)
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        replica = connections[REPLICA_DB_ALIAS]
+        with replica.cursor() as cursor:
+            cursor.execute("SELECT pg_wal_replay_pause()")
+        try:
+            schedule = Schedule.objects.create(year=1403, semester='2', start_date=date(2025, 2, 8),
+                                               end_date=date(2025, 7, 5))
+            time.sleep(0.5)
+            # the commit is received but not replayed
+            with mock.patch.object(db_router, 'REPLICA_MAX_LAG', 0.2), use_replica():
+                self.assertGreater(replica_lag(refresh=True), 0.2)
+                self.assertEqual(self.router.db_for_read(Schedule), DEFAULT_DB_ALIAS)
+                self.assertTrue(Schedule.objects.filter(pk=schedule.pk).exists())
+        finally:
+            with replica.cursor() as cursor:
+                cursor.execute("SELECT pg_wal_replay_resume()")
+        self.wait_for_replay(schedule.pk)
+        self.assertLessEqual(replica_lag(refresh=True), db_router.REPLICA_MAX_LAG)
+
+    def test_unreachable_replica_falls_back_to_primary(self):
+        replica = connections[REPLICA_DB_ALIAS]
+        replica.close()
+        # nothing listens on port 1
+        with mock.patch.dict(replica.settings_dict, {'HOST': '127.0.0.1', 'PORT': 1}), \
+                self.assertLogs('core.db_router', 'WARNING'), use_replica():
+            self.assertIsNone(replica_lag(refresh=True))
+            self.assertEqual(self.router.db_for_read(Schedule), DEFAULT_DB_ALIAS)
+        replica.close()
+        self.assertIsNotNone(replica_lag(refresh=True))
+
+    def test_lag_is_measured_once_per_interval(self):
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(Schedule), REPLICA_DB_ALIAS)
+            with CaptureQueriesContext(connections[REPLICA_DB_ALIAS]) as replica_queries:
+                self.router.db_for_read(Schedule)
+            self.assertEqual(len(replica_queries), 0)
@@ -0,0 +1,268 @@
+"""
+Minimal in-process tracing for session saves.
+
+`span()` times a block together with the SQL it ran (queries and rows returned,
+children included). A span opened without a parent is a root: when it ends, the
+whole tree goes to the sink configured in settings.TRACING_SINK, and to the
+slow-save log if it took longer than settings.TRACING_SLOW_SAVE_SECONDS.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import urllib.request
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from core.metrics import VALIDATION_DURATION
+
+logger = logging.getLogger(__name__)
+slow_save_logger = logging.getLogger('tracing.slow_save')
+
+SERVICE_NAME = 'article_judging_system'
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.attributes = dict(attributes or {})
+        self.children = []
+        self.queries = 0
+        self.rows = 0
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self._start = time.perf_counter()
+        self.duration = None
+        if parent:
+            parent.children.append(self)
+
+    def count_query(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        self.queries += 1
+        # rowcount is the number of rows returned for SELECTs on PostgreSQL (-1 where unknown)
+        self.rows += max(getattr(context.get('cursor'), 'rowcount', 0) or 0, 0)
+        return result
+
+    def finish(self):
+        self.end_ns = time.time_ns()
+        self.duration = time.perf_counter() - self._start
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent.span_id if self.parent else None,
+            'start_ns': self.start_ns,
+            'ms': round(self.duration * 1000, 2),
+            'queries': self.queries,
+            'rows': self.rows,
+            'error': self.error,
+            'attributes': self.attributes,
+            'children': [child.to_dict() for child in self.children],
+        }
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def render(self, depth=0):
+        """ Indented text tree, for the slow-save log """
+        line = (f"{'  ' * depth}{self.name} {self.duration * 1000:.1f} ms | "
+                f"{self.queries} queries | {self.rows} rows" + (f" | {self.error}" if self.error else ""))
+        return "\n".join([line] + [child.render(depth + 1) for child in self.children])
+
+
+@contextmanager
+def span(name, **attributes):
+    parent = _current_span.get()
+    current = Span(name, parent, attributes)
+    token = _current_span.set(current)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(current.count_query))
+            yield current
+    except Exception as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        current.finish()
+        _current_span.reset(token)
+        if parent is None:
+            _finish_trace(current)
+
+
+def validation_step(method):
+    """
+    Run a validate_* method of a form / formset in a span named after its class and
+    method, and time it for /metrics.
+    """
+    form, step = method.__qualname__.split('.')[-2:]
+    histogram = VALIDATION_DURATION.labels(form=form, step=step)
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with histogram.time(), span(f"{form}.{step}", form=form, step=step):
+            return method(*args, **kwargs)
+    return wrapper
+
+
+def _finish_trace(root):
+    threshold = getattr(settings, 'TRACING_SLOW_SAVE_SECONDS', None)
+    if threshold is not None and root.duration >= threshold:
+        slow_save_logger.warning(
+            "slow save (%.2f s > %.2f s), trace %s\n%s\n%s",
+            root.duration, threshold, root.trace_id, root.render(), json.dumps(root.to_dict(), ensure_ascii=False),
+        )
+    sink = get_sink()
+    if sink is not None:
+        try:
+            sink.export(root)
+        except Exception:
+            logger.warning("could not export trace %s", root.trace_id, exc_info=True)
+
+
+_sink = {'instance': None, 'path': None}
+
+
+def get_sink():
+    path = getattr(settings, 'TRACING_SINK', None)
+    if not path:
+        return None
+    if _sink['path'] != path:
+        _sink['instance'] = import_string(path)()
+        _sink['path'] = path
+    return _sink['instance']
+
+
+class JSONFileSink:
+    """ One JSON span tree per line in settings.TRACING_FILE """
+    def __init__(self):
+        self.path = settings.TRACING_FILE
+        self.lock = threading.Lock()
+
+    def export(self, root):
+        self.write(json.dumps(root.to_dict(), ensure_ascii=False))
+
+    def write(self, line):
+        with self.lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+
+
+class OTLPJSONSink(JSONFileSink):
+    """
+    OTLP/JSON (ExportTraceServiceRequest) documents, POSTed to settings.TRACING_OTLP_ENDPOINT
+    (e.g. http://collector:4318/v1/traces) when it is set, otherwise appended to TRACING_FILE
+    one per line for a collector or any later upload.
+
+    POSTs never run on the request: finished traces wait in a queue of TRACING_QUEUE_SIZE
+    and a daemon thread sends them, up to BATCH_SIZE per request. While the collector is
+    slow or down and the queue is full, new traces are dropped.
+    """
+    BATCH_SIZE = 100
+
+    def __init__(self):
+        self.endpoint = getattr(settings, 'TRACING_OTLP_ENDPOINT', None)
+        if not self.endpoint:
+            super().__init__()
+            return
+        self.queue = queue.Queue(maxsize=getattr(settings, 'TRACING_QUEUE_SIZE', 1000))
+        self.dropped = 0
+        self.sender = None
+        self.sender_pid = None
+        self.lock = threading.Lock()
+
+    def export(self, root):
+        if not self.endpoint:
+            return self.write(json.dumps(self.encode([root])))
+        self.start_sender()
+        try:
+            self.queue.put_nowait(root)
+        except queue.Full:
+            self.dropped += 1
+            logger.debug("trace queue full, trace %s dropped (%d so far)", root.trace_id, self.dropped)
+
+    def start_sender(self):
+        # a forked worker does not inherit the thread, it starts its own
+        if self.sender_pid == os.getpid():
+            return
+        with self.lock:
+            if self.sender_pid != os.getpid():
+                self.sender = threading.Thread(target=self.send_forever, name='otlp-sender', daemon=True)
+                self.sender.start()
+                self.sender_pid = os.getpid()
+
+    def send_forever(self):
+        while True:
+            roots = [self.queue.get()]
+            while len(roots) < self.BATCH_SIZE:
+                try:
+                    roots.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.send(roots)
+            except Exception:
+                logger.warning("could not export %d traces", len(roots), exc_info=True)
+
+    def send(self, roots):
+        request = urllib.request.Request(
+            self.endpoint, data=json.dumps(self.encode(roots)).encode(),
+            headers={'Content-Type': 'application/json'}, method='POST',
+        )
+        urllib.request.urlopen(request, timeout=2).close()
+
+    @classmethod
+    def encode(cls, roots):
+        return {'resourceSpans': [{
+            'resource': {'attributes': cls.attributes({'service.name': SERVICE_NAME})},
+            'scopeSpans': [{
+                'scope': {'name': __name__},
+                'spans': [cls.encode_span(s) for root in roots for s in root.walk()],
+            }],
+        }]}
+
+    @classmethod
+    def encode_span(cls, s):
+        encoded = {
+            'traceId': s.trace_id,
+            'spanId': s.span_id,
+            'name': s.name,
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(s.start_ns),
+            'endTimeUnixNano': str(s.end_ns),
+            'attributes': cls.attributes({**s.attributes, 'db.queries': s.queries, 'db.rows': s.rows}),
+            'status': {'code': 2, 'message': s.error} if s.error else {'code': 1},
+        }
+        if s.parent:
+            encoded['parentSpanId'] = s.parent.span_id
+        return encoded
+
+    @staticmethod
+    def attributes(values):
+        encoded = []
+        for key, value in values.items():
+            if isinstance(value, bool):
+                encoded.append({'key': key, 'value': {'boolValue': value}})
+            elif isinstance(value, int):
+                encoded.append({'key': key, 'value': {'intValue': str(value)}})
+            elif isinstance(value, float):
+                encoded.append({'key': key, 'value': {'doubleValue': value}})
+            elif value is not None:
+                encoded.append({'key': key, 'value': {'stringValue': str(value)}})
+        return encoded
@@ -17,10 +17,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from account.custom_admin import custom_admin_site
+from core.metrics import metrics_view
 
 urlpatterns = [
     # path('admin/', admin.site.urls),
     path('admin/', custom_admin_site.urls),
     path('assignment/', include('assignment.urls')),
     path('uni/', include('university_adminstration.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
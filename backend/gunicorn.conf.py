@@ -0,0 +1,7 @@
+# gunicorn -c gunicorn.conf.py core.wsgi
+# Metrics of all workers are collected in PROMETHEUS_MULTIPROC_DIR, see core.metrics
+from prometheus_client import multiprocess
+
+
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)
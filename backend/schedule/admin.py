@@ -6,16 +6,11 @@ from jalali_date.widgets import AdminJalaliDateWidget
 from django_flatpickr.widgets import TimePickerInput  # Import Flatpickr widget
 from django import forms
 from .models import Schedule
+from assignment.archive import ArchiveError, archive_schedule
 from django.utils.translation import gettext_lazy as _
 from jalali_date import datetime2jalali, date2jalali
-from datetime import datetime, date
 
 class ScheduleForm(forms.ModelForm):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        current_year = date2jalali(date.today()).year
-        self.fields['year'].choices = [(year, year) for year in range(1396, current_year + 1)]
-
     class Meta:
         model = Schedule
         fields = '__all__'
@@ -42,10 +37,11 @@ class ScheduleForm(forms.ModelForm):
 class ScheduleAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
     form = ScheduleForm
 
-    list_display = ('year', 'semester', 'get_start_date_jalali', 'get_end_date_jalali')
+    list_display = ('year', 'semester', 'get_start_date_jalali', 'get_end_date_jalali', 'get_archived_at_jalali')
     list_filter = ('semester',)
     search_fields = ('year',)
     ordering = ('-year',)
+    actions = ['archive_sessions']
 
     def get_form(self, request, *args, **kwargs):
         form = super(ScheduleAdmin, self).get_form(request, *args, **kwargs)
@@ -66,4 +62,26 @@ class ScheduleAdmin(ModelAdminJalaliMixin, admin.ModelAdmin):
         else:
             return "ثبت نشده است"
 
+    @admin.display(description='بایگانی شده در زمان', ordering='archived_at')
+    def get_archived_at_jalali(self, obj):
+        if obj.archived_at:
+            return datetime2jalali(obj.archived_at).strftime('%a, %d %b %Y | %H:%M:%S')
+        else:
+            return "بایگانی نشده است"
+
+    @admin.action(description='انتقال جلسات نیم سال های به پایان رسیده انتخاب شده به بایگانی')
+    def archive_sessions(self, request, queryset):
+        # a semester holds the sessions of every faculty
+        if request.user.role != 'ALL':
+            messages.error(request, "فقط کاربران با دسترسی همه دانشکده ها میتوانند نیم سال را بایگانی کنند")
+            return
+        for schedule in queryset:
+            try:
+                count = archive_schedule(schedule)
+            except ArchiveError as error:
+                messages.error(request, str(error))
+                continue
+            messages.success(request, f"{count} جلسه از {schedule} به بایگانی منتقل شد")
+
+
 admin.site.register(Schedule, ScheduleAdmin)
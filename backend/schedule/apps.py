@@ -1,7 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ScheduleConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'schedule'
-    verbose_name = "داشبورد زمانبندی"
\ No newline at end of file
+    verbose_name = "داشبورد زمانبندی"
+
+    def ready(self):
+        import schedule.signals
+        post_migrate.connect(schedule.signals.fill_calendar, sender=self)
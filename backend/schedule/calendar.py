@@ -0,0 +1,100 @@
+"""
+The Jalali calendar table, CalendarDay.
+
+`build_calendar` fills it from 1396/01/01 to the end of a Jalali year and links every
+day to the schedule it falls in. It runs after every migrate (schedule.signals), and
+saving a schedule adds the missing days of its range and links them, so the date of
+any session has its row.
+
+Grouping sessions by Jalali month, for example, is a single query:
+
+    Session.objects.values('calendar_day__jalali_year', 'calendar_day__jalali_month') \
+        .annotate(count=Count('id')).order_by('calendar_day__jalali_year', 'calendar_day__jalali_month')
+"""
+from datetime import date, timedelta
+from functools import cache
+
+import jdatetime
+from django.db.models import Q
+
+from .models import CalendarDay, Schedule
+
+FIRST_YEAR = 1396
+# build_calendar goes this many Jalali years past the current one by default
+YEARS_AHEAD = 5
+BATCH_SIZE = 2000
+
+
+def calendar_day(day):
+    """ The CalendarDay of the Gregorian `day` (not saved) """
+    jalali = jdatetime.date.fromgregorian(date=day)
+    month_name = jdatetime.date.j_months_fa[jalali.month - 1]
+    weekday_name = jdatetime.date.j_weekdays_fa[jalali.weekday()]
+    return CalendarDay(
+        date=day,
+        jalali_year=jalali.year,
+        jalali_month=jalali.month,
+        jalali_day=jalali.day,
+        jalali_week=jalali.weeknumber(),
+        weekday=jalali.weekday(),
+        month_name=month_name,
+        weekday_name=weekday_name,
+        label=f"{weekday_name} {jalali.day} {month_name} {jalali.year}",
+    )
+
+
+def fill(start, end):
+    """ Add the days from `start` to `end` (inclusive) that are missing; returns how many were added """
+    existing = set(CalendarDay.objects.filter(date__range=(start, end)).values_list('date', flat=True))
+    days = [calendar_day(start + timedelta(days=offset)) for offset in range((end - start).days + 1)
+            if start + timedelta(days=offset) not in existing]
+    CalendarDay.objects.bulk_create(days, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    return len(days)
+
+
+def link_schedule(schedule):
+    """ Point the days of the schedule's range at it, and no others """
+    fill(schedule.start_date, schedule.end_date)
+    CalendarDay.objects.filter(schedule=schedule).exclude(
+        date__range=(schedule.start_date, schedule.end_date),
+    ).update(schedule=None)
+    CalendarDay.objects.filter(date__range=(schedule.start_date, schedule.end_date)).update(schedule=schedule)
+
+
+@cache
+def calendar_filled():
+    """
+    Whether the calendar table has its days, decided once per process: migrate fills it,
+    and both ways of in_month select the same days anyway
+    """
+    return CalendarDay.objects.exists()
+
+
+def in_month(field, jalali_month):
+    """
+    Q of the rows whose date `field` (e.g. 'created_at__date') falls in `jalali_month` of any year.
+    Read from the calendar table; while it is empty, by the Gregorian range of that month in
+    each year the table would cover.
+    """
+    if calendar_filled():
+        return Q(**{f'{field}__in': CalendarDay.objects.filter(jalali_month=jalali_month).values('date')})
+    condition = Q()
+    for year in range(FIRST_YEAR, jdatetime.date.fromgregorian(date=date.today()).year + YEARS_AHEAD + 1):
+        start = jdatetime.date(year, jalali_month, 1)
+        end = jdatetime.date(year + 1, 1, 1) if jalali_month == 12 else jdatetime.date(year, jalali_month + 1, 1)
+        condition |= Q(**{f'{field}__gte': start.togregorian(), f'{field}__lt': end.togregorian()})
+    return condition
+
+
+def build_calendar(until_year=None):
+    """
+    Fill the calendar from FIRST_YEAR through the end of `until_year` (YEARS_AHEAD past the
+    current Jalali year by default) and relink every schedule. Returns the number of days added.
+    """
+    until_year = until_year or jdatetime.date.fromgregorian(date=date.today()).year + YEARS_AHEAD
+    added = fill(jdatetime.date(FIRST_YEAR, 1, 1).togregorian(),
+                 jdatetime.date(until_year + 1, 1, 1).togregorian() - timedelta(days=1))
+    # later semesters win the days two schedules share
+    for schedule in Schedule.objects.order_by('start_date', 'id'):
+        link_schedule(schedule)
+    return added
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from schedule.calendar import FIRST_YEAR, YEARS_AHEAD, build_calendar
+
+
+class Command(BaseCommand):
+    help = (f"Fill the Jalali calendar table (CalendarDay) from {FIRST_YEAR} on and link its days to the "
+            "schedules. Safe to run again; migrate runs it, run it after loading schedules with loaddata.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until-year', type=int, default=None,
+                            help=f"last Jalali year to fill (default: {YEARS_AHEAD} years after the current one)")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        added = build_calendar(options['until_year'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{added} days added to the calendar in {time.perf_counter() - start:.1f} s"
+        ))
@@ -2,11 +2,28 @@ from django.db import models
 from jalali_date import datetime2jalali, date2jalali
 from django.core.validators import MinValueValidator, MaxValueValidator
 from datetime import datetime, date
+import jdatetime
+
+
+_year_choices_cache = {'valid_until': None, 'choices': []}
 
 
 def current_year_choices():
-    current_year = date2jalali(date.today()).year
-    return [(year, year) for year in range(1396, current_year + 1)]
+    """
+    Return year choices from 1396 up to the current Jalali year.
+
+    Passed to the field as a callable so the list is built lazily and stays
+    out of migration state. The result is cached until the next Nowruz, so
+    ``date2jalali`` only runs once per Jalali year.
+    """
+    today = date.today()
+    valid_until = _year_choices_cache['valid_until']
+    if valid_until is None or today >= valid_until:
+        current_year = date2jalali(today).year
+        _year_choices_cache['choices'] = [(year, year) for year in range(1396, current_year + 1)]
+        # first day of the next Jalali year (Nowruz) in Gregorian calendar
+        _year_choices_cache['valid_until'] = jdatetime.date(current_year + 1, 1, 1).togregorian()
+    return _year_choices_cache['choices']
 
 class Schedule(models.Model):
 
@@ -24,7 +41,7 @@ class Schedule(models.Model):
             MinValueValidator(1396),  # Earliest year to allow
             # MaxValueValidator(date2jalali(date.today()).year)  # Restrict to the current year or earlier
         ],
-        choices=current_year_choices(),  # Use a dynamic list of choices
+        choices=current_year_choices,  # Evaluated lazily on every use
         blank=False,
         null=False,
         verbose_name="انتخاب سال",
@@ -46,6 +63,18 @@ class Schedule(models.Model):
         verbose_name='تاریخ پایان نیم سال تحصیلی',
     )
 
+    # set by assignment.archive once the sessions of this semester are moved to the archive
+    archived_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="بایگانی شده در زمان",
+    )
+
+    @property
+    def is_finished(self):
+        return self.end_date < date.today()
+
     def __str__(self):
         return f" سال {self.year} - {self.SEMESTER_CHOICES[self.semester]}"
 
@@ -54,3 +83,44 @@ class Schedule(models.Model):
         verbose_name_plural = "نیم سال های تحصیلی"
         constraints = [
             models.UniqueConstraint(fields=['year', 'semester'], name='unique_year_semester',)]
+
+
+class CalendarDay(models.Model):
+    """
+    One row per Gregorian day from 1396/01/01 on, with its Jalali parts and the schedule
+    it belongs to. Reports join it on a date (Session.calendar_day) and group by its
+    columns in SQL instead of converting every row with date2jalali. Filled and kept
+    up to date by schedule.calendar.
+    """
+    date = models.DateField(
+        primary_key=True,
+        verbose_name="تاریخ میلادی",
+    )
+    jalali_year = models.PositiveSmallIntegerField(verbose_name="سال")
+    jalali_month = models.PositiveSmallIntegerField(verbose_name="ماه")
+    jalali_day = models.PositiveSmallIntegerField(verbose_name="روز")
+    # weeks start on Saturday; week 1 holds 1 Farvardin
+    jalali_week = models.PositiveSmallIntegerField(verbose_name="هفته سال")
+    # 0 = Saturday ... 6 = Friday
+    weekday = models.PositiveSmallIntegerField(verbose_name="روز هفته")
+    month_name = models.CharField(max_length=16, verbose_name="نام ماه")
+    weekday_name = models.CharField(max_length=16, verbose_name="نام روز هفته")
+    label = models.CharField(max_length=40, verbose_name="تاریخ شمسی")
+    schedule = models.ForeignKey(
+        'Schedule',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='calendar_days',
+        verbose_name="نیم سال تحصیلی",
+    )
+
+    class Meta:
+        verbose_name = "روز تقویم"
+        verbose_name_plural = "تقویم شمسی"
+        indexes = [
+            models.Index(fields=['jalali_year', 'jalali_month', 'jalali_day'], name='calendar_jalali_idx'),
+        ]
+
+    def __str__(self):
+        return self.label
@@ -0,0 +1,24 @@
+from django.db import connections, router
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .calendar import build_calendar, link_schedule
+from .models import CalendarDay, Schedule
+
+
+@receiver(post_save, sender=Schedule)
+def link_calendar_days(sender, instance, raw=False, update_fields=None, **kwargs):
+    # loaddata is followed by build_calendar; other saves only matter when the range may have moved
+    if raw or (update_fields is not None and not {'start_date', 'end_date'} & set(update_fields)):
+        return
+    link_schedule(instance)
+
+
+def fill_calendar(sender, using, **kwargs):
+    """ post_migrate of this app (ScheduleConfig.ready): a migrated database always has its calendar """
+    if not router.allow_migrate_model(using, CalendarDay):
+        return
+    # a migrate back to before the calendar
+    if CalendarDay._meta.db_table not in connections[using].introspection.table_names():
+        return
+    build_calendar()
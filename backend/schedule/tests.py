@@ -1,3 +1,74 @@
+from datetime import date, timedelta
+
+import jdatetime
 from django.test import TestCase
 
-# Create your tests here.
+from .calendar import FIRST_YEAR, YEARS_AHEAD, build_calendar, calendar_filled, in_month
+from .models import CalendarDay, Schedule
+
+
+def jalali(year, month, day):
+    return jdatetime.date(year, month, day).togregorian()
+
+
+class CalendarTests(TestCase):
+    """ schedule.calendar: the CalendarDay table, its schedules and the month filter read from it """
+
+    def setUp(self):
+        calendar_filled.cache_clear()
+        self.addCleanup(calendar_filled.cache_clear)
+
+    def create_schedule(self, year, semester, start_date, end_date):
+        return Schedule.objects.create(year=year, semester=semester, start_date=start_date, end_date=end_date)
+
+    def test_migrate_builds_the_calendar(self):
+        until_year = jdatetime.date.fromgregorian(date=date.today()).year + YEARS_AHEAD
+        first = CalendarDay.objects.order_by('date').first()
+        self.assertEqual(first.date, jalali(FIRST_YEAR, 1, 1))
+        self.assertEqual((first.jalali_year, first.jalali_month, first.jalali_day), (FIRST_YEAR, 1, 1))
+        self.assertEqual(CalendarDay.objects.count(),
+                         (jalali(until_year + 1, 1, 1) - jalali(FIRST_YEAR, 1, 1)).days)
+
+    def test_build_calendar_adds_the_missing_days(self):
+        CalendarDay.objects.filter(date__range=(jalali(1403, 12, 1), jalali(1403, 12, 30))).delete()
+        self.assertEqual(build_calendar(), 30)  # 1403 is a leap year
+        self.assertEqual(build_calendar(), 0)
+        self.assertTrue(CalendarDay.objects.get(date=jalali(1403, 12, 30)).label.endswith("30 اسفند 1403"))
+
+    def test_saved_schedule_links_its_days(self):
+        schedule = self.create_schedule(1403, 'one', jalali(1403, 7, 1), jalali(1403, 10, 30))
+        linked = CalendarDay.objects.filter(schedule=schedule)
+        self.assertEqual(linked.count(), (schedule.end_date - schedule.start_date).days + 1)
+
+        schedule.end_date = jalali(1403, 9, 30)
+        schedule.save()
+        self.assertEqual(linked.count(), (schedule.end_date - schedule.start_date).days + 1)
+        self.assertIsNone(CalendarDay.objects.get(date=jalali(1403, 10, 1)).schedule)
+
+    def test_build_calendar_relinks_the_schedules(self):
+        schedule = self.create_schedule(1403, 'two', jalali(1403, 11, 1), jalali(1404, 4, 15))
+        CalendarDay.objects.update(schedule=None)
+        build_calendar()
+        self.assertEqual(CalendarDay.objects.filter(schedule=schedule).count(),
+                         (schedule.end_date - schedule.start_date).days + 1)
+
+    def test_in_month_reads_the_calendar(self):
+        self.create_schedule(1402, 'third', jalali(1402, 12, 29), jalali(1403, 1, 10))
+        self.create_schedule(1403, 'one', jalali(1403, 1, 1), jalali(1403, 2, 1))
+        self.create_schedule(1403, 'two', jalali(1403, 12, 30), jalali(1404, 2, 1))
+        self.create_schedule(1404, 'one', jalali(1403, 12, 30) + timedelta(days=1), jalali(1404, 2, 1))
+
+        def months():
+            return {month: sorted(Schedule.objects.filter(in_month('start_date', month))
+                                  .values_list('year', 'semester'))
+                    for month in (1, 12)}
+
+        expected = {1: [(1403, 'one'), (1404, 'one')], 12: [(1402, 'third'), (1403, 'two')]}
+        with self.assertNumQueries(1):
+            calendar_filled()
+        self.assertEqual(months(), expected)
+
+        # an empty table is read as the Gregorian ranges of the month
+        CalendarDay.objects.all().delete()
+        calendar_filled.cache_clear()
+        self.assertEqual(months(), expected)
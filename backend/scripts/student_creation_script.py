@@ -1,6 +1,7 @@
 # student_creation_script.py
 import random
 
+from django.core.exceptions import ValidationError
 from university_adminstration.models import Student, FacultyEducationalGroup
 
 
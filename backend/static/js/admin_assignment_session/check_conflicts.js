@@ -0,0 +1,79 @@
+(function($) {
+    // Reports conflicts of the session being entered while the form is filled in.
+    // SessionAdmin.check_conflicts compares the values with the cached occupancy of the day.
+    $(function() {
+        const box = document.getElementById('session-conflicts');
+        if (!box) return;
+        const form = box.closest('form');
+        const fields = ['schedule', 'date', 'start_time', 'end_time', 'class_number', 'student',
+                        'supervisor1', 'supervisor2', 'supervisor3', 'supervisor4', 'graduate_monitor'];
+        const DELAY = 400;  // ms after the last change
+        let timer = null;
+        let controller = null;
+
+        function judgeSelects() {
+            // rows of the judges inline that are not marked for deletion
+            return Array.from(form.querySelectorAll('select[name^="judges-"][name$="-judge"]')).filter(select => {
+                const row = select.closest('tr');
+                const deleted = row && row.querySelector('input[name$="-DELETE"]');
+                return select.value && !(deleted && deleted.checked);
+            });
+        }
+
+        function query() {
+            const params = new URLSearchParams();
+            if (box.dataset.session) params.set('session', box.dataset.session);
+            fields.forEach(name => {
+                const field = form.elements[name];
+                if (field && field.value) params.set(name, field.value);
+            });
+            judgeSelects().forEach(select => params.append('judge', select.value));
+            return params;
+        }
+
+        function targets(conflict) {
+            if (conflict.field === 'judge') {
+                return judgeSelects().filter(select => select.value === String(conflict.value))
+                    .map(select => select.closest('td'));
+            }
+            const container = form.querySelector('.fieldBox.field-' + conflict.field) ||
+                              form.querySelector('.form-row.field-' + conflict.field);
+            return container ? [container] : [box];
+        }
+
+        function show(conflicts) {
+            form.querySelectorAll('.live-conflict').forEach(list => list.remove());
+            conflicts.forEach(conflict => {
+                targets(conflict).forEach(target => {
+                    const list = document.createElement('ul');
+                    list.className = 'errorlist live-conflict';
+                    const item = document.createElement('li');
+                    item.textContent = conflict.message;
+                    list.appendChild(item);
+                    target.appendChild(list);
+                });
+            });
+        }
+
+        function check() {
+            if (controller) controller.abort();  // only the latest values matter
+            controller = new AbortController();
+            fetch(box.dataset.url + '?' + query(), {signal: controller.signal, credentials: 'same-origin'})
+                .then(response => response.json())
+                .then(data => show(data.conflicts))
+                .catch(error => {
+                    if (error.name !== 'AbortError') console.error('Error checking session conflicts:', error);
+                });
+        }
+
+        function schedule() {
+            clearTimeout(timer);
+            timer = setTimeout(check, DELAY);
+        }
+
+        // jQuery handlers also see the changes the date picker and the autocompletes trigger
+        $(form).on('change', 'input, select', schedule);
+        $(document).on('formset:removed', schedule);
+        schedule();
+    });
+})(django.jQuery);
@@ -139,6 +139,15 @@ class StudentAdmin(admin.ModelAdmin):
         return format_html('<a href="{}">مشاهده دانشجو</a>', f"/admin/university_adminstration/student/{obj.id}/change/")
     edit_student.short_description = "اطلاعات کامل دانشجو"
 
+    def get_search_results(self, request, queryset, search_term):
+        queryset, use_distinct = super().get_search_results(request, queryset, search_term)
+
+        # The session form's student picker only offers students who have not defended yet
+        if request.GET.get('model_name') == 'session' and request.GET.get('field_name') == 'student':
+            queryset = queryset.filter(status='Current')
+
+        return queryset, use_distinct
+
     def get_queryset(self, request):
         """
         Filter students based on the role of the current admin user.
@@ -0,0 +1,123 @@
+"""
+Helpers shared by the import_students / import_teachers management commands.
+Rows are streamed from CSV or xlsx files and handled in batches, so a registrar
+export of tens of thousands of rows never has to fit in memory at once.
+"""
+import csv
+from collections import defaultdict
+from itertools import islice
+from pathlib import Path
+
+import openpyxl
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from .models import FacultyEducationalGroup
+
+
+def read_rows(path):
+    """ Yield (row_number, {column: value}) for every data row of a .csv or .xlsx file """
+    path = Path(path)
+    if path.suffix.lower() == '.xlsx':
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(column).strip() for column in next(rows)]
+            for row_number, values in enumerate(rows, start=2):
+                if not any(values):
+                    continue
+                yield row_number, {column: _cell(value) for column, value in zip(header, values)}
+        finally:
+            workbook.close()
+    else:
+        with open(path, newline='', encoding='utf-8-sig') as file:
+            for row_number, row in enumerate(csv.DictReader(file), start=2):
+                yield row_number, {column.strip(): (value or '').strip() for column, value in row.items()}
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def faculty_group_map():
+    """ {(faculty, educational_group): id} for every FacultyEducationalGroup, in one query """
+    return {
+        (faculty, educational_group): pk
+        for pk, faculty, educational_group in
+        FacultyEducationalGroup.objects.values_list('id', 'faculty', 'educational_group')
+    }
+
+
+def format_errors(error):
+    if isinstance(error, ValidationError) and hasattr(error, 'error_dict'):
+        return "; ".join(f"{field}: {' '.join(messages)}" for field, messages in error.message_dict.items())
+    return "; ".join(error.messages) if isinstance(error, ValidationError) else str(error)
+
+
+def find_unique_conflicts(model, rows, key_field, unique_fields):
+    """
+    Check `unique_fields` of a batch against itself and against the database with one
+    query per field. Returns {row_number: message} for rows whose value already
+    belongs to another record (identified by `key_field`).
+    """
+    errors = {}
+    seen_keys = set()
+    for row_number, obj in rows:
+        key = getattr(obj, key_field)
+        if key in seen_keys:
+            # one INSERT .. ON CONFLICT cannot touch the same row twice
+            errors[row_number] = f"{key_field}: {key} is repeated in this file"
+        seen_keys.add(key)
+
+    for field in unique_fields:
+        rows_by_value = defaultdict(list)
+        for row_number, obj in rows:
+            value = getattr(obj, field)
+            # NULLs never collide, but a blank stored as '' does
+            if value is not None:
+                rows_by_value[value].append((row_number, getattr(obj, key_field)))
+
+        for value, owners in rows_by_value.items():
+            for row_number, key in owners[1:]:
+                if key != owners[0][1]:
+                    errors[row_number] = f"{field}: {value or '(blank)'} is repeated in this file"
+
+        existing = model.objects.filter(**{f"{field}__in": rows_by_value.keys()}).values_list(field, key_field)
+        for value, existing_key in existing:
+            for row_number, key in rows_by_value[value]:
+                if key != existing_key:
+                    errors[row_number] = (f"{field}: {value or '(blank)'} already belongs to "
+                                          f"{key_field} {existing_key}")
+    return errors
+
+
+def save_rows(rows, save):
+    """
+    Call save([(row_number, obj), ..]) for the batch in one transaction. If the database
+    still rejects it (a conflict the checks above could not see, e.g. a concurrent
+    import), retry row by row and return {row_number: message} of the rows that failed.
+    """
+    try:
+        with transaction.atomic():
+            save(rows)
+        return {}
+    except IntegrityError:
+        pass
+    errors = {}
+    for row in rows:
+        try:
+            with transaction.atomic():
+                save([row])
+        except IntegrityError as e:
+            errors[row[0]] = str(e).strip().splitlines()[0]
+    return errors
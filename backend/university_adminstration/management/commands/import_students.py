@@ -0,0 +1,76 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+
+from university_adminstration.importers import (
+    read_rows, batched, faculty_group_map, format_errors, find_unique_conflicts, save_rows,
+)
+from university_adminstration.models import Student
+
+STUDENT_COLUMNS = [
+    'first_name', 'last_name', 'email', 'phone_number', 'student_number', 'role', 'status',
+    'admission_year', 'gender', 'military_status', 'program_type',
+]
+# Everything but the upsert key and created_at is refreshed from the registrar file
+UPDATE_FIELDS = [column for column in STUDENT_COLUMNS if column != 'student_number'] + [
+    'faculty_educational_group', 'updated_at',
+]
+
+
+class Command(BaseCommand):
+    help = ("Create or update students from a registrar .csv/.xlsx export. Columns: "
+            f"{', '.join(STUDENT_COLUMNS)}, faculty, educational_group. Rows are matched on student_number.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="validate only, write nothing")
+
+    def handle(self, *args, **options):
+        groups = faculty_group_map()
+        saved = failed = 0
+
+        for batch in batched(read_rows(options['path']), options['batch_size']):
+            students, errors = [], {}
+            for row_number, row in batch:
+                try:
+                    students.append((row_number, self.build_student(row, groups)))
+                except ValidationError as e:
+                    errors[row_number] = format_errors(e)
+
+            errors.update(find_unique_conflicts(Student, students, 'student_number', ['email', 'phone_number']))
+            valid = [(row_number, student) for row_number, student in students if row_number not in errors]
+
+            if valid and not options['dry_run']:
+                rejected = save_rows(valid, self.save_students)
+                errors.update(rejected)
+                valid = [row for row in valid if row[0] not in rejected]
+            saved += len(valid)
+            failed += len(errors)
+            for row_number in sorted(errors):
+                self.stderr.write(f"row {row_number}: {errors[row_number]}")
+
+        action = "validated" if options['dry_run'] else "saved"
+        self.stdout.write(self.style.SUCCESS(f"{saved} students {action}, {failed} rows rejected"))
+
+    def save_students(self, rows):
+        Student.objects.bulk_create(
+            [student for _, student in rows],
+            update_conflicts=True,
+            unique_fields=['student_number'],
+            update_fields=UPDATE_FIELDS,
+        )
+
+    def build_student(self, row, groups):
+        group_id = groups.get((row.get('faculty'), row.get('educational_group')))
+        if group_id is None:
+            raise ValidationError(
+                f"unknown faculty / educational group {row.get('faculty')} / {row.get('educational_group')}")
+
+        student = Student(
+            **{column: row.get(column, '') for column in STUDENT_COLUMNS},
+            faculty_educational_group_id=group_id,
+        )
+        student.email = student.email or None
+        # field level validation only, uniqueness is checked per batch
+        student.clean_fields(exclude=['faculty_educational_group'])
+        return student
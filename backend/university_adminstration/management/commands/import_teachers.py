@@ -0,0 +1,87 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+
+from university_adminstration.importers import (
+    read_rows, batched, faculty_group_map, format_errors, find_unique_conflicts, save_rows,
+)
+from university_adminstration.models import Teacher, TeacherFacultyEducationalGroupAssignment
+
+TEACHER_COLUMNS = ['first_name', 'last_name', 'email', 'phone_number', 'national_code', 'faculty_id', 'degree']
+UPDATE_FIELDS = [column for column in TEACHER_COLUMNS if column != 'national_code'] + ['updated_at']
+
+
+class Command(BaseCommand):
+    help = ("Create or update teachers from a .csv/.xlsx file. Columns: "
+            f"{', '.join(TEACHER_COLUMNS)}, groups (e.g. 'MAT:CS;CHE:CHEM'). Rows are matched on "
+            "national_code; listed faculty groups are assigned if the teacher does not have them yet.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help="validate only, write nothing")
+
+    def handle(self, *args, **options):
+        groups = faculty_group_map()
+        saved = failed = 0
+
+        for batch in batched(read_rows(options['path']), options['batch_size']):
+            teachers, group_ids, errors = [], {}, {}
+            for row_number, row in batch:
+                try:
+                    teacher, group_ids[row_number] = self.build_teacher(row, groups)
+                    teachers.append((row_number, teacher))
+                except ValidationError as e:
+                    errors[row_number] = format_errors(e)
+
+            errors.update(find_unique_conflicts(Teacher, teachers, 'national_code',
+                                                ['email', 'phone_number', 'faculty_id']))
+            valid = [(row_number, teacher) for row_number, teacher in teachers if row_number not in errors]
+
+            if valid and not options['dry_run']:
+                rejected = save_rows(valid, lambda rows: self.save_teachers(rows, group_ids))
+                errors.update(rejected)
+                valid = [row for row in valid if row[0] not in rejected]
+            saved += len(valid)
+            failed += len(errors)
+            for row_number in sorted(errors):
+                self.stderr.write(f"row {row_number}: {errors[row_number]}")
+
+        action = "validated" if options['dry_run'] else "saved"
+        self.stdout.write(self.style.SUCCESS(f"{saved} teachers {action}, {failed} rows rejected"))
+
+    def save_teachers(self, rows, group_ids):
+        # PostgreSQL returns the ids of inserted and updated rows alike
+        Teacher.objects.bulk_create(
+            [teacher for _, teacher in rows],
+            update_conflicts=True,
+            unique_fields=['national_code'],
+            update_fields=UPDATE_FIELDS,
+        )
+        self.assign_groups([(teacher, group_ids[row_number]) for row_number, teacher in rows])
+
+    def build_teacher(self, row, groups):
+        group_ids = []
+        for pair in filter(None, row.get('groups', '').split(';')):
+            faculty, _, educational_group = pair.strip().partition(':')
+            group_id = groups.get((faculty, educational_group))
+            if group_id is None:
+                raise ValidationError(f"unknown faculty / educational group {pair}")
+            group_ids.append(group_id)
+
+        teacher = Teacher(**{column: row.get(column, '') for column in TEACHER_COLUMNS})
+        # field level validation only, uniqueness is checked per batch
+        teacher.clean_fields()
+        return teacher, group_ids
+
+    def assign_groups(self, teachers_with_groups):
+        existing = set(
+            TeacherFacultyEducationalGroupAssignment.objects
+            .filter(teacher__in=[teacher.pk for teacher, _ in teachers_with_groups])
+            .values_list('teacher_id', 'faculty_educational_group_id')
+        )
+        TeacherFacultyEducationalGroupAssignment.objects.bulk_create([
+            TeacherFacultyEducationalGroupAssignment(teacher_id=teacher.pk, faculty_educational_group_id=group_id)
+            for teacher, group_ids in teachers_with_groups
+            for group_id in dict.fromkeys(group_ids)
+            if (teacher.pk, group_id) not in existing
+        ])
@@ -0,0 +1,40 @@
+from rest_framework import serializers
+
+from .models import FacultyEducationalGroup, Student, Teacher
+
+
+class FacultyEducationalGroupSerializer(serializers.ModelSerializer):
+    faculty_display = serializers.CharField(source='get_faculty_display')
+    educational_group_display = serializers.CharField(source='get_educational_group_display')
+
+    class Meta:
+        model = FacultyEducationalGroup
+        fields = ['id', 'faculty', 'faculty_display', 'educational_group', 'educational_group_display']
+
+
+class TeacherSerializer(serializers.ModelSerializer):
+    """ Needs the group assignments prefetched with their group (see TeacherViewSet) """
+    name = serializers.CharField()
+    faculty_educational_groups = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Teacher
+        # contact details and the national code stay in the admin
+        fields = ['id', 'name', 'first_name', 'last_name', 'faculty_id', 'degree', 'faculty_educational_groups',
+                  'created_at', 'updated_at']
+
+    def get_faculty_educational_groups(self, obj):
+        return FacultyEducationalGroupSerializer(
+            [assignment.faculty_educational_group for assignment in obj.teacherfacultyeducationalgroupassignment_set.all()],
+            many=True,
+        ).data
+
+
+class StudentSerializer(serializers.ModelSerializer):
+    name = serializers.CharField()
+    faculty_educational_group = FacultyEducationalGroupSerializer()
+
+    class Meta:
+        model = Student
+        fields = ['id', 'name', 'first_name', 'last_name', 'student_number', 'role', 'status', 'admission_year',
+                  'program_type', 'faculty_educational_group', 'created_at', 'updated_at']
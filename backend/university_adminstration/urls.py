@@ -1,6 +1,13 @@
 from django.urls import path
-from .views import GetEducationalGroupsView
+from rest_framework.routers import SimpleRouter
+
+from .views import GetEducationalGroupsView, GetAllEducationalGroupsView, StudentViewSet, TeacherViewSet
+
+router = SimpleRouter()
+router.register('api/teachers', TeacherViewSet, basename='api-teacher')
+router.register('api/students', StudentViewSet, basename='api-student')
 
 urlpatterns = [
     path('api/educational-groups/', GetEducationalGroupsView.as_view(), name='get_educational_groups'),
-]
\ No newline at end of file
+    path('api/educational-groups/all/', GetAllEducationalGroupsView.as_view(), name='get_all_educational_groups'),
+] + router.urls
@@ -1,15 +1,86 @@
-from django.http import JsonResponse
+import hashlib
+import json
+
+from django.db.models import Exists, OuterRef, Prefetch
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
 from django.views import View
-from .models import FacultyEducationalGroup
+from django.views.decorators.http import condition
+
+from core.api import ReadOnlyApiViewSet
+from .models import FacultyEducationalGroup, Student, Teacher, TeacherFacultyEducationalGroupAssignment
+from .serializers import StudentSerializer, TeacherSerializer
+
+# Educational group choices only change with a deploy, so every response body is
+# serialized once when the module is loaded and served as-is afterwards.
+EDUCATIONAL_GROUPS_MAX_AGE = 60 * 60 * 24
+
+
+def _serialize(educational_groups):
+    body = json.dumps({'educational_groups': educational_groups}).encode()
+    return body, hashlib.md5(body).hexdigest()
+
+
+EDUCATIONAL_GROUPS_BY_FACULTY = {
+    faculty: _serialize(groups)
+    for faculty, groups in FacultyEducationalGroup.EDUCATIONAL_GROUP_CHOICES.items()
+}
+EDUCATIONAL_GROUPS_EMPTY = _serialize([])
+EDUCATIONAL_GROUPS_ALL = _serialize(FacultyEducationalGroup.EDUCATIONAL_GROUP_CHOICES)
+
+
+def _cached_json_response(body):
+    response = HttpResponse(body, content_type='application/json')
+    patch_cache_control(response, public=True, max_age=EDUCATIONAL_GROUPS_MAX_AGE)
+    return response
+
+
+def _educational_groups_etag(request, *args, **kwargs):
+    faculty = request.GET.get('faculty')
+    if not faculty:
+        return None
+    return EDUCATIONAL_GROUPS_BY_FACULTY.get(faculty, EDUCATIONAL_GROUPS_EMPTY)[1]
+
 
 class GetEducationalGroupsView(View):
+    @method_decorator(condition(etag_func=_educational_groups_etag))
     def get(self, request, *args, **kwargs):
         faculty = request.GET.get('faculty')
         if not faculty:
             return JsonResponse({'error': 'Faculty is required'}, status=400)
 
-        # Fetch educational group choices
-        educational_groups = FacultyEducationalGroup.EDUCATIONAL_GROUP_CHOICES.get(faculty, [])
+        # Fetch the pre-serialized educational group choices
+        body, _ = EDUCATIONAL_GROUPS_BY_FACULTY.get(faculty, EDUCATIONAL_GROUPS_EMPTY)
+        return _cached_json_response(body)
+
+
+class GetAllEducationalGroupsView(View):
+    """ Return the whole faculty -> educational groups map, so a page needs a single request """
+
+    @method_decorator(condition(etag_func=lambda request, *args, **kwargs: EDUCATIONAL_GROUPS_ALL[1]))
+    def get(self, request, *args, **kwargs):
+        return _cached_json_response(EDUCATIONAL_GROUPS_ALL[0])
+
+
+class TeacherViewSet(ReadOnlyApiViewSet):
+    """ /uni/api/teachers/: teachers with a group in the user's faculty """
+    queryset = Teacher.objects.prefetch_related(
+        Prefetch('teacherfacultyeducationalgroupassignment_set',
+                 queryset=TeacherFacultyEducationalGroupAssignment.objects.select_related('faculty_educational_group'))
+    )
+    serializer_class = TeacherSerializer
+    faculty_lookup = 'teacherfacultyeducationalgroupassignment__faculty_educational_group__faculty'
+
+    def scope_to_faculty(self, queryset, faculty):
+        # a teacher with several groups in the faculty is still listed once
+        return queryset.filter(Exists(TeacherFacultyEducationalGroupAssignment.objects.filter(
+            teacher=OuterRef('pk'), faculty_educational_group__faculty=faculty,
+        )))
+
 
-        # Return as JSON response
-        return JsonResponse({'educational_groups': educational_groups})
+class StudentViewSet(ReadOnlyApiViewSet):
+    """ /uni/api/students/: scoped like StudentAdmin """
+    queryset = Student.objects.select_related('faculty_educational_group')
+    serializer_class = StudentSerializer
+    faculty_lookup = 'faculty_educational_group__faculty'
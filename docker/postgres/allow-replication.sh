@@ -0,0 +1,3 @@
+#!/bin/sh
+# Runs once, when postgresDB_origin initialises its data directory: lets postgresDB_replica stream from it
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"